@@ -0,0 +1,182 @@
+"""
+Admin dashboard metrics from incrementally maintained rollups
+
+MetricsRollup runs DatabaseManager.roll_up_metrics on a timer. Each pass
+folds the rows added to users, audio_history, downloads and study_materials
+since the last pass (found by primary-key watermark) into hourly counters
+(metrics_hourly) and running totals (metrics_totals). Admin endpoints read
+only those tables, so a dashboard poll costs a few primary-key reads however
+large the source tables get. The first pass backfills existing rows in
+batches; deleting users or audio counts them under users_deleted and
+audio_deleted, so current totals are the difference. timeseries() serves hourly or daily series from the same buckets,
+and system_health() reports real disk usage, database size and process
+uptime.
+"""
+
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Process start, for uptime
+STARTED_AT = time.time()
+
+# Metrics kept in the rollups
+METRICS = ('signups', 'users_deleted', 'audio_generated', 'audio_deleted', 'downloads_created', 'audio_bytes',
+           'study_materials')
+
+GRANULARITIES = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+MAX_PERIODS = {'hour': 24 * 31, 'day': 366}
+
+
+def _bucket_start(moment: datetime, granularity: str) -> datetime:
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if granularity == 'day' else moment
+
+
+def timeseries(db, metric: str, granularity: str = 'day', periods: int = 30,
+               now: Optional[datetime] = None) -> List[Dict]:
+    """The last ``periods`` hours or days of a metric, oldest first, zero-filled
+
+    Each point is {'bucket': ISO start of the hour/day, 'value': total}; the
+    last point is the current, partial period.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}")
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity {granularity!r} (expected hour or day)")
+    periods = max(1, min(int(periods), MAX_PERIODS[granularity]))
+
+    step = GRANULARITIES[granularity]
+    end = _bucket_start(now or datetime.now(), granularity) + step
+    start = end - periods * step
+    values = {start + i * step: 0 for i in range(periods)}
+    for row in db.get_metric_buckets(metric, start, end):
+        bucket = _bucket_start(row['bucket'], granularity)
+        if bucket in values:
+            values[bucket] += int(row['value'])
+    return [{'bucket': bucket.isoformat(), 'value': value} for bucket, value in values.items()]
+
+
+def today_total(db, metric: str, now: Optional[datetime] = None) -> int:
+    return timeseries(db, metric, 'day', 1, now)[0]['value']
+
+
+def user_growth(db, days: int = 7, now: Optional[datetime] = None) -> List[Dict]:
+    """Users at the end of each of the last ``days`` days, with that day's signups"""
+    signups = timeseries(db, 'signups', 'day', days, now)
+    deleted = timeseries(db, 'users_deleted', 'day', days, now)
+    totals = db.get_metric_totals(('signups', 'users_deleted'))
+    users = totals['signups'] - totals['users_deleted']
+
+    # Walk back from today's count, undoing each day's signups and deletions
+    growth = []
+    for signup_point, deleted_point in zip(reversed(signups), reversed(deleted)):
+        day = datetime.fromisoformat(signup_point['bucket'])
+        growth.append({'day': day.strftime('%a'), 'date': day.date().isoformat(),
+                       'users': users, 'signups': signup_point['value']})
+        users -= signup_point['value'] - deleted_point['value']
+    return growth[::-1]
+
+
+def engagement(db, now: Optional[datetime] = None) -> Dict:
+    """Today's active users (anyone who generated audio) and content interactions"""
+    now = now or datetime.now()
+    return {
+        'dailyActiveUsers': db.count_active_users(now.date()),
+        'contentInteractions': today_total(db, 'audio_generated', now) + today_total(db, 'downloads_created', now)
+    }
+
+
+def format_bytes(size: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} TB'
+
+
+def system_health(db, storage_path: str, started_at: float = STARTED_AT, warn_percent: float = 90) -> Dict:
+    """Disk usage where audio is kept, database size, uptime and today's output"""
+    usage = shutil.disk_usage(storage_path)
+    storage_percent = round(usage.used / usage.total * 100, 1) if usage.total else 0
+    try:
+        database_size = db.get_database_size()
+    except Exception as e:
+        logger.warning(f"Could not read database size: {e}")
+        database_size = None
+    try:
+        files_today = today_total(db, 'audio_generated')
+    except Exception as e:
+        logger.warning(f"Could not read today's audio count: {e}")
+        files_today = None
+
+    return {
+        'status': 'healthy' if storage_percent < warn_percent and database_size is not None else 'warning',
+        'storagePercent': storage_percent,
+        'storageUsedBytes': usage.used,
+        'storageTotalBytes': usage.total,
+        'uptimeSeconds': int(time.time() - started_at),
+        'database_size': format_bytes(database_size) if database_size is not None else None,
+        'files_processed_today': files_today
+    }
+
+
+class MetricsRollup:
+    """Keeps the metric rollups current by calling roll_up_metrics on a timer"""
+
+    def __init__(self, db, batch_size: int = 10000, settle_seconds: float = 60):
+        self.db = db
+        self.batch_size = batch_size
+        self.settle_seconds = settle_seconds
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {'passes': 0, 'rows': 0, 'errors': 0, 'last_pass_at': None}
+
+    def run_once(self) -> int:
+        """Roll up until caught up; returns the number of rows counted"""
+        total = 0
+        while True:
+            rolled = self.db.roll_up_metrics(batch_size=self.batch_size, settle_seconds=self.settle_seconds)
+            total += sum(rolled.values())
+            if not any(count >= self.batch_size for count in rolled.values()):
+                break
+        self._stats['passes'] += 1
+        self._stats['rows'] += total
+        self._stats['last_pass_at'] = time.time()
+        return total
+
+    def start(self, interval_seconds: float):
+        """Roll up every ``interval_seconds`` on a daemon thread (the first pass right away)"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while True:
+                try:
+                    self.run_once()
+                except Exception as e:
+                    self._stats['errors'] += 1
+                    logger.error(f"Metrics rollup failed: {e}")
+                if self._stop.wait(interval_seconds):
+                    break
+
+        self._thread = threading.Thread(target=run, name='metrics-rollup', daemon=True)
+        self._thread.start()
+        logger.info(f"Metrics rollup running every {interval_seconds}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['running'] = self._thread is not None
+        return stats
@@ -1,19 +1,39 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from ibm_watson import TextToSpeechV1
 from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
 from ibm_cloud_sdk_core import DetailedResponse
-import requests
 import tempfile
 import os
+import uuid
 import json
 import logging
 from datetime import datetime
 from database_manager import DatabaseManager
-from huggingface_service import hf_service
-import PyPDF2
+from huggingface_service import LOCAL_TTS_ENGINE, hf_service
+from audio_cache import AudioCache
+from synthesis_pool import SegmentExecutor, engine_limiter, segment_executor
+from wav_concat import WavConcatenator, WavFileWriter, decode_audio, convert_pcm, wav_header
+from job_queue import JobQueue, QueueFullError
+from local_tts import local_tts
+from http_client import http_client
+from iam_token import IAMTokenManager
+from rewrite_cache import RewriteCache
+from text_extraction import pdf_extractor
+from extraction_cache import ExtractionCache
+from upload_spool import SpoolingRequest
+from study_segmentation import segment as segment_study_text, first_line as first_study_line
+from story_analysis import analyze_story_content, iter_story_segments
+from audio_serving import send_audio_file, is_full_transfer, content_etags
+from audio_transcode import transcoder, extension_for
+from audio_storage import storage_from_env, key_for, new_audio_key
+from audio_gc import AudioSweeper
+import admin_metrics
+from admin_metrics import MetricsRollup
 import docx
 import re
+import itertools
+from collections import deque
 from werkzeug.utils import secure_filename
 
 # Configure logging
@@ -21,6 +41,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.request_class = SpoolingRequest
 
 # Configure CORS for production deployment
 if os.getenv('FLASK_ENV') == 'production':
@@ -41,15 +62,95 @@ else:
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB max file size
 app.config['UPLOAD_EXTENSIONS'] = ['.pdf', '.doc', '.docx', '.txt']
 app.config['UPLOAD_PATH'] = 'temp'
+# Uploads are hashed as they arrive; bigger ones spill to uniquely named files here
+app.config['UPLOAD_SPOOL_DIR'] = os.path.join(os.path.dirname(__file__), 'temp')
+app.config['UPLOAD_SPOOL_MAX_MEMORY'] = int(os.getenv('UPLOAD_SPOOL_MEMORY_MB', 4)) * 1024 * 1024
 
 # Initialize database manager
 db_manager = DatabaseManager()
 
+# Generated audio lives here; synthesized blobs are cached in a subdirectory
+AUDIO_DIR = os.path.join(os.path.dirname(__file__), 'audio_files')
+audio_cache = AudioCache(
+    os.path.join(AUDIO_DIR, 'cache'),
+    max_bytes=int(os.getenv('AUDIO_CACHE_MAX_MB', 512)) * 1024 * 1024,
+    max_entries=int(os.getenv('AUDIO_CACHE_MAX_ENTRIES', 5000))
+)
+# Local pyttsx3 audio is a degraded fallback when a remote engine is configured, so
+# it is only reused for a short while before the better engines are tried again
+LOCAL_TTS_CACHE_TTL_SECONDS = float(os.getenv('LOCAL_TTS_CACHE_TTL_MINUTES', 15)) * 60
+# Compressed copies of cached WAV blobs, so a cache hit is stored without running ffmpeg
+rendition_cache = AudioCache(
+    os.path.join(AUDIO_DIR, 'cache', 'renditions'),
+    max_bytes=int(os.getenv('AUDIO_RENDITION_CACHE_MAX_MB', 128)) * 1024 * 1024,
+    max_entries=int(os.getenv('AUDIO_CACHE_MAX_ENTRIES', 5000))
+)
+
+# Audio is produced under uniquely named files in the work area, then stored by key
+AUDIO_WORK_DIR = os.path.join(AUDIO_DIR, 'work')
+
+# Finished audio is stored by sharded key (ab/cd/<hash>.opus), on this node's disk or
+# in an S3-compatible bucket (AUDIO_STORAGE=s3) so that any node can serve it
+audio_storage = storage_from_env(AUDIO_DIR)
+
+# Stored audio is reconciled with audio_history/downloads on a timer: orphans and
+# stale temp files go, and optional retention and per-user quotas are enforced
+audio_sweeper = AudioSweeper(
+    db_manager,
+    audio_storage,
+    temp_dirs=[app.config['UPLOAD_SPOOL_DIR'], AUDIO_WORK_DIR, AUDIO_DIR],
+    ignored_prefixes=('cache/', 'storage_cache/', 'work/'),  # managed elsewhere
+    retention_days=float(os.getenv('AUDIO_RETENTION_DAYS', 0)),
+    user_quota_bytes=int(float(os.getenv('AUDIO_USER_QUOTA_MB', 0)) * 1024 * 1024),
+    orphan_grace_seconds=float(os.getenv('AUDIO_GC_GRACE_MINUTES', 60)) * 60,
+    temp_max_age_seconds=float(os.getenv('AUDIO_GC_GRACE_MINUTES', 60)) * 60
+)
+AUDIO_GC_INTERVAL_MINUTES = float(os.getenv('AUDIO_GC_INTERVAL_MINUTES', 60))
+
+# Admin metrics are served from hourly/total rollups that a background pass keeps current
+metrics_rollup = MetricsRollup(
+    db_manager,
+    batch_size=int(os.getenv('METRICS_ROLLUP_BATCH_SIZE', 10000)),
+    settle_seconds=float(os.getenv('METRICS_ROLLUP_SETTLE_SECONDS', 60))
+)
+METRICS_ROLLUP_INTERVAL_SECONDS = float(os.getenv('METRICS_ROLLUP_INTERVAL_SECONDS', 60))
+
+# Rewrites are memoized by (text, tone, model); set REWRITE_CACHE_DB to persist them in SQLite
+rewrite_cache = RewriteCache(
+    max_entries=int(os.getenv('REWRITE_CACHE_MAX_ENTRIES', 2048)),
+    ttl=float(os.getenv('REWRITE_CACHE_TTL_HOURS', 168)) * 3600,
+    db_path=os.getenv('REWRITE_CACHE_DB') or None
+)
+
+# Extracted study material text and structure, keyed by the upload's sha256
+extraction_cache = ExtractionCache(
+    max_entries=int(os.getenv('EXTRACTION_CACHE_MAX_ENTRIES', 256)),
+    max_chars=int(os.getenv('EXTRACTION_CACHE_MAX_MB', 64)) * 1024 * 1024
+)
+
+# Whole-material audiobook rendering: topics in flight at once, rows per DB commit
+STUDY_RENDER_CONCURRENCY = int(os.getenv('STUDY_RENDER_CONCURRENCY', 4))
+STUDY_RENDER_DB_BATCH = int(os.getenv('STUDY_RENDER_DB_BATCH', 25))
+# Audiobook topics get their own threads so a long render can't hold up
+# interactive story synthesis on segment_executor
+study_render_executor = SegmentExecutor(max_workers=STUDY_RENDER_CONCURRENCY, thread_name_prefix='study-tts')
+
+# Long-running generation runs here; job ids are audio_history ids and every
+# status change is written to audio_history.processing_status
+job_queue = JobQueue(
+    max_workers=int(os.getenv('AUDIO_JOB_WORKERS', 2)),
+    max_pending=int(os.getenv('AUDIO_JOB_MAX_PENDING', 100)),
+    on_status=db_manager.update_audio_history_status
+)
+
 # --- IBM Watson Configuration ---
 # Replace these with your actual IBM Cloud credentials
 WATSONX_API_KEY = os.getenv('WATSONX_API_KEY', 'YOUR_WATSONX_API_KEY')
 WATSONX_URL = os.getenv('WATSONX_URL', 'YOUR_WATSONX_URL') 
 WATSONX_PROJECT_ID = os.getenv('WATSONX_PROJECT_ID', 'YOUR_PROJECT_ID')
+watsonx_tokens = IAMTokenManager(WATSONX_API_KEY)
+WATSONX_MODEL_ID = 'ibm/granite-13b-chat-v2'
+REWRITE_BATCH_MAX_ITEMS = int(os.getenv('REWRITE_BATCH_MAX_ITEMS', 50))
 
 TTS_API_KEY = os.getenv('TTS_API_KEY', 'YOUR_TTS_API_KEY')
 TTS_URL = os.getenv('TTS_URL', 'YOUR_TTS_URL')
@@ -100,21 +201,35 @@ def get_tone_prompts():
 
 TONE_PROMPTS = get_tone_prompts()
 
+def is_mock_rewrite(result, tone):
+    """Whether a rewrite is just the tagged original text returned when no LLM answered"""
+    return not result or result.startswith(f"[{tone.upper()}")
+
 def call_ai_llm(text, tone):
     """Call AI LLM for tone-adaptive text rewriting (Hugging Face first, then Watson fallback)"""
     try:
+        # Identical text and tone were rewritten before
+        cached, model = rewrite_cache.lookup(text, tone, [hf_service.text_model, WATSONX_MODEL_ID])
+        if cached is not None:
+            logger.info(f"Rewrite cache hit ({model}, tone: {tone})")
+            return cached
+        
         # First try Hugging Face
         logger.info(f"Attempting text rewriting with Hugging Face (tone: {tone})")
         result = hf_service.rewrite_text(text, tone)
         
         # Check if we got a real result (not just a mock response)
-        if result and not result.startswith(f"[{tone.upper()} TONE]"):
+        if not is_mock_rewrite(result, tone):
             logger.info("Text rewriting successful with Hugging Face")
+            rewrite_cache.put(text, tone, hf_service.text_model, result)
             return result
         
         logger.info("Hugging Face not available, trying Watson fallback")
         # Fallback to Watson if Hugging Face fails
-        return call_watsonx_llm(text, tone)
+        result = call_watsonx_llm(text, tone)
+        if not is_mock_rewrite(result, tone):
+            rewrite_cache.put(text, tone, WATSONX_MODEL_ID, result)
+        return result
         
     except Exception as e:
         logger.error(f"Error in AI text rewriting: {e}")
@@ -152,12 +267,12 @@ def call_watsonx_llm(text, tone):
                 'temperature': 0.7,
                 'repetition_penalty': 1.1
             },
-            'model_id': 'ibm/granite-13b-chat-v2',
+            'model_id': WATSONX_MODEL_ID,
             'project_id': WATSONX_PROJECT_ID
         }
         
         # Make API call to Watsonx
-        response = requests.post(
+        response = http_client.post(
             f"{WATSONX_URL}/ml/v1/text/generation",
             headers=headers,
             json=payload,
@@ -169,6 +284,8 @@ def call_watsonx_llm(text, tone):
             generated_text = result['results'][0]['generated_text'].strip()
             return generated_text
         else:
+            if response.status_code == 401:
+                watsonx_tokens.invalidate()  # fetch a fresh token next time
             logger.error(f"Watsonx API error: {response.status_code} - {response.text}")
             return f"[{tone.upper()} TONE] {text}"  # Fallback
             
@@ -177,33 +294,155 @@ def call_watsonx_llm(text, tone):
         return f"[{tone.upper()} TONE] {text}"  # Fallback
 
 def get_access_token():
-    """Get IBM Cloud access token"""
+    """Get IBM Cloud access token (cached and refreshed ahead of expiry)"""
+    return watsonx_tokens.get_token()
+
+# --- Speech Synthesis Helpers ---
+def watson_engine_id(voice):
+    """Engine id used to key Watson TTS output in the audio cache"""
+    return f"watson:{VOICE_MAPPING[voice]}@22050"
+
+def synthesize_audio(text, voice, tone):
+    """Synthesize speech (Hugging Face first, then Watson fallback)
+
+    Returns (audio_bytes, engine_id). audio_bytes is None when no engine is
+    available; Watson errors are raised to the caller.
+    """
     try:
-        headers = {
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
-        
-        data = {
-            'grant_type': 'urn:ibm:params:oauth:grant-type:apikey',
-            'apikey': WATSONX_API_KEY
-        }
-        
-        response = requests.post(
-            'https://iam.cloud.ibm.com/identity/token',
-            headers=headers,
-            data=data,
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            return response.json()['access_token']
-        else:
-            logger.error(f"Failed to get access token: {response.status_code}")
-            return None
-            
+        with engine_limiter.slot('huggingface'):
+            audio_data, engine = hf_service.synthesize_speech_with_engine(text, voice, tone)
+        if audio_data:
+            logger.info(f"TTS successful with Hugging Face ({engine})")
+            return audio_data, engine
+        logger.info("Hugging Face TTS not available, trying Watson fallback")
     except Exception as e:
-        logger.error(f"Error getting access token: {e}")
+        logger.warning(f"Hugging Face TTS error: {e}, trying Watson fallback")
+
+    if not tts:
+        return None, None
+
+    # Use WAV format with high sampling rate for best quality
+    with engine_limiter.slot('watson'):
+        response = tts.synthesize(
+            text=text,
+            voice=VOICE_MAPPING[voice],
+            accept='audio/wav;rate=22050',  # High-quality WAV at 22050 Hz
+            rate_percentage=0,             # Normal speech rate
+            pitch_percentage=0,            # Normal pitch
+            volume_percentage=0            # Normal volume
+        ).get_result()
+    logger.info("TTS successful with Watson")
+    return response.content, watson_engine_id(voice)
+
+def synthesize_audio_cached(text, voice, tone):
+    """Synthesize speech, serving repeats of the same text/voice/tone from the audio cache
+
+    Returns (blob_path, engine_id, cache_hit). blob_path is None when no engine
+    is available.
+    """
+    # Best engines first: Hugging Face models, then Watson, then the local fallback
+    engines = [engine for engine in hf_service.candidate_tts_engines() if engine != LOCAL_TTS_ENGINE]
+    if tts:
+        engines.append(watson_engine_id(voice))
+    max_age = {LOCAL_TTS_ENGINE: LOCAL_TTS_CACHE_TTL_SECONDS} if engines else None
+    engines.append(LOCAL_TTS_ENGINE)
+
+    blob_path, engine = audio_cache.lookup(text, voice, tone, engines, max_age=max_age)
+    if blob_path:
+        logger.info(f"Audio cache hit ({engine}), skipping synthesis")
+        return blob_path, engine, True
+
+    audio_data, engine = synthesize_audio(text, voice, tone)
+    if not audio_data:
+        return None, None, False
+
+    blob_path = audio_cache.put(audio_cache.make_key(text, voice, tone, engine), audio_data)
+    return blob_path, engine, False
+
+def storable_blob(blob_path):
+    """A cached blob in the storage format: WAV blobs are encoded once and the result cached
+
+    Returns the blob itself when nothing needs encoding or encoding fails
+    (store_audio_file then keeps it as it is).
+    """
+    if not transcoder.compresses(blob_path):
+        return blob_path
+    key = AudioCache.make_key(os.path.basename(blob_path), transcoder.store_format,
+                              str(transcoder.bitrate_kbps), 'ffmpeg')
+    cached = rendition_cache.get(key)
+    if cached:
+        return cached
+    
+    work_path = audio_work_path(blob_path)
+    audio_cache.link(blob_path, work_path)
+    encoded_path, _, _ = transcoder.store(work_path)
+    try:
+        if encoded_path == work_path:
+            return blob_path
+        with open(encoded_path, 'rb') as f:
+            return rendition_cache.put(key, f.read())
+    finally:
+        remove_quietly(encoded_path)
+
+def remove_quietly(path):
+    """Delete a file that may already be gone"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def audio_work_path(filename):
+    """Unique work-area path to produce ``filename`` in before store_audio_file takes it
+
+    Descriptive names repeat (same user, voice and second), so they are only
+    kept for display; the file on disk gets a random name.
+    """
+    os.makedirs(AUDIO_WORK_DIR, exist_ok=True)
+    return os.path.join(AUDIO_WORK_DIR, f'work-{uuid.uuid4().hex}{os.path.splitext(filename)[1]}')
+
+def store_audio_file(file_path, filename):
+    """Compress a finished work-area file and hand it to audio storage under a new key
+
+    Returns (audio_key, filename, file_size, mime_type) of what was kept; the
+    key is what history and download rows record, and ``filename`` comes back
+    with the stored format's extension.
+    """
+    file_path, mime_type, file_size = transcoder.store(file_path)
+    extension = extension_for(mime_type)  # (already compressed blobs arrive under a .wav name)
+    audio_key = new_audio_key(extension)
+    audio_storage.put_file(audio_key, file_path, content_type=mime_type)
+    return audio_key, os.path.splitext(filename)[0] + extension, file_size, mime_type
+
+def stored_audio_path(audio_ref):
+    """Local path of stored audio (fetched from the backend if needed), or None
+
+    ``audio_ref`` is a storage key, or an absolute path from rows written
+    before keys were introduced.
+    """
+    try:
+        audio_key = key_for(audio_ref)
+    except ValueError:
         return None
+    return audio_storage.local_path(audio_key) if audio_key else None
+
+def delete_stored_audio(audio_ref):
+    """Delete stored audio by key (or legacy path); failures are logged, not raised"""
+    try:
+        audio_key = key_for(audio_ref)
+        if audio_key:
+            audio_storage.delete(audio_key)
+    except Exception as e:
+        logger.warning(f"Could not delete audio {audio_ref}: {e}")
+
+def send_audio_rendition(file_path, as_attachment=False, download_name=None):
+    """Serve the rendition of a stored audio file that best matches the Accept header"""
+    file_path, mime_type = transcoder.rendition(file_path, request.accept_mimetypes)
+    if download_name:
+        download_name = os.path.splitext(download_name)[0] + extension_for(mime_type)
+    response = send_audio_file(file_path, mimetype=mime_type, as_attachment=as_attachment,
+                               download_name=download_name)
+    response.vary.add('Accept')
+    return response
 
 # --- Authentication Endpoints ---
 @app.route('/auth/register', methods=['POST'])
@@ -304,6 +543,27 @@ def health_check():
         }
     })
 
+@app.route('/debug/stats', methods=['GET'])
+def debug_stats():
+    """Runtime statistics for connection pools and caches"""
+    return jsonify({
+        'database_pool': db_manager.get_pool_stats(),
+        'audio_cache': audio_cache.stats(),
+        'audio_renditions': rendition_cache.stats(),
+        'audio_jobs': job_queue.stats(),
+        'local_tts': local_tts.stats(),
+        'tts_models': hf_service.tts_router.stats(),
+        'http_sessions': http_client.stats(),
+        'rewrite_cache': rewrite_cache.stats(),
+        'extraction_cache': extraction_cache.stats(),
+        'pdf_extractor': pdf_extractor.stats(),
+        'audio_etags': content_etags.stats(),
+        'transcoder': transcoder.stats(),
+        'audio_storage': audio_storage.stats(),
+        'audio_sweeper': audio_sweeper.stats(),
+        'metrics_rollup': metrics_rollup.stats()
+    })
+
 @app.route('/rewrite', methods=['POST'])
 def rewrite():
     """Endpoint for tone-adaptive text rewriting"""
@@ -329,23 +589,7 @@ def rewrite():
         rewritten_text = call_ai_llm(text, tone)
         
         # Get or create user
-        user = db_manager.get_user_by_email(user_email)
-        if not user:
-            # Create default user with correct parameters
-            user_id = db_manager.create_user(
-                name='Default User',
-                email=user_email,
-                phone='',
-                location='',
-                university='',
-                course='',
-                year='',
-                roll_number='',
-                gpa=0.0,
-                bio=''
-            )
-        else:
-            user_id = user['id']
+        user_id = get_or_create_user_id(user_email)
         
         # Save to database
         history_id = db_manager.save_audio_history(
@@ -369,6 +613,136 @@ def rewrite():
         logger.error(f"Error in rewrite endpoint: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def get_or_create_user_id(user_email):
+    """Id of the user with this email, creating a default user if needed"""
+    user = db_manager.get_user_by_email(user_email)
+    if user:
+        return user['id']
+    # Create default user with correct parameters
+    return db_manager.create_user(
+        name='Default User',
+        email=user_email,
+        phone='',
+        location='',
+        university='',
+        course='',
+        year='',
+        roll_number='',
+        gpa=0.0,
+        bio=''
+    )
+
+def rewrite_many(items):
+    """Rewrite many (text, tone) pairs: cache first, then batched Hugging Face, then Watson per item
+
+    Returns a list of (rewritten_text, cached) in input order.
+    """
+    results = [None] * len(items)
+    models = [hf_service.text_model, WATSONX_MODEL_ID]
+    
+    misses = []
+    for i, (text, tone) in enumerate(items):
+        cached, _ = rewrite_cache.lookup(text, tone, models)
+        if cached is not None:
+            results[i] = (cached, True)
+        else:
+            misses.append(i)
+    
+    # Identical misses only need generating once
+    unique = list(dict.fromkeys(items[i] for i in misses))
+    generated = {}
+    if unique:
+        logger.info(f"Batch rewriting {len(unique)} texts with Hugging Face ({len(items) - len(misses)} cached)")
+        for (text, tone), result in zip(unique, hf_service.rewrite_texts(unique)):
+            if result and not is_mock_rewrite(result, tone):
+                rewrite_cache.put(text, tone, hf_service.text_model, result)
+                generated[(text, tone)] = result
+    
+    for text, tone in unique:
+        if (text, tone) not in generated:
+            result = call_watsonx_llm(text, tone)
+            if not is_mock_rewrite(result, tone):
+                rewrite_cache.put(text, tone, WATSONX_MODEL_ID, result)
+            generated[(text, tone)] = result
+    
+    for i in misses:
+        results[i] = (generated[items[i]], False)
+    return results
+
+@app.route('/rewrite/batch', methods=['POST'])
+def rewrite_batch():
+    """Rewrite many texts in one request; each item reports its own result or error"""
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+        
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'items must be a non-empty list'}), 400
+        
+        if len(items) > REWRITE_BATCH_MAX_ITEMS:
+            return jsonify({'error': f'At most {REWRITE_BATCH_MAX_ITEMS} items per batch'}), 400
+        
+        default_tone = data.get('tone', 'neutral')
+        default_voice = data.get('voice', 'allison')
+        
+        # Validate every item; invalid ones get an error instead of failing the batch
+        results = []
+        valid = []
+        for index, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            text = str(item.get('text') or '').strip()
+            tone = str(item.get('tone') or default_tone).lower()
+            if not text:
+                results.append({'index': index, 'success': False, 'error': 'Text is required'})
+            elif tone not in TONE_PROMPTS:
+                results.append({'index': index, 'success': False,
+                                'error': f'Invalid tone. Available tones: {list(TONE_PROMPTS.keys())}'})
+            else:
+                results.append(None)
+                valid.append((index, text, tone, item.get('voice') or default_voice))
+        
+        logger.info(f"Batch rewrite of {len(valid)} texts ({len(items) - len(valid)} invalid)")
+        
+        rewrites = rewrite_many([(text, tone) for _, text, tone, _ in valid])
+        
+        # Save every history row with one multi-row INSERT
+        history_ids = [None] * len(valid)
+        if valid:
+            user_id = get_or_create_user_id(data.get('user_email', 'default@echoverse.com'))
+            saved = db_manager.save_audio_history_batch(user_id, [
+                {'original_text': text, 'rewritten_text': rewritten, 'tone': tone, 'voice': voice}
+                for (_, text, tone, voice), (rewritten, _) in zip(valid, rewrites)
+            ])
+            if saved:
+                history_ids = saved
+        
+        timestamp = datetime.now().isoformat()
+        for (index, text, tone, _), (rewritten, cached), history_id in zip(valid, rewrites, history_ids):
+            results[index] = {
+                'index': index,
+                'success': True,
+                'original_text': text,
+                'rewritten_text': rewritten,
+                'tone': tone,
+                'history_id': history_id,
+                'cached': cached,
+                'timestamp': timestamp
+            }
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'succeeded': len(valid),
+            'failed': len(items) - len(valid)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in batch rewrite endpoint: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/synthesize', methods=['POST'])
 def synthesize():
     """Endpoint for text-to-speech conversion"""
@@ -406,125 +780,171 @@ def synthesize():
             )
             logger.info(f"Created new history record with ID: {history_id}")
         
-        # Try Hugging Face TTS first
+        # Streaming mode: send audio sentence by sentence as it becomes ready
+        if data.get('stream'):
+            return stream_synthesis(text, voice, tone, user_id, history_id)
+        
+        # Synthesize (Hugging Face first, Watson fallback), reusing cached audio when possible
         try:
-            audio_data = hf_service.synthesize_speech(text, voice, tone)
-            
-            if audio_data:
-                logger.info("TTS successful with Hugging Face")
-                
-                # Create permanent file for audio storage
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f'echoverse_{user_id}_{voice}_{timestamp}.wav'
-                audio_dir = os.path.join(os.path.dirname(__file__), 'audio_files')
-                os.makedirs(audio_dir, exist_ok=True)
-                file_path = os.path.join(audio_dir, filename)
-                
-                # Save audio file
-                with open(file_path, 'wb') as f:
-                    f.write(audio_data)
-                
-                file_size = len(audio_data)
-                
-                # Update database with audio file info
-                if history_id:
-                    try:
-                        db_manager.update_audio_history_status(history_id, 'completed', file_path)
-                        
-                        # Save download record
-                        download_id = db_manager.save_download(
-                            user_id=user_id,
-                            history_id=history_id,
-                            original_filename=f'audiobook_{timestamp}.wav',
-                            stored_filename=filename,
-                            file_path=file_path,
-                            file_size=file_size,
-                            mime_type='audio/wav'
-                        )
-                        logger.info(f"Saved download record with ID: {download_id}")
-                        
-                    except Exception as e:
-                        logger.warning(f"Failed to update database: {e}")
-                
-                return send_file(
-                    file_path,
-                    as_attachment=True,
-                    download_name=f'echoverse_{voice}_{timestamp}.wav',
-                    mimetype='audio/wav'
-                )
-            else:
-                logger.info("Hugging Face TTS not available, trying Watson fallback")
-                
+            blob_path, engine, cache_hit = synthesize_audio_cached(text, voice, tone)
         except Exception as e:
-            logger.warning(f"Hugging Face TTS error: {e}, trying Watson fallback")
+            logger.error(f"TTS synthesis error: {e}")
+            return jsonify({'error': 'Failed to synthesize audio'}), 500
         
-        # Fallback to Watson TTS
-        if not tts:
+        if not blob_path:
             return jsonify({'error': 'Text-to-Speech service not available'}), 503
         
-        # Convert voice name to Watson voice ID
-        watson_voice = VOICE_MAPPING[voice]
+        # Watson output is tagged as high quality, as before
+        high_quality = engine.startswith('watson:')
+        quality = 'hq_' if high_quality else ''
         
-        # Generate audio using Watson TTS with highest quality settings
-        try:
-            # Use WAV format with high sampling rate for best quality
-            response = tts.synthesize(
-                text=text,
-                voice=watson_voice,
-                accept='audio/wav;rate=22050',  # High-quality WAV at 22050 Hz
-                rate_percentage=0,             # Normal speech rate
-                pitch_percentage=0,            # Normal pitch
-                volume_percentage=0            # Normal volume
-            ).get_result()
-            
-            # Create permanent file for audio storage with high quality
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f'echoverse_{user_id}_{voice}_{timestamp}_hq.wav'
-            audio_dir = os.path.join(os.path.dirname(__file__), 'audio_files')
-            os.makedirs(audio_dir, exist_ok=True)
-            file_path = os.path.join(audio_dir, filename)
-            
-            # Save high-quality audio file
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
-            
-            file_size = len(response.content)
-            
-            # Update database with audio file info
-            if history_id:
-                try:
-                    db_manager.update_audio_history_status(history_id, 'completed', file_path)
-                    
-                    # Save download record
-                    download_id = db_manager.save_download(
-                        user_id=user_id,
-                        history_id=history_id,
-                        original_filename=f'audiobook_hq_{timestamp}.wav',
-                        stored_filename=filename,
-                        file_path=file_path,
-                        file_size=file_size,
-                        mime_type='audio/wav'
-                    )
-                    logger.info(f"Saved high-quality download record with ID: {download_id}")
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to update database: {e}")
-            
-            return send_file(
-                file_path,
-                as_attachment=True,
-                download_name=f'echoverse_hq_{voice}_{timestamp}.wav',
-                mimetype='audio/wav'
-            )
+        # Create permanent file for audio storage, sharing the cached blob's bytes
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f'echoverse_{user_id}_{voice}_{timestamp}{"_hq" if high_quality else ""}.wav'
+        file_path = audio_work_path(filename)
+        audio_cache.link(storable_blob(blob_path), file_path)
+        audio_key, filename, file_size, mime_type = store_audio_file(file_path, filename)
+        
+        # Update database with audio file info
+        if history_id:
+            try:
+                db_manager.update_audio_history_status(history_id, 'completed', audio_key)
                 
-        except Exception as e:
-            logger.error(f"TTS synthesis error: {e}")
-            return jsonify({'error': 'Failed to synthesize audio'}), 500
+                # Save download record
+                download_id = db_manager.save_download(
+                    user_id=user_id,
+                    history_id=history_id,
+                    original_filename=f'audiobook_{quality}{timestamp}{extension_for(mime_type)}',
+                    stored_filename=filename,
+                    file_path=audio_key,
+                    file_size=file_size,
+                    mime_type=mime_type
+                )
+                logger.info(f"Saved download record with ID: {download_id}")
+                
+            except Exception as e:
+                logger.warning(f"Failed to update database: {e}")
+        
+        response = send_audio_rendition(
+            stored_audio_path(audio_key),
+            as_attachment=True,
+            download_name=f'echoverse_{quality}{voice}_{timestamp}.wav'
+        )
+        response.headers['X-Audio-Cache'] = 'hit' if cache_hit else 'miss'
+        return response
             
     except Exception as e:
         logger.error(f"Error in synthesize endpoint: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!?])\s+')
+
+def split_sentences(text, min_chars=40):
+    """Split text at sentence boundaries, folding very short sentences into the next one"""
+    sentences = []
+    pending = ''
+    for sentence in SENTENCE_BOUNDARY_RE.split(text.strip()):
+        pending = f'{pending} {sentence}' if pending else sentence
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ''
+    if pending:
+        sentences.append(pending)
+    return sentences
+
+def stream_synthesis(text, voice, tone, user_id, history_id):
+    """Stream a WAV response sentence by sentence while assembling the stored file on the side
+
+    Sentences are synthesized ahead on the segment executor, so the client can
+    start playing after the first one. The first sentence is synthesized before
+    the response starts, so a total failure can still be reported as an error.
+    """
+    sentences = split_sentences(text)
+    logger.info(f"Streaming synthesis of {len(sentences)} sentences for user {user_id}")
+    
+    def synthesize_sentence(sentence):
+        """(format, PCM) of a sentence; MP3/FLAC output is decoded here, on the executor"""
+        blob_path, engine, cache_hit = synthesize_audio_cached(sentence, voice, tone)
+        return decode_audio(audio_cache.read(blob_path)) if blob_path else None
+    
+    def decoded(results):
+        """Yield (format, PCM) per sentence, skipping failures"""
+        for i, (chunk, error) in enumerate(results):
+            if error or not chunk:
+                logger.error(f"TTS failed for sentence {i+1}: {error or 'no audio'}")
+                continue
+            yield chunk
+    
+    chunks = decoded(segment_executor.imap_ordered(synthesize_sentence, sentences))
+    first = next(chunks, None)
+    if first is None:
+        if history_id:
+            db_manager.update_audio_history_status(history_id, 'failed')
+        return jsonify({'error': 'Failed to synthesize audio'}), 500
+    fmt = first[0]
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f'echoverse_{user_id}_{voice}_{timestamp}.wav'
+    file_path = audio_work_path(filename)
+    finalized = []  # set once generate() has taken care of the file and the row
+    
+    def generate():
+        writer = WavFileWriter(file_path, fmt)
+        completed = False
+        try:
+            yield wav_header(fmt, None)  # length unknown until the last sentence
+            for chunk_fmt, pcm in itertools.chain([first], chunks):
+                pcm = convert_pcm(pcm, chunk_fmt, fmt)
+                writer.write(pcm)
+                yield bytes(pcm)
+            completed = True
+        finally:
+            finalized.append(True)
+            writer.close()
+            chunks.close()  # stop synthesizing for a client that has gone
+            if completed:
+                try:
+                    # The client got WAV as it was generated; what's kept is compressed
+                    audio_key, stored_filename, file_size, mime_type = store_audio_file(file_path, filename)
+                    if history_id:
+                        db_manager.update_audio_history_status(history_id, 'completed', audio_key)
+                        db_manager.save_download(
+                            user_id=user_id,
+                            history_id=history_id,
+                            original_filename=f'audiobook_{timestamp}{extension_for(mime_type)}',
+                            stored_filename=stored_filename,
+                            file_path=audio_key,
+                            file_size=file_size,
+                            mime_type=mime_type
+                        )
+                except Exception as e:
+                    logger.warning(f"Failed to store streamed audio: {e}")
+                    if history_id:
+                        db_manager.update_audio_history_status(history_id, 'failed')
+            else:
+                # The client disconnected (or synthesis broke) mid-stream; nothing is kept
+                logger.info(f"Streamed synthesis for user {user_id} ended early")
+                remove_quietly(file_path)
+                if history_id:
+                    db_manager.update_audio_history_status(history_id, 'failed')
+    
+    def cleanup():
+        # Closing a generator that never started skips its finally, which
+        # happens when the client leaves before the first chunk is sent
+        chunks.close()
+        if not finalized:
+            logger.info(f"Streamed synthesis for user {user_id} closed before it started")
+            remove_quietly(file_path)
+            if history_id:
+                db_manager.update_audio_history_status(history_id, 'failed')
+    
+    response = Response(stream_with_context(generate()), mimetype='audio/wav')
+    response.call_on_close(cleanup)
+    response.headers['Content-Disposition'] = f'attachment; filename=echoverse_{voice}_{timestamp}.wav'
+    if history_id:
+        response.headers['X-History-Id'] = str(history_id)
+    return response
+
 @app.route('/audio/<int:history_id>', methods=['GET'])
 def get_audio_file(history_id):
     """Serve audio file by history ID"""
@@ -538,16 +958,15 @@ def get_audio_file(history_id):
         if not history_item:
             return jsonify({'error': 'Audio file not found'}), 404
         
-        audio_file_path = history_item.get('audio_file_path')
-        if not audio_file_path or not os.path.exists(audio_file_path):
+        audio_file_path = stored_audio_path(history_item.get('audio_file_path'))
+        if not audio_file_path:
             return jsonify({'error': 'Audio file not found on disk'}), 404
         
-        # Serve the audio file
-        return send_file(
+        # Serve the audio file (ranges and conditional requests included)
+        return send_audio_rendition(
             audio_file_path,
-            mimetype='audio/mpeg',
             as_attachment=False,
-            download_name=f'echoverse_audio_{history_id}.mp3'
+            download_name=f'echoverse_audio_{history_id}'
         )
         
     except Exception as e:
@@ -592,9 +1011,7 @@ def get_downloads():
 def get_voices():
     """Get available voices based on system capabilities"""
     try:
-        import pyttsx3
-        engine = pyttsx3.init()
-        voices = engine.getProperty('voices')
+        voices = local_tts.voices()
         
         available_voices = []
         voice_mapping = {
@@ -658,9 +1075,7 @@ def get_voices():
 def get_system_voices():
     """Get available system voices for debugging"""
     try:
-        import pyttsx3
-        engine = pyttsx3.init()
-        voices = engine.getProperty('voices')
+        voices = local_tts.voices()
         
         system_voices = []
         if voices:
@@ -713,32 +1128,29 @@ def get_voice_installation_info():
 def test_all_voices():
     """Test all available voices"""
     try:
-        import pyttsx3
-        engine = pyttsx3.init()
-        voices = engine.getProperty('voices')
-        
-        test_results = []
-        test_text = "Hello, this is a voice test."
+        def check_voices(engine):
+            results = []
+            for voice in engine.voices:
+                try:
+                    # Test if voice can be set successfully
+                    current_voice = engine.set_voice(voice.id)
+                    results.append({
+                        'index': voice.index,
+                        'name': voice.name,
+                        'id': voice.id,
+                        'gender': voice.gender or 'Unknown',
+                        'status': 'Available' if current_voice == voice.id else 'May have issues'
+                    })
+                except Exception as e:
+                    results.append({
+                        'index': voice.index,
+                        'name': voice.name,
+                        'id': voice.id,
+                        'status': f'Error: {str(e)}'
+                    })
+            return results
         
-        for i, voice in enumerate(voices):
-            try:
-                engine.setProperty('voice', voice.id)
-                # Test if voice can be set successfully
-                current_voice = engine.getProperty('voice')
-                test_results.append({
-                    'index': i,
-                    'name': voice.name,
-                    'id': voice.id,
-                    'gender': getattr(voice, 'gender', 'Unknown'),
-                    'status': 'Available' if current_voice == voice.id else 'May have issues'
-                })
-            except Exception as e:
-                test_results.append({
-                    'index': i,
-                    'name': voice.name,
-                    'id': voice.id,
-                    'status': f'Error: {str(e)}'
-                })
+        test_results = local_tts.run(check_voices)
         
         return jsonify({
             'test_results': test_results,
@@ -752,9 +1164,7 @@ def test_all_voices():
 def get_available_voices():
     """Get voices that are actually available on the system"""
     try:
-        import pyttsx3
-        engine = pyttsx3.init()
-        voices = engine.getProperty('voices')
+        voices = local_tts.voices()
         
         available_voices = []
         if voices:
@@ -975,7 +1385,13 @@ def delete_history_item(history_id):
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        db_manager.delete_audio_history(history_id, user['id'])
+        audio_refs = db_manager.delete_audio_history(user['id'], history_id)
+        if audio_refs is None:
+            return jsonify({'error': 'History item not found'}), 404
+        
+        # The rows are gone; remove the audio they pointed at
+        for audio_ref in audio_refs:
+            delete_stored_audio(audio_ref)
         
         return jsonify({
             'success': True,
@@ -1035,19 +1451,22 @@ def download_audio_file(download_id):
             return jsonify({'error': 'Download not found'}), 404
         
         # Check if file exists
-        if not os.path.exists(download['file_path']):
+        file_path = stored_audio_path(download['file_path'])
+        if not file_path:
             return jsonify({'error': 'Audio file not found'}), 404
         
-        # Update download statistics
-        db_manager.update_download_stats(download_id)
-        
-        return send_file(
-            download['file_path'],
+        response = send_audio_rendition(
+            file_path,
             as_attachment=True,
-            download_name=download['original_filename'],
-            mimetype=download['mime_type']
+            download_name=download['original_filename']
         )
         
+        # Update download statistics; range requests and 304s resume or revalidate a download
+        if is_full_transfer(response):
+            db_manager.update_download_stats(download_id)
+        
+        return response
+        
     except Exception as e:
         logger.error(f"Error downloading file: {e}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -1062,8 +1481,9 @@ def delete_download(download_id):
         if not user_id:
             return jsonify({'error': 'User ID is required'}), 400
         
-        success = db_manager.delete_download(download_id, user_id)
-        if success:
+        download = db_manager.delete_download(download_id, user_id)
+        if download:
+            delete_stored_audio(download['file_path'])
             return jsonify({
                 'success': True,
                 'message': 'Download deleted successfully'
@@ -1075,21 +1495,16 @@ def delete_download(download_id):
         logger.error(f"Error deleting download: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/download-audio/<filename>', methods=['GET'])
+@app.route('/download-audio/<path:filename>', methods=['GET'])
 def serve_audio_file(filename):
     """Serve audio files for story narration"""
     try:
-        audio_dir = os.path.join(os.path.dirname(__file__), 'audio_files')
-        file_path = os.path.join(audio_dir, filename)
+        file_path = stored_audio_path(filename)
         
-        if not os.path.exists(file_path):
+        if not file_path:
             return jsonify({'error': 'Audio file not found'}), 404
         
-        return send_file(
-            file_path,
-            as_attachment=False,
-            mimetype='audio/mpeg'
-        )
+        return send_audio_rendition(file_path, as_attachment=False)
         
     except Exception as e:
         logger.error(f"Error serving audio file: {e}")
@@ -1163,6 +1578,154 @@ def story_narration():
         logger.error(f"Error in story narration endpoint: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/story-narration/stream', methods=['POST'])
+def story_narration_stream():
+    """Stream story segments as NDJSON, one line per segment as soon as it is classified
+
+    With ``"synthesize": true`` each segment is voiced before it is sent (a
+    few segments ahead on the segment executor) and carries its audio URL.
+    The last line is a summary with the segment count and voices/tones used.
+    """
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+            
+        text = data.get('text', '').strip()
+        user_id = data.get('user_id')
+        synthesize = bool(data.get('synthesize', False))
+        
+        if not text:
+            return jsonify({'error': 'Text is required'}), 400
+            
+        if not user_id:
+            return jsonify({'error': 'User ID is required'}), 400
+        
+        logger.info(f"Streaming story narration for user {user_id} (synthesize={synthesize})")
+        
+        history_id = None
+        if synthesize:
+            try:
+                history_id = db_manager.save_audio_history(
+                    user_id=user_id,
+                    original_text=text,
+                    rewritten_text="Story Narration (Streamed)",
+                    tone="multiple",
+                    voice="multiple"
+                )
+            except Exception as e:
+                logger.warning(f"Failed to create history record: {e}")
+        
+        response = Response(
+            stream_with_context(stream_story_segments(text, user_id, synthesize, history_id)),
+            mimetype='application/x-ndjson'
+        )
+        if history_id:
+            response.headers['X-History-Id'] = str(history_id)
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error in story narration stream endpoint: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def voice_story_segments(segments):
+    """Yield (segment, blob_path, engine, cache_hit, error) in story order, synthesizing ahead
+
+    ``segments`` is pulled only as fast as the segment executor's window
+    allows, so analysis and synthesis overlap and nothing piles up in memory.
+    """
+    in_flight = deque()
+    
+    def feed():
+        for segment in segments:
+            in_flight.append(segment)
+            yield segment
+    
+    def synthesize_segment(segment):
+        return synthesize_audio_cached(segment['text'], segment['voice'], segment['tone'])
+    
+    results = segment_executor.imap_ordered(synthesize_segment, feed())
+    try:
+        for result, error in results:
+            segment = in_flight.popleft()
+            if error or not result[0]:
+                yield segment, None, None, False, error or 'TTS service not available'
+            else:
+                blob_path, engine, cache_hit = result
+                yield segment, blob_path, engine, cache_hit, None
+    finally:
+        results.close()
+
+def stream_story_segments(text, user_id, synthesize, history_id):
+    """NDJSON lines for /story-narration/stream"""
+    voices_used, tones_used = set(), set()
+    count = voiced = 0
+    downloads = []
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    if synthesize:
+        items = voice_story_segments(iter_story_segments(text))
+    else:
+        items = ((segment, None, None, False, None) for segment in iter_story_segments(text))
+    
+    def flush():
+        if downloads and history_id:
+            db_manager.save_downloads_batch(user_id, downloads)
+        downloads.clear()
+    
+    try:
+        for index, (segment, blob_path, engine, cache_hit, error) in enumerate(items):
+            count += 1
+            voices_used.add(segment['voice'])
+            tones_used.add(segment['tone'])
+            line = {'type': 'segment', 'index': index, **segment}
+            
+            if synthesize:
+                if error:
+                    logger.error(f"TTS error for segment {index + 1}: {error}")
+                    line['error'] = 'Failed to generate audio'
+                else:
+                    # Share the cached blob's bytes, as /story-narration-audio does
+                    engine_suffix = '_watson' if engine.startswith('watson:') else ''
+                    filename = f'story_segment_{user_id}_{segment["voice"]}_{index}_{timestamp}{engine_suffix}.wav'
+                    file_path = audio_work_path(filename)
+                    audio_cache.link(storable_blob(blob_path), file_path)
+                    audio_key, filename, file_size, mime_type = store_audio_file(file_path, filename)
+                    voiced += 1
+                    downloads.append({
+                        'history_id': history_id,
+                        'original_filename': f'story_segment_{index}{extension_for(mime_type)}',
+                        'stored_filename': filename,
+                        'file_path': audio_key,
+                        'file_size': file_size,
+                        'mime_type': mime_type
+                    })
+                    if len(downloads) >= STUDY_RENDER_DB_BATCH:
+                        flush()
+                    line.update({'audio_url': f'/download-audio/{audio_key}', 'file_size': file_size, 'cached': cache_hit})
+            
+            yield json.dumps(line) + '\n'
+        
+        yield json.dumps({
+            'type': 'summary',
+            'total_segments': count,
+            'voiced_segments': voiced if synthesize else None,
+            'voices_used': sorted(voices_used),
+            'tones_used': sorted(tones_used),
+            'history_id': history_id
+        }) + '\n'
+    
+    finally:
+        # Also runs when the client disconnects mid-stream
+        items.close()  # (stops synthesizing segments nobody will read)
+        if history_id:
+            try:
+                flush()
+                db_manager.update_audio_history_status(history_id, 'completed' if voiced else 'failed')
+            except Exception as e:
+                logger.warning(f"Failed to update database: {e}")
+
 @app.route('/story-narration-audio', methods=['POST'])
 def story_narration_audio():
     """Generate audio for story segments and return URLs"""
@@ -1198,87 +1761,44 @@ def story_narration_audio():
             voice=voice
         )
         
-        # Try Hugging Face TTS first
-        audio_data = None
-        file_path = None
-        
+        # Synthesize (Hugging Face first, Watson fallback), reusing cached audio when possible
         try:
-            audio_data = hf_service.synthesize_speech(text, voice, tone)
-            
-            if audio_data:
-                logger.info("TTS successful with Hugging Face")
-                
-                # Create permanent file for audio storage
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f'story_segment_{user_id}_{voice}_{segment_id}_{timestamp}.wav'
-                audio_dir = os.path.join(os.path.dirname(__file__), 'audio_files')
-                os.makedirs(audio_dir, exist_ok=True)
-                file_path = os.path.join(audio_dir, filename)
-                
-                # Save audio file
-                with open(file_path, 'wb') as f:
-                    f.write(audio_data)
-                
-                file_size = len(audio_data)
-                
+            blob_path, engine, cache_hit = synthesize_audio_cached(text, voice, tone)
         except Exception as e:
-            logger.warning(f"Hugging Face TTS error: {e}, trying Watson fallback")
-        
-        # Fallback to Watson TTS if Hugging Face failed
-        if not audio_data and tts:
-            try:
-                watson_voice = VOICE_MAPPING[voice]
-                
-                response = tts.synthesize(
-                    text=text,
-                    voice=watson_voice,
-                    accept='audio/wav;rate=22050',
-                    rate_percentage=0,
-                    pitch_percentage=0,
-                    volume_percentage=0
-                ).get_result()
-                
-                # Create permanent file for audio storage
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f'story_segment_{user_id}_{voice}_{segment_id}_{timestamp}_watson.wav'
-                audio_dir = os.path.join(os.path.dirname(__file__), 'audio_files')
-                os.makedirs(audio_dir, exist_ok=True)
-                file_path = os.path.join(audio_dir, filename)
-                
-                # Save audio file
-                with open(file_path, 'wb') as f:
-                    f.write(response.content)
-                
-                file_size = len(response.content)
-                audio_data = response.content
-                
-            except Exception as e:
-                logger.error(f"Watson TTS error: {e}")
-                return jsonify({'error': 'Failed to generate audio'}), 500
+            logger.error(f"Watson TTS error: {e}")
+            return jsonify({'error': 'Failed to generate audio'}), 500
         
-        if not audio_data:
+        if not blob_path:
             return jsonify({'error': 'TTS service not available'}), 503
         
+        # Create permanent file for audio storage, sharing the cached blob's bytes
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        engine_suffix = '_watson' if engine.startswith('watson:') else ''
+        filename = f'story_segment_{user_id}_{voice}_{segment_id}_{timestamp}{engine_suffix}.wav'
+        file_path = audio_work_path(filename)
+        audio_cache.link(storable_blob(blob_path), file_path)
+        audio_key, filename, file_size, mime_type = store_audio_file(file_path, filename)
+        
         # Update database with audio file info
         try:
-            db_manager.update_audio_history_status(history_id, 'completed', file_path)
+            db_manager.update_audio_history_status(history_id, 'completed', audio_key)
             
             # Save download record
             download_id = db_manager.save_download(
                 user_id=user_id,
                 history_id=history_id,
-                original_filename=f'story_segment_{segment_id}.wav',
+                original_filename=f'story_segment_{segment_id}{extension_for(mime_type)}',
                 stored_filename=filename,
-                file_path=file_path,
+                file_path=audio_key,
                 file_size=file_size,
-                mime_type='audio/wav'
+                mime_type=mime_type
             )
             
         except Exception as e:
             logger.warning(f"Failed to update database: {e}")
         
         # Return JSON with audio URL
-        audio_url = f'/download-audio/{filename}'
+        audio_url = f'/download-audio/{audio_key}'
         
         return jsonify({
             'success': True,
@@ -1287,13 +1807,105 @@ def story_narration_audio():
             'file_size': file_size,
             'voice': voice,
             'tone': tone,
-            'segment_id': segment_id
+            'segment_id': segment_id,
+            'cached': cache_hit
         })
         
     except Exception as e:
         logger.error(f"Error in story narration audio endpoint: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def render_merged_story(text, user_id, history_id=None):
+    """Synthesize every story segment and merge them into one WAV file
+
+    Returns (payload, status_code). When history_id is None the history record
+    is created once the merge succeeds; jobs pass the id they were queued under.
+    """
+    # Analyze the story lazily; segments are synthesized as they are classified
+    segments = iter_story_segments(text)
+    first = next(segments, None)
+    
+    if first is None:
+        return {'error': 'No story segments found'}, 400
+    
+    # Generate audio for the segments concurrently; results come back in story order
+    logger.info(f"Synthesizing story segments with up to {segment_executor.max_workers} workers")
+    segments_count = 0
+    
+    # Collect segment audio in memory, in story order
+    merger = WavConcatenator(pause_ms=500)  # small pause between segments
+    
+    for i, (segment, blob_path, engine, cache_hit, error) in enumerate(
+            voice_story_segments(itertools.chain([first], segments))):
+        segments_count += 1
+        if error:
+            logger.error(f"TTS error for segment {i+1}: {error}")
+            continue
+        
+        try:
+            merger.add(audio_cache.read(blob_path))
+        except ValueError as e:
+            logger.error(f"Skipping segment {i+1} with unreadable audio: {e}")
+    
+    if not merger.segment_count:
+        return {'error': 'Failed to generate any audio segments'}, 500
+    
+    # Merge all segments straight into the destination file
+    try:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        merged_filename = f'story_merged_{user_id}_{timestamp}.wav'
+        merged_path = audio_work_path(merged_filename)
+        
+        merger.write(merged_path)
+        audio_key, merged_filename, file_size, mime_type = store_audio_file(merged_path, merged_filename)
+        
+        # Create history record for merged audio
+        if not history_id:
+            history_id = create_merged_story_history(text, user_id)
+        
+        # Update database with audio file info
+        try:
+            db_manager.update_audio_history_status(history_id, 'completed', audio_key)
+            
+            # Save download record
+            download_id = db_manager.save_download(
+                user_id=user_id,
+                history_id=history_id,
+                original_filename=f'story_merged{extension_for(mime_type)}',
+                stored_filename=merged_filename,
+                file_path=audio_key,
+                file_size=file_size,
+                mime_type=mime_type
+            )
+            
+        except Exception as e:
+            logger.warning(f"Failed to update database: {e}")
+        
+        # Return merged audio URL
+        audio_url = f'/download-audio/{audio_key}'
+        
+        return {
+            'success': True,
+            'audio_url': audio_url,
+            'filename': merged_filename,
+            'file_size': file_size,
+            'segments_count': segments_count,
+            'duration_estimate': merger.duration_seconds
+        }, 200
+        
+    except Exception as e:
+        logger.error(f"Error merging audio files: {e}")
+        return {'error': 'Failed to merge audio files'}, 500
+
+def create_merged_story_history(text, user_id):
+    return db_manager.save_audio_history(
+        user_id=user_id,
+        original_text=text,
+        rewritten_text="Story Narration (Merged)",
+        tone="multiple",
+        voice="multiple"
+    )
+
 @app.route('/story-narration-merged', methods=['POST'])
 def story_narration_merged():
     """Generate merged audio for all story segments"""
@@ -1314,299 +1926,13 @@ def story_narration_merged():
         
         logger.info(f"Generating merged story audio for user {user_id}")
         
-        # Analyze the story and create segments
-        segments = analyze_story_content(text)
-        
-        if not segments:
-            return jsonify({'error': 'No story segments found'}), 400
-        
-        # Generate audio for each segment
-        audio_files = []
-        temp_files = []
-        
-        for i, segment in enumerate(segments):
-            segment_text = segment['text']
-            voice = segment['voice']
-            tone = segment['tone']
-            
-            logger.info(f"Generating audio for segment {i+1}: {voice} ({tone})")
-            
-            # Try Hugging Face TTS first
-            audio_data = None
-            
-            try:
-                audio_data = hf_service.synthesize_speech(segment_text, voice, tone)
-                if audio_data:
-                    logger.info(f"TTS successful with Hugging Face for segment {i+1}")
-            except Exception as e:
-                logger.warning(f"Hugging Face TTS error for segment {i+1}: {e}")
-            
-            # Fallback to Watson TTS if Hugging Face failed
-            if not audio_data and tts:
-                try:
-                    watson_voice = VOICE_MAPPING[voice]
-                    response = tts.synthesize(
-                        text=segment_text,
-                        voice=watson_voice,
-                        accept='audio/wav;rate=22050',
-                        rate_percentage=0,
-                        pitch_percentage=0,
-                        volume_percentage=0
-                    ).get_result()
-                    
-                    audio_data = response.content
-                    logger.info(f"TTS successful with Watson for segment {i+1}")
-                    
-                except Exception as e:
-                    logger.error(f"Watson TTS error for segment {i+1}: {e}")
-                    continue
-            
-            if audio_data:
-                # Save temporary file
-                temp_filename = f'temp_segment_{user_id}_{i}.wav'
-                temp_path = os.path.join(os.path.dirname(__file__), 'temp', temp_filename)
-                os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-                
-                with open(temp_path, 'wb') as f:
-                    f.write(audio_data)
-                
-                audio_files.append(temp_path)
-                temp_files.append(temp_path)
-        
-        if not audio_files:
-            return jsonify({'error': 'Failed to generate any audio segments'}), 500
-        
-        # Merge all audio files
-        try:
-            from pydub import AudioSegment
-            
-            # Load first audio file
-            merged_audio = AudioSegment.from_wav(audio_files[0])
-            
-            # Add subsequent files with small pauses
-            for audio_file in audio_files[1:]:
-                # Add a small pause between segments (0.5 seconds)
-                pause = AudioSegment.silent(duration=500)
-                segment_audio = AudioSegment.from_wav(audio_file)
-                merged_audio = merged_audio + pause + segment_audio
-            
-            # Save merged audio
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            merged_filename = f'story_merged_{user_id}_{timestamp}.wav'
-            audio_dir = os.path.join(os.path.dirname(__file__), 'audio_files')
-            os.makedirs(audio_dir, exist_ok=True)
-            merged_path = os.path.join(audio_dir, merged_filename)
-            
-            merged_audio.export(merged_path, format="wav")
-            
-            # Get file size
-            file_size = os.path.getsize(merged_path)
-            
-            # Create history record for merged audio
-            history_id = db_manager.save_audio_history(
-                user_id=user_id,
-                original_text=text,
-                rewritten_text="Story Narration (Merged)",
-                tone="multiple",
-                voice="multiple"
-            )
-            
-            # Update database with audio file info
-            try:
-                db_manager.update_audio_history_status(history_id, 'completed', merged_path)
-                
-                # Save download record
-                download_id = db_manager.save_download(
-                    user_id=user_id,
-                    history_id=history_id,
-                    original_filename='story_merged.wav',
-                    stored_filename=merged_filename,
-                    file_path=merged_path,
-                    file_size=file_size,
-                    mime_type='audio/wav'
-                )
-                
-            except Exception as e:
-                logger.warning(f"Failed to update database: {e}")
-            
-            # Clean up temporary files
-            for temp_file in temp_files:
-                try:
-                    os.remove(temp_file)
-                except:
-                    pass
-            
-            # Return merged audio URL
-            audio_url = f'/download-audio/{merged_filename}'
-            
-            return jsonify({
-                'success': True,
-                'audio_url': audio_url,
-                'filename': merged_filename,
-                'file_size': file_size,
-                'segments_count': len(segments),
-                'duration_estimate': len(merged_audio) / 1000  # in seconds
-            })
-            
-        except ImportError:
-            return jsonify({'error': 'Audio merging not available. Install pydub: pip install pydub'}), 500
-        except Exception as e:
-            logger.error(f"Error merging audio files: {e}")
-            
-            # Clean up temporary files
-            for temp_file in temp_files:
-                try:
-                    os.remove(temp_file)
-                except:
-                    pass
-            
-            return jsonify({'error': 'Failed to merge audio files'}), 500
+        payload, status_code = render_merged_story(text, user_id)
+        return jsonify(payload), status_code
         
     except Exception as e:
         logger.error(f"Error in story narration merged endpoint: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
-def analyze_story_content(text):
-    """Analyze story content and assign voices and tones"""
-    import re
-    
-    # Available voices for different characters
-    voices = ['david', 'zira', 'heera', 'mark', 'ravi']
-    
-    # Emotion to tone mapping
-    emotion_mapping = {
-        'cheerful': 'cheerful',
-        'happy': 'cheerful',
-        'excited': 'cheerful',
-        'playful': 'cheerful',
-        'joy': 'cheerful',
-        'laugh': 'cheerful',
-        'smile': 'cheerful',
-        'sad': 'sad',
-        'cry': 'sad',
-        'weep': 'sad',
-        'sorrow': 'sad',
-        'tear': 'sad',
-        'angry': 'angry',
-        'mad': 'angry',
-        'furious': 'angry',
-        'rage': 'angry',
-        'shout': 'angry',
-        'calm': 'calm',
-        'peaceful': 'calm',
-        'quiet': 'calm',
-        'whisper': 'calm',
-        'serene': 'calm',
-        'nervous': 'suspenseful',
-        'scared': 'suspenseful',
-        'afraid': 'suspenseful',
-        'worry': 'suspenseful',
-        'anxious': 'suspenseful',
-        'suspenseful': 'suspenseful',
-        'confident': 'confident',
-        'proud': 'confident',
-        'strong': 'confident',
-        'brave': 'confident',
-        'bold': 'confident',
-        'inspiring': 'confident'
-    }
-    
-    # Split text into lines first to detect character dialogue format
-    lines = text.split('\n')
-    segments = []
-    character_voices = {}  # Track voices assigned to characters
-    narrator_voice = voices[0]  # Default narrator voice
-    current_voice_index = 1
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        voice = narrator_voice
-        tone = 'neutral'
-        character = 'Narrator'
-        is_dialogue = False
-        
-        # Check for character dialogue format: "CharacterName (emotion): dialogue"
-        character_match = re.match(r'(\w+)\s*\(([^)]+)\):\s*["\']?([^"\']*)["\']?', line)
-        if character_match:
-            character_name = character_match.group(1).title()
-            emotion_hint = character_match.group(2).lower().strip()
-            dialogue_text = character_match.group(3).strip()
-            
-            # Assign voice to character
-            if character_name not in character_voices:
-                character_voices[character_name] = voices[current_voice_index % len(voices)]
-                current_voice_index += 1
-            
-            voice = character_voices[character_name]
-            character = character_name
-            is_dialogue = True
-            
-            # Map emotion hint to tone
-            tone = emotion_mapping.get(emotion_hint, 'neutral')
-            
-            # Use the dialogue text as the main text
-            text_to_speak = dialogue_text
-        else:
-            # Check for regular dialogue with quotes
-            dialogue_match = re.search(r'"([^"]*)"', line)
-            if dialogue_match:
-                is_dialogue = True
-                # Extract speaker if mentioned
-                speaker_match = re.search(r'(\w+)\s+said|said\s+(\w+)|(\w+)\s+asked|asked\s+(\w+)|(\w+)\s+replied|replied\s+(\w+)', line.lower())
-                
-                if speaker_match:
-                    speaker = next(filter(None, speaker_match.groups())).title()
-                    if speaker not in character_voices:
-                        character_voices[speaker] = voices[current_voice_index % len(voices)]
-                        current_voice_index += 1
-                    voice = character_voices[speaker]
-                    character = speaker
-                else:
-                    # Generic character if no speaker identified
-                    character_num = len([c for c in character_voices.keys() if c.startswith('Character')]) + 1
-                    character = f"Character {character_num}"
-                    if character not in character_voices:
-                        character_voices[character] = voices[current_voice_index % len(voices)]
-                        current_voice_index += 1
-                    voice = character_voices[character]
-            
-            text_to_speak = line
-        
-        # Detect emotion in text if not already set
-        if tone == 'neutral':
-            text_lower = text_to_speak.lower()
-            for emotion, mapped_tone in emotion_mapping.items():
-                if emotion in text_lower:
-                    tone = mapped_tone
-                    break
-        
-        # Detect action/emotional indicators
-        if tone == 'neutral':
-            if any(word in text_to_speak.lower() for word in ['!', 'exclaimed', 'shouted', 'yelled']):
-                tone = 'angry'
-            elif any(word in text_to_speak.lower() for word in ['whispered', 'murmured', 'softly']):
-                tone = 'calm'
-            elif any(word in text_to_speak.lower() for word in ['wondered', 'mysterious', 'strange']):
-                tone = 'suspenseful'
-        
-        # Clean up the text
-        if not text_to_speak.endswith(('.', '!', '?')):
-            text_to_speak += '.'
-        
-        segments.append({
-            'text': text_to_speak,
-            'voice': voice,
-            'tone': tone,
-            'character': character,
-            'emotion': tone if tone != 'neutral' else None,
-            'is_dialogue': is_dialogue
-        })
-    
-    return segments
-
 # --- Admin Routes ---
 import jwt
 from functools import wraps
@@ -1692,6 +2018,86 @@ def get_admin_metrics():
         logger.error(f"Error getting admin metrics: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/admin/metrics/timeseries', methods=['GET'])
+@admin_required
+def get_admin_metric_timeseries():
+    """Hourly or daily series of a rolled-up metric, e.g. ?metric=signups&granularity=day&periods=30"""
+    try:
+        metric = request.args.get('metric', 'audio_generated')
+        granularity = request.args.get('granularity', 'day')
+        periods = request.args.get('periods', 30, type=int)
+        try:
+            series = admin_metrics.timeseries(db_manager, metric, granularity, periods)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'metrics': list(admin_metrics.METRICS)}), 400
+        
+        return jsonify({'metric': metric, 'granularity': granularity, 'series': series})
+        
+    except Exception as e:
+        logger.error(f"Error getting metric timeseries: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/admin/reports/user-growth', methods=['GET'])
+@admin_required
+def get_user_growth_report():
+    """Users and signups for each of the last ?days= days (default 7)"""
+    try:
+        days = max(1, min(request.args.get('days', 7, type=int), admin_metrics.MAX_PERIODS['day']))
+        return jsonify({'weeklyGrowth': admin_metrics.user_growth(db_manager, days)})
+        
+    except Exception as e:
+        logger.error(f"Error getting user growth report: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/admin/reports/engagement', methods=['GET'])
+@admin_required
+def get_engagement_report():
+    """Today's active users and content interactions, with the last week of activity"""
+    try:
+        report = admin_metrics.engagement(db_manager)
+        report['series'] = {
+            metric: admin_metrics.timeseries(db_manager, metric, 'day', 7)
+            for metric in ('audio_generated', 'downloads_created')
+        }
+        return jsonify(report)
+        
+    except Exception as e:
+        logger.error(f"Error getting engagement report: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/admin/reports/content', methods=['GET'])
+@admin_required
+def get_content_report():
+    """Content totals by kind"""
+    try:
+        totals = db_manager.get_metric_totals(('audio_generated', 'audio_deleted', 'study_materials', 'audio_bytes'))
+        return jsonify({
+            'categories': {'audio': totals['audio_generated'] - totals['audio_deleted'],
+                           'documents': totals['study_materials']},
+            'audioBytes': totals['audio_bytes']
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting content report: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/admin/content-stats', methods=['GET'])
+@admin_required
+def get_content_stats():
+    """Generated content totals, today's count and the last 30 days"""
+    try:
+        series = admin_metrics.timeseries(db_manager, 'audio_generated', 'day', 30)
+        totals = db_manager.get_metric_totals(('audio_generated', 'audio_deleted'))
+        return jsonify({
+            'totalContent': totals['audio_generated'] - totals['audio_deleted'],
+            'contentToday': series[-1]['value'],
+            'series': series
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting content stats: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/admin/recent-users', methods=['GET'])
 @admin_required
 def get_recent_users():
@@ -1720,13 +2126,41 @@ def get_recent_users():
 def get_system_health():
     """Get system health metrics"""
     try:
-        health = db_manager.get_system_health()
+        health = admin_metrics.system_health(db_manager, AUDIO_DIR)
         return jsonify(health)
         
     except Exception as e:
         logger.error(f"Error getting system health: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/admin/storage', methods=['GET'])
+@admin_required
+def get_audio_storage_status():
+    """Audio storage backend and sweeper totals, with the last sweep's report"""
+    try:
+        return jsonify({
+            'storage': audio_storage.stats(),
+            'sweeper': audio_sweeper.stats(),
+            'last_report': audio_sweeper.last_report
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting audio storage status: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/admin/storage/sweep', methods=['POST'])
+@admin_required
+def sweep_audio_storage():
+    """Run an audio sweep now; {"dry_run": true} reports without deleting"""
+    try:
+        data = request.get_json(silent=True) or {}
+        report = audio_sweeper.sweep(dry_run=bool(data.get('dry_run', False)))
+        return jsonify({'success': 'aborted' not in report, 'report': report})
+        
+    except Exception as e:
+        logger.error(f"Error sweeping audio storage: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/admin/flagged', methods=['GET'])
 @admin_required
 def get_flagged_content():
@@ -1836,32 +2270,78 @@ def process_study_material():
             logger.error(f"Unsupported file extension: {file_ext}")
             return jsonify({'error': f'Unsupported file type. Allowed: {", ".join(allowed_extensions)}'}), 400
         
-        # Save uploaded file temporarily
+        # The body was spooled (and hashed) by SpoolingRequest while it arrived
         filename = secure_filename(file.filename)
-        temp_dir = os.path.join(os.path.dirname(__file__), 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
-        file_path = os.path.join(temp_dir, filename)
-        
-        logger.info(f"Saving file to: {file_path}")
-        file.save(file_path)
-        
-        # Check file size after saving
-        file_size = os.path.getsize(file_path)
-        logger.info(f"File size: {file_size} bytes ({file_size / (1024*1024):.2f} MB)")
-        
-        try:
+        spool = file.stream
+        content_hash, file_size = spool.hexdigest, spool.size
+        logger.info(f"File size: {file_size} bytes ({file_size / (1024*1024):.2f} MB), sha256 {content_hash[:12]}")
+        
+        with spool:
+            # The same file was processed before: reuse its text and structure
+            cached = extraction_cache.get(content_hash)
+            existing = None
+            try:
+                existing = db_manager.find_study_material_by_hash(
+                    content_hash, user_id=user_id, include_content=cached is None
+                )
+            except Exception as e:
+                logger.warning(f"Failed to look up material by hash: {e}")
+            
+            if cached:
+                logger.info(f"Reusing cached extraction for {content_hash[:12]}")
+                text_content, processed_material = cached
+            elif existing:
+                logger.info(f"Reusing study material {existing['content_owner_id']} for {content_hash[:12]}")
+                text_content = existing['content']
+                chapters = json.loads(existing['chapters']) if isinstance(existing['chapters'], str) else existing['chapters']
+                processed_material = {
+                    'title': existing['title'],
+                    'chapters': chapters,
+                    'word_count': len(text_content.split()),
+                    'total_topics': sum(len(chapter['topics']) for chapter in chapters)
+                }
+                extraction_cache.put(content_hash, text_content, processed_material)
+            
+            if cached or existing:
+                own_copy = existing is not None and str(existing['user_id']) == str(user_id)
+                if own_copy:
+                    processed_material['title'] = existing['title']
+                    processed_material['material_id'] = existing['id']
+                else:
+                    processed_material = retitle_study_material(processed_material, text_content, filename)
+                    try:
+                        processed_material['material_id'] = db_manager.save_study_material(
+                            user_id=user_id,
+                            title=processed_material['title'],
+                            content=text_content,
+                            chapters=json.dumps(processed_material['chapters']),
+                            file_type=file.content_type,
+                            content_hash=content_hash,
+                            source_material_id=existing['content_owner_id'] if existing else None
+                        )
+                    except Exception as e:
+                        logger.warning(f"Failed to save to database: {e}")
+                
+                return jsonify({
+                    'success': True,
+                    'cached': True,
+                    'material': processed_material
+                })
+            
             # Extract text based on file type
             logger.info(f"Extracting text from {file_ext} file")
+            extraction = {'complete': True}
             if filename.lower().endswith('.pdf'):
                 logger.info("Processing PDF file")
-                text_content = extract_text_from_pdf(file_path)
+                # Worker processes open the PDF by path
+                text_content = extract_text_from_pdf(spool.disk_path(), details=extraction)
             elif filename.lower().endswith(('.doc', '.docx')):
                 logger.info("Processing Word document")
-                text_content = extract_text_from_word(file_path)
+                spool.seek(0)
+                text_content = extract_text_from_word(spool)
             elif filename.lower().endswith('.txt'):
                 logger.info("Processing text file")
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text_content = f.read()
+                text_content = spool.text()  # decoded as it arrived
             else:
                 logger.error(f"Unsupported file type: {filename}")
                 return jsonify({'error': 'Unsupported file type'}), 400
@@ -1877,6 +2357,10 @@ def process_study_material():
             processed_material = process_study_content(text_content, filename)
             logger.info(f"Successfully processed into {len(processed_material['chapters'])} chapters")
             
+            # Partial extractions (failed or timed-out PDFs) aren't reused for later uploads
+            if extraction['complete']:
+                extraction_cache.put(content_hash, text_content, processed_material)
+            
             # Save to database (optional)
             try:
                 material_id = db_manager.save_study_material(
@@ -1884,33 +2368,176 @@ def process_study_material():
                     title=processed_material['title'],
                     content=text_content,
                     chapters=json.dumps(processed_material['chapters']),
-                    file_type=file.content_type
+                    file_type=file.content_type,
+                    content_hash=content_hash if extraction['complete'] else None
                 )
                 processed_material['material_id'] = material_id
             except Exception as e:
                 logger.warning(f"Failed to save to database: {e}")
             
-            # Clean up temporary file
-            os.remove(file_path)
-            
             return jsonify({
                 'success': True,
-                'material': processed_material
+                'cached': False,
+                'material': processed_material,
+                'extraction': extraction
             })
             
-        except Exception as e:
-            # Clean up temporary file on error
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            raise e
-            
     except Exception as e:
         logger.error(f"Error processing study material: {e}")
         return jsonify({'error': 'Failed to process study material'}), 500
 
+def safe_filename_part(name):
+    """Filesystem-safe version of a title"""
+    name = re.sub(r'[^\w\s-]', '', name).strip()
+    return re.sub(r'[-\s]+', '_', name)
+
+def render_topic_audio(text, topic_name, chapter_name, user_id, voice, tone, history_id):
+    """Synthesize audio for one study topic into its history record; returns (payload, status_code)"""
+    # Synthesize (Hugging Face first, Watson fallback), reusing cached audio when possible
+    try:
+        blob_path, engine, cache_hit = synthesize_audio_cached(text, voice, tone)
+    except Exception as e:
+        logger.error(f"Watson TTS error: {e}")
+        return {'error': 'Failed to generate audio'}, 500
+    
+    if not blob_path:
+        return {'error': 'TTS service not available'}, 503
+    
+    # Create filename with topic name
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    safe_topic_name = safe_filename_part(topic_name)
+    engine_suffix = '_watson' if engine.startswith('watson:') else ''
+    filename = f'{safe_topic_name}_{timestamp}{engine_suffix}.wav'
+    
+    file_path = audio_work_path(filename)
+    audio_cache.link(storable_blob(blob_path), file_path)
+    audio_key, filename, file_size, mime_type = store_audio_file(file_path, filename)
+    
+    # Update database with audio file info
+    try:
+        db_manager.update_audio_history_status(history_id, 'completed', audio_key)
+        
+        # Save download record
+        download_id = db_manager.save_download(
+            user_id=user_id,
+            history_id=history_id,
+            original_filename=f'{safe_topic_name}{extension_for(mime_type)}',
+            stored_filename=filename,
+            file_path=audio_key,
+            file_size=file_size,
+            mime_type=mime_type
+        )
+        
+    except Exception as e:
+        logger.warning(f"Failed to update database: {e}")
+    
+    # Return JSON with audio URL
+    audio_url = f'/download-audio/{audio_key}'
+    
+    return {
+        'success': True,
+        'audio_url': audio_url,
+        'filename': filename,
+        'file_size': file_size,
+        'topic_name': topic_name,
+        'chapter_name': chapter_name,
+        'cached': cache_hit
+    }, 200
+
+def parse_topic_audio_request(data):
+    """Validate a topic audio request body; returns (params, error_message)"""
+    if not data:
+        return None, 'No JSON data provided'
+    
+    params = {
+        'text': data.get('text', '').strip(),
+        'topic_name': data.get('topic_name', 'topic'),
+        'chapter_name': data.get('chapter_name', 'chapter'),
+        'user_id': data.get('user_id'),
+        'voice': data.get('voice', 'david').lower(),
+        'tone': data.get('tone', 'neutral').lower()
+    }
+    
+    if not params['text']:
+        return None, 'Text is required'
+        
+    if not params['user_id']:
+        return None, 'User ID is required'
+    
+    if params['voice'] not in VOICE_MAPPING:
+        return None, f'Invalid voice. Available voices: {list(VOICE_MAPPING.keys())}'
+    
+    return params, None
+
+def create_topic_history(params):
+    """Create the history record a topic's audio is generated into"""
+    return db_manager.save_audio_history(
+        user_id=params['user_id'],
+        original_text=f"{params['chapter_name']} - {params['topic_name']}",
+        rewritten_text=params['text'],
+        tone=params['tone'],
+        voice=params['voice']
+    )
+
 @app.route('/generate-topic-audio', methods=['POST'])
 def generate_topic_audio():
     """Generate audio for a specific topic"""
+    try:
+        params, error = parse_topic_audio_request(request.get_json())
+        if error:
+            return jsonify({'error': error}), 400
+        
+        logger.info(f"Generating topic audio for user {params['user_id']}: {params['topic_name']}")
+        
+        # Create a history record for this topic
+        history_id = create_topic_history(params)
+        
+        payload, status_code = render_topic_audio(history_id=history_id, **params)
+        return jsonify(payload), status_code
+        
+    except Exception as e:
+        logger.error(f"Error in topic audio generation endpoint: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+# --- Background Audio Jobs ---
+
+# Jobs that produce many files rather than one; their results carry an
+# audio_url per topic and per merged chapter instead
+MULTI_FILE_JOB_KINDS = ('study-material-audio',)
+
+def job_response(job):
+    """Status payload for a queued job"""
+    response = job.to_dict()
+    response['status_url'] = f'/jobs/{job.id}'
+    if job.status == 'completed' and job.kind not in MULTI_FILE_JOB_KINDS:
+        response['audio_url'] = f'/jobs/{job.id}/audio'
+    return response
+
+@app.route('/jobs/topic-audio', methods=['POST'])
+def submit_topic_audio_job():
+    """Queue topic audio generation and return a job id to poll"""
+    try:
+        params, error = parse_topic_audio_request(request.get_json())
+        if error:
+            return jsonify({'error': error}), 400
+        
+        history_id = create_topic_history(params)
+        if not history_id:
+            return jsonify({'error': 'Failed to create history record'}), 500
+        
+        job = job_queue.submit(history_id, 'topic-audio', render_topic_audio, history_id=history_id, **params)
+        return jsonify(job_response(job)), 202
+        
+    except QueueFullError as e:
+        logger.warning(f"Rejecting topic audio job: {e}")
+        return jsonify({'error': 'Too many audio jobs queued, try again later'}), 503
+    except Exception as e:
+        logger.error(f"Error submitting topic audio job: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/jobs/story-narration-merged', methods=['POST'])
+def submit_merged_story_job():
+    """Queue merged story narration and return a job id to poll"""
     try:
         data = request.get_json()
         
@@ -1918,11 +2545,7 @@ def generate_topic_audio():
             return jsonify({'error': 'No JSON data provided'}), 400
             
         text = data.get('text', '').strip()
-        topic_name = data.get('topic_name', 'topic')
-        chapter_name = data.get('chapter_name', 'chapter')
         user_id = data.get('user_id')
-        voice = data.get('voice', 'david').lower()
-        tone = data.get('tone', 'neutral').lower()
         
         if not text:
             return jsonify({'error': 'Text is required'}), 400
@@ -1930,146 +2553,355 @@ def generate_topic_audio():
         if not user_id:
             return jsonify({'error': 'User ID is required'}), 400
         
-        if voice not in VOICE_MAPPING:
-            return jsonify({'error': f'Invalid voice. Available voices: {list(VOICE_MAPPING.keys())}'}), 400
+        history_id = create_merged_story_history(text, user_id)
+        if not history_id:
+            return jsonify({'error': 'Failed to create history record'}), 500
         
-        logger.info(f"Generating topic audio for user {user_id}: {topic_name}")
+        job = job_queue.submit(history_id, 'story-narration-merged', render_merged_story, text, user_id, history_id)
+        return jsonify(job_response(job)), 202
         
-        # Create a history record for this topic
-        history_id = db_manager.save_audio_history(
-            user_id=user_id,
-            original_text=f"{chapter_name} - {topic_name}",
-            rewritten_text=text,
-            tone=tone,
-            voice=voice
+    except QueueFullError as e:
+        logger.warning(f"Rejecting merged story job: {e}")
+        return jsonify({'error': 'Too many audio jobs queued, try again later'}), 503
+    except Exception as e:
+        logger.error(f"Error submitting merged story job: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Poll a job; falls back to the history record for jobs no longer in memory"""
+    try:
+        job = job_queue.get(job_id)
+        if job:
+            return jsonify(job_response(job)), 200
+        
+        history_item = db_manager.get_audio_history_by_id(job_id)
+        if not history_item:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        status = history_item.get('processing_status') or 'pending'
+        response = {'job_id': job_id, 'status': status, 'status_url': f'/jobs/{job_id}'}
+        if status == 'completed' and history_item.get('audio_file_path'):
+            response['audio_url'] = f'/jobs/{job_id}/audio'
+        return jsonify(response), 200
+        
+    except Exception as e:
+        logger.error(f"Error getting job status: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/jobs/<int:job_id>/audio', methods=['GET'])
+def get_job_audio(job_id):
+    """Serve a finished job's audio"""
+    try:
+        history_item = db_manager.get_audio_history_by_id(job_id)
+        if not history_item:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        status = history_item.get('processing_status')
+        if status != 'completed':
+            return jsonify({'error': f'Job is {status}', 'status': status}), 409
+        
+        if not history_item.get('audio_file_path'):
+            return jsonify({'error': 'Job has no single audio file; use the audio_url of each topic in its result'}), 404
+        
+        audio_file_path = stored_audio_path(history_item.get('audio_file_path'))
+        if not audio_file_path:
+            return jsonify({'error': 'Audio file not found on disk'}), 404
+        
+        return send_audio_rendition(
+            audio_file_path,
+            as_attachment=False,
+            download_name=os.path.basename(audio_file_path)
         )
         
-        # Try Hugging Face TTS first
-        audio_data = None
+    except Exception as e:
+        logger.error(f"Error serving job audio: {e}")
+        return jsonify({'error': 'Failed to serve audio file'}), 500
+
+def merge_chapter_files(chapter_files, prefix, timestamp):
+    """Join each chapter's topic audio into one stored WAV
+
+    ``chapter_files`` maps chapter indexes to the topics' uncompressed audio,
+    in order. Returns (chapter_index, audio_key, filename, file_size,
+    mime_type, duration) per merged chapter; a chapter that fails to merge is
+    logged and left out rather than failing the others.
+    """
+    merged = []
+    for chapter_index, paths in sorted(chapter_files.items()):
         file_path = None
-        
         try:
-            audio_data = hf_service.synthesize_speech(text, voice, tone)
-            
-            if audio_data:
-                logger.info("TTS successful with Hugging Face")
-                
-                # Create filename with topic name
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                safe_topic_name = re.sub(r'[^\w\s-]', '', topic_name).strip()
-                safe_topic_name = re.sub(r'[-\s]+', '_', safe_topic_name)
-                filename = f'{safe_topic_name}_{timestamp}.mp3'
-                
-                audio_dir = os.path.join(os.path.dirname(__file__), 'audio_files')
-                os.makedirs(audio_dir, exist_ok=True)
-                file_path = os.path.join(audio_dir, filename)
-                
-                # Save audio file
-                with open(file_path, 'wb') as f:
-                    f.write(audio_data)
-                
-                file_size = len(audio_data)
-                
+            merger = WavConcatenator(pause_ms=800)
+            for path in paths:
+                try:
+                    with open(path, 'rb') as f:
+                        merger.add(f.read())
+                except (ValueError, OSError) as e:
+                    logger.warning(f"Leaving {os.path.basename(path)} out of the chapter merge: {e}")
+            if not merger.segment_count:
+                continue
+            filename = f'{prefix}_chapter_{chapter_index + 1:02d}_{timestamp}.wav'
+            file_path = audio_work_path(filename)
+            merger.write(file_path)
+            merged.append((chapter_index, *store_audio_file(file_path, filename), merger.duration_seconds))
         except Exception as e:
-            logger.warning(f"Hugging Face TTS error: {e}, trying Watson fallback")
+            logger.error(f"Failed to merge chapter {chapter_index + 1}: {e}")
+            if file_path:
+                remove_quietly(file_path)
+    return merged
+
+def render_study_material(material, user_id, voice, tone, merge_chapters, progress):
+    """Render every topic of a study material to audio, plus optional merged chapter files
+
+    Topics are synthesized STUDY_RENDER_CONCURRENCY at a time. Their history
+    rows are created with one multi-row INSERT, and status updates and
+    download records are committed in batches as results arrive (and on the
+    way out if the job fails, with unreached topics marked failed).
+    Returns (payload, status_code).
+    """
+    chapters = material.get('chapters') or []
+    if isinstance(chapters, (str, bytes)):
+        chapters = json.loads(chapters)
+    
+    topics = [
+        (chapter_index, chapter.get('title') or f'Chapter {chapter_index + 1}', topic_index, topic)
+        for chapter_index, chapter in enumerate(chapters)
+        for topic_index, topic in enumerate(chapter.get('topics') or [])
+        if (topic.get('content') or '').strip()
+    ]
+    if not topics:
+        return {'error': 'Study material has no topics to render'}, 400
+    
+    history_ids = db_manager.save_audio_history_batch(user_id, [
+        {
+            'original_text': f"{chapter_title} - {topic.get('name', 'topic')}",
+            'rewritten_text': topic['content'],
+            'tone': tone,
+            'voice': voice
+        }
+        for _, chapter_title, _, topic in topics
+    ])
+    if not history_ids:
+        return {'error': 'Failed to create history records'}, 500
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    prefix = safe_filename_part(material.get('title') or '')[:40] or 'material'
+    progress(total=len(topics), completed=0, failed=0)
+    
+    def render_topic(task):
+        chapter_index, _, topic_index, topic = task
+        blob_path, engine, cache_hit = synthesize_audio_cached(topic['content'], voice, tone)
+        if not blob_path:
+            raise RuntimeError('TTS service not available')
+        extension = os.path.splitext(blob_path)[1] or '.wav'
+        topic_part = safe_filename_part(topic.get('name') or 'topic')[:40]
+        filename = f'{prefix}_{chapter_index + 1:02d}_{topic_index + 1:02d}_{topic_part}_{timestamp}{extension}'
+        file_path = audio_work_path(filename)
+        audio_cache.link(storable_blob(blob_path), file_path)
+        # Chapter merges need the uncompressed audio, which store_audio_file drops
+        merge_path = None
+        if merge_chapters:
+            merge_path = file_path + '.merge'
+            audio_cache.link(blob_path, merge_path)
+        return store_audio_file(file_path, filename) + (merge_path, cache_hit)
+    
+    # Rows waiting for the next batched commit
+    status_updates = []
+    downloads = []
+    
+    def flush():
+        db_manager.update_audio_history_status_batch(status_updates)
+        db_manager.save_downloads_batch(user_id, downloads)
+        status_updates.clear()
+        downloads.clear()
+    
+    topic_results = []
+    chapter_results = []
+    chapter_files = {}
+    failed = 0
+    queued = 0  # topics whose row update is queued
+    results = study_render_executor.imap_ordered(render_topic, topics)
+    try:
+        for index, ((chapter_index, chapter_title, _, topic), (rendered, error)) in enumerate(zip(topics, results)):
+            history_id = history_ids[index]
+            topic_result = {'chapter': chapter_title, 'topic_name': topic.get('name'), 'history_id': history_id}
+            
+            if error:
+                failed += 1
+                logger.error(f"Failed to render topic {index + 1} of material {material['id']}: {error}")
+                status_updates.append((history_id, 'failed', None))
+                topic_result.update({'success': False, 'error': str(error)})
+            else:
+                audio_key, filename, file_size, mime_type, merge_path, cache_hit = rendered
+                status_updates.append((history_id, 'completed', audio_key))
+                downloads.append({
+                    'history_id': history_id,
+                    'original_filename': f"{safe_filename_part(topic.get('name') or 'topic')}{extension_for(mime_type)}",
+                    'stored_filename': filename,
+                    'file_path': audio_key,
+                    'file_size': file_size,
+                    'mime_type': mime_type
+                })
+                if merge_path:
+                    chapter_files.setdefault(chapter_index, []).append(merge_path)
+                topic_result.update({'success': True, 'audio_url': f'/download-audio/{audio_key}',
+                                     'file_size': file_size, 'cached': cache_hit})
+            queued = index + 1
+            
+            topic_results.append(topic_result)
+            if len(status_updates) >= STUDY_RENDER_DB_BATCH:
+                flush()
+            progress(completed=index + 1, failed=failed)
+        
+        if failed == len(topics):
+            return {'error': 'Failed to generate any topic audio'}, 500
+        
+        # Optionally join each chapter's topics into one file
+        if merge_chapters:
+            progress(stage='merging')
+            merged = merge_chapter_files(chapter_files, prefix, timestamp)
+            
+            merged_ids = db_manager.save_audio_history_batch(user_id, [
+                {
+                    'original_text': f"{chapters[chapter_index].get('title') or f'Chapter {chapter_index + 1}'} (Full Chapter)",
+                    'rewritten_text': f'Merged audio of {len(chapter_files[chapter_index])} topics',
+                    'tone': tone,
+                    'voice': voice,
+                    'audio_file_path': audio_key
+                }
+                for chapter_index, audio_key, _, _, _, _ in merged
+            ]) or [None] * len(merged)
+            
+            for history_id, (chapter_index, audio_key, filename, file_size, mime_type, duration) in zip(merged_ids, merged):
+                if history_id:
+                    status_updates.append((history_id, 'completed', audio_key))
+                    downloads.append({
+                        'history_id': history_id,
+                        'original_filename': f'chapter_{chapter_index + 1}{extension_for(mime_type)}',
+                        'stored_filename': filename,
+                        'file_path': audio_key,
+                        'file_size': file_size,
+                        'mime_type': mime_type
+                    })
+                chapter_results.append({
+                    'chapter': chapters[chapter_index].get('title'),
+                    'history_id': history_id,
+                    'audio_url': f'/download-audio/{audio_key}',
+                    'file_size': file_size,
+                    'duration': duration
+                })
+    
+    except Exception:
+        # Topics the loop never reached won't be rendered now
+        status_updates.extend((history_id, 'failed', None) for history_id in history_ids[queued:])
+        raise
+    
+    finally:
+        # Record what was rendered even when the job fails, so stored audio isn't orphaned
+        results.close()
+        for path in itertools.chain.from_iterable(chapter_files.values()):
+            remove_quietly(path)
+        flush()
+    
+    progress(stage='done')
+    
+    return {
+        'success': True,
+        'material_id': material['id'],
+        'title': material.get('title'),
+        'topics': topic_results,
+        'chapters': chapter_results,
+        'rendered': len(topics) - failed,
+        'failed': failed
+    }, 200
+
+@app.route('/jobs/study-material-audio', methods=['POST'])
+def submit_study_material_job():
+    """Queue audio for every topic of a processed study material"""
+    try:
+        data = request.get_json()
         
-        # Fallback to Watson TTS if Hugging Face failed
-        if not audio_data and tts:
-            try:
-                watson_voice = VOICE_MAPPING[voice]
-                
-                response = tts.synthesize(
-                    text=text,
-                    voice=watson_voice,
-                    accept='audio/wav;rate=22050',
-                    rate_percentage=0,
-                    pitch_percentage=0,
-                    volume_percentage=0
-                ).get_result()
-                
-                # Create filename with topic name
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                safe_topic_name = re.sub(r'[^\w\s-]', '', topic_name).strip()
-                safe_topic_name = re.sub(r'[-\s]+', '_', safe_topic_name)
-                filename = f'{safe_topic_name}_{timestamp}_watson.wav'
-                
-                audio_dir = os.path.join(os.path.dirname(__file__), 'audio_files')
-                os.makedirs(audio_dir, exist_ok=True)
-                file_path = os.path.join(audio_dir, filename)
-                
-                # Save audio file
-                with open(file_path, 'wb') as f:
-                    f.write(response.content)
-                
-                file_size = len(response.content)
-                audio_data = response.content
-                
-            except Exception as e:
-                logger.error(f"Watson TTS error: {e}")
-                return jsonify({'error': 'Failed to generate audio'}), 500
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
         
-        if not audio_data:
-            return jsonify({'error': 'TTS service not available'}), 503
+        material_id = data.get('material_id')
+        user_id = data.get('user_id')
+        voice = data.get('voice', 'david').lower()
+        tone = data.get('tone', 'neutral').lower()
         
-        # Update database with audio file info
-        try:
-            db_manager.update_audio_history_status(history_id, 'completed', file_path)
-            
-            # Save download record
-            download_id = db_manager.save_download(
-                user_id=user_id,
-                history_id=history_id,
-                original_filename=f'{safe_topic_name}.mp3',
-                stored_filename=filename,
-                file_path=file_path,
-                file_size=file_size,
-                mime_type='audio/mpeg' if filename.endswith('.mp3') else 'audio/wav'
-            )
-            
-        except Exception as e:
-            logger.warning(f"Failed to update database: {e}")
+        if not material_id:
+            return jsonify({'error': 'Material ID is required'}), 400
         
-        # Return JSON with audio URL
-        audio_url = f'/download-audio/{filename}'
+        if not user_id:
+            return jsonify({'error': 'User ID is required'}), 400
         
-        return jsonify({
-            'success': True,
-            'audio_url': audio_url,
-            'filename': filename,
-            'file_size': file_size,
-            'topic_name': topic_name,
-            'chapter_name': chapter_name
-        })
+        if voice not in VOICE_MAPPING:
+            return jsonify({'error': f'Invalid voice. Available voices: {list(VOICE_MAPPING.keys())}'}), 400
         
+        material = db_manager.get_study_material(material_id, user_id)
+        if not material:
+            return jsonify({'error': 'Study material not found'}), 404
+        
+        # The job's own history record stands for the whole audiobook
+        history_id = db_manager.save_audio_history(
+            user_id=user_id,
+            original_text=material.get('title') or f'Study material {material_id}',
+            rewritten_text="Study Material Audiobook",
+            tone=tone,
+            voice=voice
+        )
+        if not history_id:
+            return jsonify({'error': 'Failed to create history record'}), 500
+        
+        job = job_queue.submit(history_id, 'study-material-audio', render_study_material,
+                               material, user_id, voice, tone, bool(data.get('merge_chapters')),
+                               report_progress=True)
+        return jsonify(job_response(job)), 202
+        
+    except QueueFullError as e:
+        logger.warning(f"Rejecting study material job: {e}")
+        return jsonify({'error': 'Too many audio jobs queued, try again later'}), 503
     except Exception as e:
-        logger.error(f"Error in topic audio generation endpoint: {e}")
+        logger.error(f"Error submitting study material job: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
-def extract_text_from_pdf(file_path):
-    """Extract text from PDF file with enhanced error handling"""
+def extract_text_from_pdf(file_path, progress=None, details=None):
+    """Extract text from PDF file with enhanced error handling
+
+    Pages are extracted in parallel within the PDF_MAX_PAGES / PDF_EXTRACT_TIME_BUDGET
+    limits; ``progress(pages_done, pages_total)`` is called as pages arrive. If a
+    ``details`` dict is given, it is filled with the page counts, whether the
+    page or time budget cut extraction short, and ``complete``: whether every
+    page was read (False after errors, truncation or a timeout).
+    """
+    if details is not None:
+        details['complete'] = False
     try:
-        text = ""
         logger.info(f"Attempting to extract text from PDF: {file_path}")
         
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            logger.info(f"PDF has {len(pdf_reader.pages)} pages")
-            
-            if len(pdf_reader.pages) == 0:
-                raise Exception("PDF has no pages")
-            
-            for i, page in enumerate(pdf_reader.pages):
-                try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                        logger.info(f"Extracted {len(page_text)} characters from page {i+1}")
-                    else:
-                        logger.warning(f"No text found on page {i+1}")
-                except Exception as page_error:
-                    logger.warning(f"Error extracting text from page {i+1}: {page_error}")
-                    continue
-            
+        def log_progress(done, total):
+            if done == total or done % 25 == 0:
+                logger.info(f"Extracted {done}/{total} PDF pages")
+            if details is not None:
+                details.update(pages_done=done, pages_total=total)
+            if progress:
+                progress(done, total)
+        
+        result = pdf_extractor.extract(file_path, progress=log_progress)
+        logger.info(f"PDF has {result.page_count} pages")
+        if details is not None:
+            details.update(
+                page_count=result.page_count,
+                pages_extracted=result.pages_extracted,
+                pages_failed=result.pages_failed,
+                truncated=result.truncated,
+                timed_out=result.timed_out,
+                complete=not (result.pages_failed or result.truncated or result.timed_out)
+            )
+        
+        if result.page_count == 0:
+            raise Exception("PDF has no pages")
+        
+        text = result.text
         logger.info(f"Total extracted text length: {len(text)} characters")
         
         # If no text was extracted, it might be a scanned PDF
@@ -2086,17 +2918,38 @@ def extract_text_from_pdf(file_path):
         return f"Unable to extract text from this PDF file. Error: {str(e)}. Please try uploading a different format (Word or text file)."
 
 def extract_text_from_word(file_path):
-    """Extract text from Word document"""
+    """Extract text from Word document (a path or a seekable binary stream)"""
     try:
         doc = docx.Document(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        return ''.join(paragraph.text + "\n" for paragraph in doc.paragraphs)
     except Exception as e:
         logger.error(f"Error extracting text from Word document: {e}")
         raise e
 
+def study_material_title(text, filename):
+    """Title from the first line if it names a chapter/unit/lesson/part, else from the filename"""
+    title = os.path.splitext(filename)[0].replace('_', ' ').replace('-', ' ').title()
+    first_line = first_study_line(text)
+    if len(first_line) < 100 and any(word in first_line.lower() for word in ['chapter', 'unit', 'lesson', 'part']):
+        title = first_line
+    return title
+
+def retitle_study_material(material, text, filename):
+    """A cached material re-titled for a new upload's filename
+
+    When no chapters were detected the single chapter carries the title too.
+    """
+    title = study_material_title(text, filename)
+    if title == material['title']:
+        return material
+    material = dict(material)
+    material['chapters'] = [
+        dict(chapter, title=title) if chapter['title'] == material['title'] else chapter
+        for chapter in material['chapters']
+    ]
+    material['title'] = title
+    return material
+
 def process_study_content(text, filename):
     """Process study content into chapters and topics"""
     try:
@@ -2104,54 +2957,13 @@ def process_study_content(text, filename):
         text = text.strip()
         
         # Extract title from filename or first line
-        title = os.path.splitext(filename)[0].replace('_', ' ').replace('-', ' ').title()
-        if len(text.split('\n')) > 0:
-            first_line = text.split('\n')[0].strip()
-            if len(first_line) < 100 and any(word in first_line.lower() for word in ['chapter', 'unit', 'lesson', 'part']):
-                title = first_line
-        
-        # Split into chapters
-        chapters = []
-        
-        # Try to detect chapter patterns
-        chapter_patterns = [
-            r'chapter\s+\d+[:\.]?\s*(.+?)(?=\n|$)',
-            r'unit\s+\d+[:\.]?\s*(.+?)(?=\n|$)',
-            r'lesson\s+\d+[:\.]?\s*(.+?)(?=\n|$)',
-            r'part\s+\d+[:\.]?\s*(.+?)(?=\n|$)',
-            r'\d+\.\s*(.+?)(?=\n|$)'
-        ]
+        title = study_material_title(text, filename)
         
-        chapter_splits = []
-        for pattern in chapter_patterns:
-            matches = list(re.finditer(pattern, text, re.IGNORECASE | re.MULTILINE))
-            if len(matches) >= 2:  # Need at least 2 chapters
-                chapter_splits = matches
-                break
-        
-        if chapter_splits:
-            # Process detected chapters
-            for i, match in enumerate(chapter_splits):
-                chapter_title = match.group(1).strip()
-                start_pos = match.end()
-                end_pos = chapter_splits[i + 1].start() if i + 1 < len(chapter_splits) else len(text)
-                chapter_content = text[start_pos:end_pos].strip()
-                
-                if chapter_content:
-                    topics = extract_topics_from_chapter(chapter_content)
-                    chapters.append({
-                        'title': chapter_title,
-                        'summary': generate_chapter_summary(chapter_content),
-                        'topics': topics
-                    })
-        else:
-            # No clear chapters found, create one chapter and extract topics
-            topics = extract_topics_from_chapter(text)
-            chapters.append({
-                'title': title,
-                'summary': generate_chapter_summary(text),
-                'topics': topics
-            })
+        # Split into chapters (single scan over the text; see study_segmentation)
+        heading_kind, chapter_nodes = segment_study_text(text, title)
+        if heading_kind:
+            logger.info(f"Detected {len(chapter_nodes)} chapters from '{heading_kind}' headings")
+        chapters = [chapter.to_dict() for chapter in chapter_nodes]
         
         # Calculate word count
         word_count = len(text.split())
@@ -2167,70 +2979,18 @@ def process_study_content(text, filename):
         logger.error(f"Error processing study content: {e}")
         raise e
 
-def extract_topics_from_chapter(chapter_content):
-    """Extract topics from chapter content"""
-    try:
-        topics = []
-        
-        # Try to detect topic patterns
-        topic_patterns = [
-            r'(?:^|\n)\s*(\d+\.\d+\.?\s*.+?)(?=\n|$)',  # 1.1, 1.2, etc.
-            r'(?:^|\n)\s*([A-Z][^.!?]*[.!?])(?=\s*\n)',  # Sentences that might be headers
-            r'(?:^|\n)\s*([A-Z][A-Za-z\s]+)(?=\n\n)',    # Lines followed by double newline
-        ]
-        
-        # Split by paragraphs as fallback
-        paragraphs = [p.strip() for p in chapter_content.split('\n\n') if p.strip()]
-        
-        if len(paragraphs) <= 3:
-            # For short content, create one topic
-            topics.append({
-                'name': 'Main Content',
-                'content': chapter_content.strip()
-            })
-        else:
-            # For longer content, try to create meaningful topics
-            topic_size = max(2, len(paragraphs) // 5)  # Create 5 topics max
-            
-            for i in range(0, len(paragraphs), topic_size):
-                topic_paragraphs = paragraphs[i:i + topic_size]
-                topic_content = '\n\n'.join(topic_paragraphs)
-                
-                # Generate topic name from first sentence or paragraph
-                first_sentence = topic_paragraphs[0].split('.')[0].strip()
-                if len(first_sentence) > 60:
-                    first_sentence = first_sentence[:60] + "..."
-                
-                topic_name = f"Topic {len(topics) + 1}: {first_sentence}"
-                
-                topics.append({
-                    'name': topic_name,
-                    'content': topic_content
-                })
-        
-        return topics
-        
-    except Exception as e:
-        logger.error(f"Error extracting topics: {e}")
-        # Fallback: return the entire content as one topic
-        return [{
-            'name': 'Main Content',
-            'content': chapter_content
-        }]
-
-def generate_chapter_summary(content):
-    """Generate a brief summary of chapter content"""
-    try:
-        # Simple summary: first 200 characters
-        summary = content.strip()[:200]
-        if len(content) > 200:
-            summary += "..."
-        return summary
-    except:
-        return "Chapter content available for audio generation."
+def start_background_tasks():
+    """Start the periodic maintenance threads; called by the server entry points, never on import"""
+    if AUDIO_GC_INTERVAL_MINUTES > 0:
+        audio_sweeper.start(AUDIO_GC_INTERVAL_MINUTES * 60)
+    if METRICS_ROLLUP_INTERVAL_SECONDS > 0:
+        metrics_rollup.start(METRICS_ROLLUP_INTERVAL_SECONDS)
 
 if __name__ == '__main__':
     logger.info("Starting EchoVerse backend server...")
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') != 'production'
+    # With the debug reloader only the serving child runs the tasks, not the watcher process
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_tasks()
     app.run(host='0.0.0.0', port=port, debug=debug)
@@ -0,0 +1,236 @@
+"""
+Content-addressed cache for synthesized speech
+
+Blobs are stored under a cache directory, named by a SHA-256 of the
+normalized text, voice, tone and engine/model id. An in-memory LRU index
+tracks blob sizes so the on-disk store can be kept under a byte budget.
+Callers hard-link blobs to their own per-user filenames, so evicting a blob
+never breaks a file that a history or download row still points at. A blob's
+mtime is when it was written and its atime when it was last used, so lookups
+can ignore stale renditions of some engines (see lookup's max_age).
+"""
+
+import os
+import re
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Magic bytes -> file extension for the audio formats our engines return
+AUDIO_SIGNATURES = (
+    (b'RIFF', 'wav'),
+    (b'ID3', 'mp3'),
+    (b'\xff\xfb', 'mp3'),
+    (b'\xff\xf3', 'mp3'),
+    (b'\xff\xf2', 'mp3'),
+    (b'fLaC', 'flac'),
+    (b'OggS', 'ogg'),
+)
+AUDIO_EXTENSIONS = ('wav', 'mp3', 'flac', 'ogg', 'm4a', 'bin')
+
+
+def sniff_audio_format(data: bytes) -> str:
+    """Guess the container format of audio bytes from their magic number"""
+    for signature, ext in AUDIO_SIGNATURES:
+        if data.startswith(signature):
+            return ext
+    if data[4:8] == b'ftyp':  # MP4/M4A container
+        return 'm4a'
+    return 'bin'
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry"""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', text or '')).strip()
+
+
+class AudioCache:
+    """Size-bounded LRU store of synthesized audio keyed by content hash"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024, max_entries: int = 5000):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._index = OrderedDict()  # key -> (path, size), least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'evicted_bytes': 0}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(text: str, voice: str, tone: str, engine: str) -> str:
+        """Hash of normalized text + voice + tone + engine/model id"""
+        material = '\x1f'.join([
+            normalize_text(text),
+            (voice or '').lower(),
+            (tone or '').lower(),
+            engine or ''
+        ])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _load_index(self):
+        """Rebuild the LRU index from blobs left on disk by earlier runs"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            key, _, ext = name.partition('.')
+            if len(key) != 64 or ext not in AUDIO_EXTENSIONS:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_atime, key, path, stat.st_size))
+
+        for _, key, path, size in sorted(entries):
+            self._index[key] = (path, size)
+            self._total_bytes += size
+        self._evict()
+        logger.info(f"Audio cache loaded {len(self._index)} blobs ({self._total_bytes} bytes)")
+
+    def _find(self, key: str) -> Optional[str]:
+        """Return the blob path for a key, picking up blobs written by other processes"""
+        entry = self._index.get(key)
+        if entry:
+            if os.path.exists(entry[0]):
+                self._index.move_to_end(key)
+                return entry[0]
+            # Blob vanished underneath us (manual cleanup, another process evicted it)
+            self._index.pop(key)
+            self._total_bytes -= entry[1]
+            return None
+
+        for ext in AUDIO_EXTENSIONS:
+            path = os.path.join(self.cache_dir, f'{key}.{ext}')
+            if os.path.exists(path):
+                size = os.path.getsize(path)
+                self._index[key] = (path, size)
+                self._total_bytes += size
+                return path
+        return None
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a blob by key, counting a hit or miss"""
+        with self._lock:
+            path = self._find(key)
+            self._stats['hits' if path else 'misses'] += 1
+        if path:
+            self._touch(path)
+        return path
+
+    def lookup(self, text: str, voice: str, tone: str, engines: Iterable[str],
+               max_age: Optional[Dict[str, float]] = None) -> Tuple[Optional[str], Optional[str]]:
+        """Find a cached rendition from any of the given engines, in preference order
+
+        ``max_age`` maps engines to the seconds their renditions stay usable
+        (renditions of other engines never go stale); a stale rendition is
+        passed over, and replaced when the text is synthesized again. Returns
+        (blob_path, engine) or (None, None). Counts as a single hit or miss.
+        """
+        max_age = max_age or {}
+        with self._lock:
+            for engine in engines:
+                path = self._find(self.make_key(text, voice, tone, engine))
+                if path and engine in max_age and self._age(path) > max_age[engine]:
+                    path = None
+                if path:
+                    self._stats['hits'] += 1
+                    break
+            else:
+                self._stats['misses'] += 1
+                return None, None
+        self._touch(path)
+        return path, engine
+
+    def put(self, key: str, data: bytes) -> str:
+        """Store audio bytes under a key and return the blob path"""
+        path = os.path.join(self.cache_dir, f'{key}.{sniff_audio_format(data)}')
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            previous = self._index.pop(key, None)
+            if previous:
+                self._total_bytes -= previous[1]
+            self._index[key] = (path, len(data))
+            self._total_bytes += len(data)
+            self._stats['stores'] += 1
+            self._evict(keep=key)
+        return path
+
+    def _evict(self, keep: Optional[str] = None):
+        """Drop least recently used blobs until the store is back under budget"""
+        while self._index and (self._total_bytes > self.max_bytes or len(self._index) > self.max_entries):
+            key, (path, size) = next(iter(self._index.items()))
+            if key == keep:
+                break
+            self._index.pop(key)
+            self._total_bytes -= size
+            self._stats['evictions'] += 1
+            self._stats['evicted_bytes'] += size
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove evicted cache blob {path}: {e}")
+
+    @staticmethod
+    def _age(path: str) -> float:
+        """Seconds since the blob was written"""
+        try:
+            return time.time() - os.stat(path).st_mtime
+        except OSError:
+            return float('inf')
+
+    @staticmethod
+    def _touch(path: str):
+        """Bump the blob atime (keeping mtime, the write time) so LRU order survives restarts"""
+        try:
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        except OSError:
+            pass
+
+    @staticmethod
+    def read(path: str) -> bytes:
+        """Read a cached blob"""
+        with open(path, 'rb') as f:
+            return f.read()
+
+    @staticmethod
+    def link(blob_path: str, dest_path: str) -> int:
+        """Expose a blob under another filename without copying its bytes
+
+        Uses a hard link so the destination outlives cache eviction; falls back
+        to a copy on filesystems without hard link support. Returns the file size.
+        """
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(blob_path, dest_path)
+        except OSError:
+            shutil.copyfile(blob_path, dest_path)
+        return os.path.getsize(dest_path)
+
+    def stats(self) -> dict:
+        """Snapshot of hit/miss counters and store size"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+            stats['entries'] = len(self._index)
+            stats['bytes'] = self._total_bytes
+            stats['max_bytes'] = self.max_bytes
+            return stats
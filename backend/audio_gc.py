@@ -0,0 +1,258 @@
+"""
+Retention and garbage collection for generated audio
+
+A sweep lists what audio storage holds and every reference in audio_history
+and downloads (read a page of rows at a time, by id), then:
+
+- deletes download rows whose file is gone (history rows are kept and
+  only counted, since their text is still useful; files stored or moved
+  after the listing are checked for before their rows go),
+- deletes stored files no row points at, once they are older than a grace
+  period (so files between "written" and "recorded" are left alone; this
+  also clears leftover .tmp/.merge files and on-demand transcoder renditions),
+- deletes history rows, with their downloads and files, that are older than
+  the retention period,
+- deletes each user's oldest history rows until their stored audio fits the
+  per-user quota, and
+- deletes stale temporary files (failed segment and chapter merges,
+  interrupted writes, upload spools).
+
+Every pass reports files and bytes reclaimed. A dry run reports the same
+without deleting anything. Sweeps are idempotent, so overlapping sweeps
+from several workers are harmless.
+"""
+
+import os
+import time
+import fnmatch
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator
+
+from audio_storage import key_for
+
+logger = logging.getLogger(__name__)
+
+# Temporary files safe to delete once they are older than temp_max_age
+TEMP_PATTERNS = ('temp_segment_*', 'upload-*', 'work-*', '*.tmp', '*.merge')
+
+
+def _tally():
+    return {'files': 0, 'bytes': 0}
+
+
+class AudioSweeper:
+    """Reconciles stored audio with the database and enforces retention"""
+
+    def __init__(self, db, storage, temp_dirs: Iterable[str] = (), ignored_prefixes: Iterable[str] = (),
+                 retention_days: float = 0, user_quota_bytes: int = 0,
+                 orphan_grace_seconds: float = 3600, temp_max_age_seconds: float = 3600,
+                 reference_page_size: int = 1000):
+        self.db = db
+        self.storage = storage
+        self.temp_dirs = list(temp_dirs)
+        self.ignored_prefixes = tuple(ignored_prefixes)
+        self.retention_days = retention_days
+        self.user_quota_bytes = user_quota_bytes
+        self.orphan_grace_seconds = orphan_grace_seconds
+        self.temp_max_age_seconds = temp_max_age_seconds
+        self.reference_page_size = max(1, reference_page_size)
+        self._sweep_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._totals = {'sweeps': 0, 'reclaimed_files': 0, 'reclaimed_bytes': 0, 'errors': 0}
+        self.last_report = None
+
+    def sweep(self, dry_run: bool = False) -> Dict:
+        """Run one pass; returns a report of what was (or, in a dry run, would be) deleted"""
+        with self._sweep_lock:
+            started = time.time()
+            report = {
+                'dry_run': dry_run,
+                'missing_files': {'downloads': 0, 'history': 0},
+                'orphans': _tally(),
+                'expired': _tally(),
+                'over_quota': _tally(),
+                'temp_files': _tally(),
+                'errors': 0
+            }
+            try:
+                self._sweep_storage(report, started, dry_run)
+            except Exception as e:
+                # Without a complete picture of the references nothing else is safe to delete
+                logger.error(f"Audio sweep aborted: {e}")
+                report['errors'] += 1
+                report['aborted'] = str(e)
+            self._sweep_temp(report, started, dry_run)
+
+            report['reclaimed_files'] = sum(report[part]['files'] for part in ('orphans', 'expired', 'over_quota', 'temp_files'))
+            report['reclaimed_bytes'] = sum(report[part]['bytes'] for part in ('orphans', 'expired', 'over_quota', 'temp_files'))
+            report['started_at'] = started
+            report['duration_seconds'] = round(time.time() - started, 3)
+            if not dry_run:
+                self._totals['sweeps'] += 1
+                self._totals['reclaimed_files'] += report['reclaimed_files']
+                self._totals['reclaimed_bytes'] += report['reclaimed_bytes']
+                self._totals['errors'] += report['errors']
+            self.last_report = report
+            logger.info(f"Audio sweep{' (dry run)' if dry_run else ''}: {report['reclaimed_files']} files, "
+                        f"{report['reclaimed_bytes']} bytes reclaimed in {report['duration_seconds']}s")
+            return report
+
+    def _delete_key(self, key, stored, tally, report, dry_run):
+        size = stored.pop(key, (0, 0))[0]
+        if not dry_run:
+            try:
+                self.storage.delete(key)
+            except Exception as e:
+                logger.warning(f"Could not delete audio {key}: {e}")
+                report['errors'] += 1
+                return
+        tally['files'] += 1
+        tally['bytes'] += size
+
+    def _iter_references(self) -> Iterator[Dict]:
+        """Every audio reference, paged through each table by id"""
+        for table in ('audio_history', 'downloads'):
+            after_id = 0
+            while True:
+                rows = self.db.get_audio_references(table, after_id, self.reference_page_size)
+                if not rows:
+                    break
+                yield from rows
+                after_id = rows[-1]['id']
+
+    def _sweep_storage(self, report, now, dry_run):
+        stored = {
+            key: (size, mtime)
+            for key, size, mtime in self.storage.iter_keys()
+            if not key.startswith(self.ignored_prefixes)
+        }
+
+        # Group references by history row: its user, age and the keys it owns
+        histories = {}
+        missing_downloads = []
+        for row in self._iter_references():
+            if not stored:
+                # More likely an unmounted or misconfigured store than every file being gone
+                raise RuntimeError("audio storage lists no files but rows reference audio")
+            try:
+                key = key_for(row['ref'])
+            except ValueError:
+                key = None
+            history = histories.setdefault(row['history_id'], {'user_id': row['user_id'], 'created_at': row['created_at'], 'keys': set()})
+            if row['created_at'] and (history['created_at'] is None or row['created_at'] < history['created_at']):
+                history['created_at'] = row['created_at']
+            if key in stored:
+                history['keys'].add(key)
+            elif row['download_id'] is not None and not (key and self.storage.exists(key)):
+                # (a file stored after the listing was taken exists but isn't listed)
+                missing_downloads.append(row['download_id'])
+            else:
+                report['missing_files']['history'] += 1
+
+        report['missing_files']['downloads'] = len(missing_downloads)
+        if missing_downloads and not dry_run:
+            self.db.delete_downloads_batch(missing_downloads)
+
+        # Orphans: stored, unreferenced, and past the grace period
+        referenced = set().union(*(history['keys'] for history in histories.values())) if histories else set()
+        for key, (size, mtime) in list(stored.items()):
+            if key not in referenced and now - mtime > self.orphan_grace_seconds:
+                self._delete_key(key, stored, report['orphans'], report, dry_run)
+
+        # Retention: history older than the cutoff goes with its downloads and files
+        expired = []
+        if self.retention_days:
+            cutoff = now - self.retention_days * 86400
+            expired = [
+                history_id for history_id, history in histories.items()
+                if history['created_at'] is not None and history['created_at'].timestamp() < cutoff
+            ]
+        # (files are deleted after their rows, so a failed commit never leaves rows without files)
+        doomed = [(key, report['expired']) for history_id in expired for key in histories.pop(history_id)['keys']]
+
+        # Quotas: each user's oldest history goes first until the rest fits
+        over_quota = []
+        if self.user_quota_bytes:
+            by_user = {}
+            for history_id, history in histories.items():
+                by_user.setdefault(history['user_id'], []).append((history['created_at'], history_id))
+            for user_id, entries in by_user.items():
+                usage = sum(stored.get(key, (0, 0))[0] for _, history_id in entries for key in histories[history_id]['keys'])
+                if usage <= self.user_quota_bytes:
+                    continue
+                logger.info(f"User {user_id} has {usage} bytes of audio, over the {self.user_quota_bytes} byte quota")
+                for _, history_id in sorted(entries, key=lambda entry: (entry[0] or datetime.max, entry[1])):
+                    if usage <= self.user_quota_bytes:
+                        break
+                    over_quota.append(history_id)
+                    for key in histories[history_id]['keys']:
+                        usage -= stored.get(key, (0, 0))[0]
+                        doomed.append((key, report['over_quota']))
+
+        if not dry_run:
+            self.db.delete_audio_history_batch(expired + over_quota)
+        for key, tally in doomed:
+            if key in stored:
+                self._delete_key(key, stored, tally, report, dry_run)
+
+    def _sweep_temp(self, report, now, dry_run):
+        tally = report['temp_files']
+        for temp_dir in self.temp_dirs:
+            if not os.path.isdir(temp_dir):
+                continue
+            for name in os.listdir(temp_dir):
+                if not any(fnmatch.fnmatch(name, pattern) for pattern in TEMP_PATTERNS):
+                    continue
+                path = os.path.join(temp_dir, name)
+                try:
+                    stat = os.stat(path)
+                    if not os.path.isfile(path) or now - stat.st_mtime <= self.temp_max_age_seconds:
+                        continue
+                    if not dry_run:
+                        os.remove(path)
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    logger.warning(f"Could not delete temporary file {path}: {e}")
+                    report['errors'] += 1
+                    continue
+                tally['files'] += 1
+                tally['bytes'] += stat.st_size
+
+    def start(self, interval_seconds: float):
+        """Sweep every ``interval_seconds`` on a daemon thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"Audio sweep failed: {e}")
+
+        self._thread = threading.Thread(target=run, name='audio-sweeper', daemon=True)
+        self._thread.start()
+        logger.info(f"Audio sweeper running every {interval_seconds}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> Dict:
+        stats = dict(self._totals)
+        stats.update({
+            'running': self._thread is not None,
+            'retention_days': self.retention_days,
+            'user_quota_bytes': self.user_quota_bytes,
+            'last_sweep': self.last_report and {
+                key: self.last_report[key] for key in ('started_at', 'reclaimed_files', 'reclaimed_bytes', 'errors')
+            }
+        })
+        return stats
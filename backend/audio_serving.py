@@ -0,0 +1,102 @@
+"""
+Byte-range and conditional serving for generated audio files
+
+Every audio endpoint goes through send_audio_file, which lets Werkzeug
+answer Range/If-Range requests with 206 partial content and If-None-Match /
+If-Modified-Since with 304, so seeking in the player or resuming a download
+only transfers the bytes that are actually needed. The ETag is a SHA-256 of
+the file's contents, computed once per file version (device, inode, size,
+mtime) and remembered, so hard-linked copies of the same cached blob share it.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from flask import Response, send_file
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentETags:
+    """LRU of file version -> content hash"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (dev, ino, size, mtime_ns) -> hexdigest
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def etag_for(self, path: str, stat: Optional[os.stat_result] = None) -> str:
+        stat = stat or os.stat(path)
+        version = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            etag = self._entries.get(version)
+            if etag is not None:
+                self._entries.move_to_end(version)
+                self._stats['hits'] += 1
+                return etag
+            self._stats['misses'] += 1
+
+        # Hash outside the lock; two requests racing on a new file both hash it once
+        etag = hash_file(path)
+        with self._lock:
+            self._entries[version] = etag
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+
+def send_audio_file(path: str, mimetype: str, as_attachment: bool = False,
+                    download_name: Optional[str] = None, etags: Optional[ContentETags] = None) -> Response:
+    """send_file with a content-hash ETag and Range, If-Range and conditional GET support
+
+    Returns 200 with the whole file, 206 with the requested range, 304 when
+    the client's copy is current, or 416 for a range outside the file.
+    """
+    stat = os.stat(path)
+    etag = (etags or content_etags).etag_for(path, stat)
+    try:
+        return send_file(
+            path,
+            mimetype=mimetype,
+            as_attachment=as_attachment,
+            download_name=download_name,
+            conditional=True,
+            etag=etag,
+            last_modified=stat.st_mtime
+        )
+    except RequestedRangeNotSatisfiable as e:
+        response = e.get_response()
+        response.headers['Content-Range'] = f'bytes */{stat.st_size}'
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
+
+
+def is_full_transfer(response: Response) -> bool:
+    """True when the response sends the whole file (not a range or a 304)"""
+    return response.status_code == 200
+
+
+# Shared instance, configured from the environment
+content_etags = ContentETags(max_entries=int(os.getenv('AUDIO_ETAG_CACHE_ENTRIES', 4096)))
@@ -0,0 +1,333 @@
+"""
+Storage backends for generated audio: local disk or an S3-compatible bucket
+
+Audio is addressed by key, a relative path such as
+``3f/a2/3fa2c41d...e1.opus``, and the database stores keys rather than
+absolute paths, so any web node can serve any file. New keys are random and
+sharded two levels deep by their leading hex digits (new_audio_key), so names
+never collide and no directory grows past a few thousand entries; rows
+written under the old flat layout are moved over by migrate_audio_layout. Encoders and the
+WAV merger need real files, so audio is produced on local disk and handed
+over with put_file. Serving (ranges, ETags, transcoding) also works on a
+local file: local_path(key) returns the stored file itself for
+LocalAudioStorage, and a copy fetched into a bounded node-local cache for
+S3AudioStorage. put_stream and open move bytes without a local file.
+iter_keys lists what is stored, for the audio sweeper (see audio_gc).
+S3AudioStorage needs boto3 (or any client with the same methods, such as a
+MinIO stand-in) only when it is used.
+"""
+
+import os
+import re
+import uuid
+import ntpath
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# ab/cd/abcd<28 more hex digits>[.ext]
+SHARDED_KEY = re.compile(r'^([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{28}(\.[A-Za-z0-9]+)?$')
+
+
+def normalize_key(key: str) -> str:
+    """Validated, '/'-separated form of a storage key"""
+    parts = [part for part in (key or '').replace('\\', '/').split('/') if part not in ('', '.')]
+    if not parts or '..' in parts or key.startswith(('/', '\\')) or ntpath.splitdrive(key)[0]:
+        raise ValueError(f"Invalid audio storage key: {key!r}")
+    return '/'.join(parts)
+
+
+def key_for(value: Optional[str]) -> Optional[str]:
+    """Storage key for a stored audio reference
+
+    Rows written before keys were introduced hold absolute paths (POSIX or
+    Windows) into the flat audio directory; their file name is the key.
+    """
+    if not value:
+        return None
+    if os.path.isabs(value) or ntpath.isabs(value):
+        return ntpath.basename(value.replace('/', '\\'))
+    return normalize_key(value)
+
+
+def new_audio_key(extension: str = '') -> str:
+    """Collision-free key for new audio: ``ab/cd/<32 hex digits><extension>``"""
+    name = uuid.uuid4().hex
+    return f'{name[:2]}/{name[2:4]}/{name}{extension}'
+
+
+def is_sharded_key(key: str) -> bool:
+    return bool(SHARDED_KEY.match(key or ''))
+
+
+def _copy_stream(source: BinaryIO, dest_path: str) -> int:
+    """Write a stream to ``dest_path`` atomically; returns its size"""
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f'{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(source, f, COPY_CHUNK_SIZE)
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(dest_path)
+
+
+def _move(path: str, dest_path: str):
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    try:
+        os.replace(path, dest_path)
+    except OSError:  # different filesystem
+        shutil.move(path, dest_path)
+
+
+class LocalAudioStorage:
+    """Keys are paths under a root directory"""
+
+    kind = 'local'
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, *normalize_key(key).split('/'))
+
+    def put_file(self, key: str, path: str, content_type: Optional[str] = None) -> int:
+        """Move a finished local file into storage; returns its size"""
+        dest_path = self.path_for(key)
+        if os.path.abspath(path) != dest_path:
+            _move(path, dest_path)
+        return os.path.getsize(dest_path)
+
+    def put_stream(self, key: str, stream: BinaryIO, content_type: Optional[str] = None) -> int:
+        return _copy_stream(stream, self.path_for(key))
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.path_for(key), 'rb')
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self.path_for(key)
+        return path if os.path.isfile(path) else None
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path_for(key))
+
+    def delete(self, key: str) -> bool:
+        try:
+            os.remove(self.path_for(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def iter_keys(self) -> Iterator[Tuple[str, int, float]]:
+        """(key, size, mtime) of every stored file"""
+        for dirpath, _, filenames in os.walk(self.root):
+            relative = os.path.relpath(dirpath, self.root)
+            prefix = '' if relative == '.' else relative.replace(os.sep, '/') + '/'
+            for name in filenames:
+                try:
+                    stat = os.stat(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+                yield prefix + name, stat.st_size, stat.st_mtime
+
+    def stats(self):
+        return {'kind': self.kind, 'root': self.root}
+
+
+class S3AudioStorage:
+    """Keys are objects in an S3-compatible bucket, with a node-local read cache
+
+    The cache is tracked by an in-memory LRU index (path -> size), built from
+    the cache directory once at startup, so keeping it under budget never
+    walks the directory. ``client`` is a boto3 S3 client or anything with the same methods; by
+    default one is created from ``client_kwargs`` (endpoint_url for MinIO
+    and other S3-compatible stores, region_name, credentials).
+    """
+
+    kind = 's3'
+
+    def __init__(self, bucket: str, cache_dir: str, prefix: str = '', client=None,
+                 cache_max_bytes: int = 1024 * 1024 * 1024, **client_kwargs):
+        if not bucket:
+            raise ValueError("S3 audio storage needs a bucket")
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.cache_max_bytes = cache_max_bytes
+        self._client = client
+        self._client_kwargs = client_kwargs
+        self._lock = threading.Lock()
+        self._stats = {'uploads': 0, 'cache_hits': 0, 'cache_misses': 0, 'cache_evictions': 0}
+        self._cache_index = OrderedDict()  # cache path -> size, least recently used first
+        self._cache_bytes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_cache_index()
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("boto3 is required for S3 audio storage (pip install boto3)")
+            self._client = boto3.client('s3', **self._client_kwargs)
+        return self._client
+
+    def object_key(self, key: str) -> str:
+        return self.prefix + normalize_key(key)
+
+    def cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, *normalize_key(key).split('/'))
+
+    def put_file(self, key: str, path: str, content_type: Optional[str] = None) -> int:
+        """Upload a finished local file, then keep it as this node's cached copy"""
+        extra_args = {'ContentType': content_type} if content_type else None
+        self.client.upload_file(path, self.bucket, self.object_key(key), ExtraArgs=extra_args)
+        with self._lock:
+            self._stats['uploads'] += 1
+        cache_path = self.cache_path(key)
+        if os.path.abspath(path) != cache_path:
+            _move(path, cache_path)
+        size = os.path.getsize(cache_path)
+        self._cache_add(cache_path, size)
+        return size
+
+    def put_stream(self, key: str, stream: BinaryIO, content_type: Optional[str] = None) -> None:
+        """Upload from a stream (multipart for large bodies) without a local copy"""
+        extra_args = {'ContentType': content_type} if content_type else None
+        self.client.upload_fileobj(stream, self.bucket, self.object_key(key), ExtraArgs=extra_args)
+        with self._lock:
+            self._stats['uploads'] += 1
+
+    def open(self, key: str) -> BinaryIO:
+        """Streaming body of the object"""
+        return self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))['Body']
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Cached copy of the object, downloaded on a miss; None if it doesn't exist"""
+        cache_path = self.cache_path(key)
+        if os.path.isfile(cache_path):
+            os.utime(cache_path)  # recently used (orders the index after a restart)
+            with self._lock:
+                self._stats['cache_hits'] += 1
+                if cache_path in self._cache_index:
+                    self._cache_index.move_to_end(cache_path)
+                    return cache_path
+            # Fetched by another process sharing the cache directory
+            self._cache_add(cache_path, os.path.getsize(cache_path))
+            return cache_path
+
+        with self._lock:
+            self._stats['cache_misses'] += 1
+        if not self.exists(key):
+            return None
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                self.client.download_fileobj(self.bucket, self.object_key(key), f)
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._cache_add(cache_path, os.path.getsize(cache_path))
+        return cache_path
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except Exception as e:
+            code = str(getattr(e, 'response', {}).get('Error', {}).get('Code', ''))
+            if code in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def delete(self, key: str) -> bool:
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+        cache_path = self.cache_path(key)
+        with self._lock:
+            self._cache_bytes -= self._cache_index.pop(cache_path, 0)
+        try:
+            os.remove(cache_path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def iter_keys(self) -> Iterator[Tuple[str, int, float]]:
+        """(key, size, mtime) of every object under the prefix"""
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', []):
+                yield item['Key'][len(self.prefix):], item['Size'], item['LastModified'].timestamp()
+
+    def _load_cache_index(self):
+        """Index cached files left by earlier runs, oldest use first"""
+        files = []
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, path, stat.st_size))
+        with self._lock:
+            for _, path, size in sorted(files):
+                self._cache_index[path] = size
+                self._cache_bytes += size
+            self._trim_cache()
+
+    def _cache_add(self, path: str, size: int):
+        """Record a file just written to the cache as most recently used, then trim"""
+        with self._lock:
+            self._cache_bytes += size - self._cache_index.pop(path, 0)
+            self._cache_index[path] = size
+            self._trim_cache(keep=path)
+
+    def _trim_cache(self, keep: Optional[str] = None):
+        """Evict least recently used cached files until the cache fits its budget (caller holds the lock)"""
+        while self._cache_index and self._cache_bytes > self.cache_max_bytes:
+            path, size = next(iter(self._cache_index.items()))
+            if path == keep:
+                break
+            self._cache_index.pop(path)
+            self._cache_bytes -= size
+            self._stats['cache_evictions'] += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({'cache_files': len(self._cache_index), 'cache_bytes': self._cache_bytes})
+        stats.update({'kind': self.kind, 'bucket': self.bucket, 'prefix': self.prefix})
+        return stats
+
+
+def storage_from_env(audio_dir: str):
+    """Audio storage configured from the environment: AUDIO_STORAGE=s3 for a bucket
+    (AUDIO_S3_*), otherwise the local ``audio_dir``"""
+    if os.getenv('AUDIO_STORAGE', 'local').lower() == 's3':
+        return S3AudioStorage(
+            bucket=os.getenv('AUDIO_S3_BUCKET'),
+            prefix=os.getenv('AUDIO_S3_PREFIX', 'audio'),
+            cache_dir=os.path.join(audio_dir, 'storage_cache'),
+            cache_max_bytes=int(os.getenv('AUDIO_S3_CACHE_MB', 1024)) * 1024 * 1024,
+            endpoint_url=os.getenv('AUDIO_S3_ENDPOINT_URL') or None,
+            region_name=os.getenv('AUDIO_S3_REGION') or None
+        )
+    return LocalAudioStorage(audio_dir)
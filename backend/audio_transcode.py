@@ -0,0 +1,171 @@
+"""
+Compressed renditions of synthesized audio, with Accept negotiation
+
+Every engine hands back PCM WAV. Once a WAV file is final, Transcoder.store
+re-encodes it with ffmpeg into the configured storage format (Opus, MP3 or
+AAC at AUDIO_BITRATE_KBPS) and drops the WAV, so what stays on disk is about
+a tenth of the size. When a client's Accept header prefers another
+compressed format, Transcoder.rendition encodes it next to the stored file
+once and reuses it after that. ffmpeg is optional: without it files are kept
+and served as WAV. MIME types always come from the file's bytes, never from
+its name.
+"""
+
+import os
+import shutil
+import logging
+import threading
+import subprocess
+from collections import namedtuple
+from typing import Optional, Tuple
+
+from audio_cache import sniff_audio_format
+
+logger = logging.getLogger(__name__)
+
+AudioFormat = namedtuple('AudioFormat', ['name', 'extension', 'mime_type', 'codec_args'])
+
+# Compressed formats ffmpeg can produce, in server preference order
+FORMATS = {
+    'opus': AudioFormat('opus', '.opus', 'audio/ogg', ('-c:a', 'libopus', '-f', 'ogg')),
+    'mp3': AudioFormat('mp3', '.mp3', 'audio/mpeg', ('-c:a', 'libmp3lame', '-f', 'mp3')),
+    'aac': AudioFormat('aac', '.m4a', 'audio/mp4', ('-c:a', 'aac', '-movflags', '+faststart', '-f', 'ipod')),
+}
+
+# sniff_audio_format result -> MIME type
+MIME_TYPES = {
+    'wav': 'audio/wav',
+    'mp3': 'audio/mpeg',
+    'flac': 'audio/flac',
+    'ogg': 'audio/ogg',
+    'm4a': 'audio/mp4',
+    'bin': 'application/octet-stream',
+}
+
+
+def sniff_mime_type(path: str) -> str:
+    """MIME type of an audio file from its magic number"""
+    with open(path, 'rb') as f:
+        return MIME_TYPES[sniff_audio_format(f.read(12))]
+
+
+def extension_for(mime_type: str) -> str:
+    """File extension matching a MIME type from sniff_mime_type (our own formats' first)"""
+    for fmt in FORMATS.values():
+        if fmt.mime_type == mime_type:
+            return fmt.extension
+    for fmt, known in MIME_TYPES.items():
+        if known == mime_type:
+            return f'.{fmt}'
+    return '.bin'
+
+
+class Transcoder:
+    """Encode finished WAV files with ffmpeg and pick renditions for clients"""
+
+    def __init__(self, ffmpeg_path: Optional[str] = None, store_format: Optional[str] = 'opus',
+                 bitrate_kbps: int = 48, timeout: float = 300):
+        if store_format == 'wav':
+            store_format = None
+        if store_format and store_format not in FORMATS:
+            raise ValueError(f"Unknown audio format {store_format!r} (expected one of {', '.join(FORMATS)})")
+        self.ffmpeg_path = ffmpeg_path or shutil.which('ffmpeg')
+        self.store_format = store_format or None
+        self.bitrate_kbps = bitrate_kbps
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stats = {'stored': 0, 'renditions': 0, 'failures': 0, 'bytes_in': 0, 'bytes_out': 0}
+        if not self.ffmpeg_path:
+            logger.info("ffmpeg not found; audio is stored and served as WAV")
+
+    @property
+    def available(self) -> bool:
+        return bool(self.ffmpeg_path)
+
+    def _run(self, src_path: str, dest_path: str, fmt: AudioFormat) -> bool:
+        tmp_path = f'{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        command = [self.ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y',
+                   '-i', src_path, '-vn', *fmt.codec_args, '-b:a', f'{self.bitrate_kbps}k', tmp_path]
+        try:
+            result = subprocess.run(command, capture_output=True, timeout=self.timeout)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.decode('utf-8', 'replace').strip() or f'exit {result.returncode}')
+            os.replace(tmp_path, dest_path)
+            return True
+        except Exception as e:
+            logger.error(f"Transcoding {os.path.basename(src_path)} to {fmt.name} failed: {e}")
+            with self._lock:
+                self._stats['failures'] += 1
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    def compresses(self, path: str) -> bool:
+        """True when store() would re-encode this file"""
+        return bool(self.store_format and self.available and sniff_mime_type(path) == MIME_TYPES['wav'])
+
+    def store(self, path: str) -> Tuple[str, str, int]:
+        """Replace a finished WAV with its compressed rendition; returns (path, mime type, size)
+
+        Files that aren't WAV, or that can't be encoded, are kept as they are.
+        """
+        if not self.compresses(path):
+            return path, sniff_mime_type(path), os.path.getsize(path)
+        mime_type = MIME_TYPES['wav']
+
+        fmt = FORMATS[self.store_format]
+        dest_path = os.path.splitext(path)[0] + fmt.extension
+        if dest_path == path or not self._run(path, dest_path, fmt):
+            return path, mime_type, os.path.getsize(path)
+
+        size_in, size_out = os.path.getsize(path), os.path.getsize(dest_path)
+        os.remove(path)
+        with self._lock:
+            self._stats['stored'] += 1
+            self._stats['bytes_in'] += size_in
+            self._stats['bytes_out'] += size_out
+        return dest_path, fmt.mime_type, size_out
+
+    def rendition(self, path: str, accept) -> Tuple[str, str]:
+        """(path, mime type) of the best rendition of a stored file for an Accept header
+
+        ``accept`` is a Werkzeug MIMEAccept (``request.accept_mimetypes``). The
+        stored file wins ties; other formats are encoded on first request and
+        kept beside it, and re-encoded if the stored file changes.
+        """
+        mime_type = sniff_mime_type(path)
+        if not self.available or not accept:
+            return path, mime_type
+
+        offered = [mime_type] + [fmt.mime_type for fmt in FORMATS.values() if fmt.mime_type != mime_type]
+        best = accept.best_match(offered)
+        if best is None or best == mime_type:
+            return path, mime_type
+
+        fmt = next(fmt for fmt in FORMATS.values() if fmt.mime_type == best)
+        dest_path = os.path.splitext(path)[0] + fmt.extension
+        if dest_path == path:
+            return path, mime_type
+        if os.path.exists(dest_path) and os.path.getmtime(dest_path) >= os.path.getmtime(path):
+            return dest_path, fmt.mime_type
+        if self._run(path, dest_path, fmt):
+            with self._lock:
+                self._stats['renditions'] += 1
+            return dest_path, fmt.mime_type
+        return path, mime_type
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['ffmpeg'] = self.available
+        stats['store_format'] = self.store_format if self.available else 'wav'
+        stats['compression_ratio'] = round(stats['bytes_in'] / stats['bytes_out'], 2) if stats['bytes_out'] else None
+        return stats
+
+
+# Shared instance, configured from the environment
+transcoder = Transcoder(
+    ffmpeg_path=os.getenv('FFMPEG_PATH') or None,
+    store_format=os.getenv('AUDIO_STORE_FORMAT', 'opus').strip().lower() or None,
+    bitrate_kbps=int(os.getenv('AUDIO_BITRATE_KBPS', 48))
+)
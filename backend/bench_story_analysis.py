@@ -0,0 +1,207 @@
+"""
+Benchmark: story analysis on novel-length input
+
+Compares story_analysis.analyze_story_content with the previous
+implementation (per-call mapping and regexes, several lowercasings per
+line, per-line rescans of known characters) on a synthetic novel, and
+checks both produce the same segments.
+
+    python bench_story_analysis.py --lines 100000
+"""
+
+import re
+import time
+import random
+import argparse
+
+from story_analysis import analyze_story_content
+
+NAMES = ['Alice', 'Bob', 'Carol', 'Dave', 'Eve', 'Frank']
+HINTS = ['happy', 'sad', 'angry', 'nervous', 'calm', 'bored']
+WORDS = ('the old man walked along the road and looked at the sky while the wind blew over '
+         'the hills near the village of stone smiled quietly made courage average').split()
+
+
+def legacy_analyze(text):
+    """The previous implementation, kept verbatim as the baseline"""
+    
+    # Available voices for different characters
+    voices = ['david', 'zira', 'heera', 'mark', 'ravi']
+    
+    # Emotion to tone mapping
+    emotion_mapping = {
+        'cheerful': 'cheerful',
+        'happy': 'cheerful',
+        'excited': 'cheerful',
+        'playful': 'cheerful',
+        'joy': 'cheerful',
+        'laugh': 'cheerful',
+        'smile': 'cheerful',
+        'sad': 'sad',
+        'cry': 'sad',
+        'weep': 'sad',
+        'sorrow': 'sad',
+        'tear': 'sad',
+        'angry': 'angry',
+        'mad': 'angry',
+        'furious': 'angry',
+        'rage': 'angry',
+        'shout': 'angry',
+        'calm': 'calm',
+        'peaceful': 'calm',
+        'quiet': 'calm',
+        'whisper': 'calm',
+        'serene': 'calm',
+        'nervous': 'suspenseful',
+        'scared': 'suspenseful',
+        'afraid': 'suspenseful',
+        'worry': 'suspenseful',
+        'anxious': 'suspenseful',
+        'suspenseful': 'suspenseful',
+        'confident': 'confident',
+        'proud': 'confident',
+        'strong': 'confident',
+        'brave': 'confident',
+        'bold': 'confident',
+        'inspiring': 'confident'
+    }
+    
+    # Split text into lines first to detect character dialogue format
+    lines = text.split('\n')
+    segments = []
+    character_voices = {}  # Track voices assigned to characters
+    narrator_voice = voices[0]  # Default narrator voice
+    current_voice_index = 1
+    
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+            
+        voice = narrator_voice
+        tone = 'neutral'
+        character = 'Narrator'
+        is_dialogue = False
+        
+        # Check for character dialogue format: "CharacterName (emotion): dialogue"
+        character_match = re.match(r'(\w+)\s*\(([^)]+)\):\s*["\']?([^"\']*)["\']?', line)
+        if character_match:
+            character_name = character_match.group(1).title()
+            emotion_hint = character_match.group(2).lower().strip()
+            dialogue_text = character_match.group(3).strip()
+            
+            # Assign voice to character
+            if character_name not in character_voices:
+                character_voices[character_name] = voices[current_voice_index % len(voices)]
+                current_voice_index += 1
+            
+            voice = character_voices[character_name]
+            character = character_name
+            is_dialogue = True
+            
+            # Map emotion hint to tone
+            tone = emotion_mapping.get(emotion_hint, 'neutral')
+            
+            # Use the dialogue text as the main text
+            text_to_speak = dialogue_text
+        else:
+            # Check for regular dialogue with quotes
+            dialogue_match = re.search(r'"([^"]*)"', line)
+            if dialogue_match:
+                is_dialogue = True
+                # Extract speaker if mentioned
+                speaker_match = re.search(r'(\w+)\s+said|said\s+(\w+)|(\w+)\s+asked|asked\s+(\w+)|(\w+)\s+replied|replied\s+(\w+)', line.lower())
+                
+                if speaker_match:
+                    speaker = next(filter(None, speaker_match.groups())).title()
+                    if speaker not in character_voices:
+                        character_voices[speaker] = voices[current_voice_index % len(voices)]
+                        current_voice_index += 1
+                    voice = character_voices[speaker]
+                    character = speaker
+                else:
+                    # Generic character if no speaker identified
+                    character_num = len([c for c in character_voices.keys() if c.startswith('Character')]) + 1
+                    character = f"Character {character_num}"
+                    if character not in character_voices:
+                        character_voices[character] = voices[current_voice_index % len(voices)]
+                        current_voice_index += 1
+                    voice = character_voices[character]
+            
+            text_to_speak = line
+        
+        # Detect emotion in text if not already set
+        if tone == 'neutral':
+            text_lower = text_to_speak.lower()
+            for emotion, mapped_tone in emotion_mapping.items():
+                if emotion in text_lower:
+                    tone = mapped_tone
+                    break
+        
+        # Detect action/emotional indicators
+        if tone == 'neutral':
+            if any(word in text_to_speak.lower() for word in ['!', 'exclaimed', 'shouted', 'yelled']):
+                tone = 'angry'
+            elif any(word in text_to_speak.lower() for word in ['whispered', 'murmured', 'softly']):
+                tone = 'calm'
+            elif any(word in text_to_speak.lower() for word in ['wondered', 'mysterious', 'strange']):
+                tone = 'suspenseful'
+        
+        # Clean up the text
+        if not text_to_speak.endswith(('.', '!', '?')):
+            text_to_speak += '.'
+        
+        segments.append({
+            'text': text_to_speak,
+            'voice': voice,
+            'tone': tone,
+            'character': character,
+            'emotion': tone if tone != 'neutral' else None,
+            'is_dialogue': is_dialogue
+        })
+    
+    return segments
+
+
+def make_story(lines, seed=3):
+    """Narration, quoted dialogue with and without a named speaker, and "Name (emotion): ..." lines"""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(lines):
+        roll = rng.random()
+        words = ' '.join(rng.choices(WORDS, k=rng.randint(6, 20)))
+        if roll < 0.2:
+            out.append(f'{rng.choice(NAMES)} ({rng.choice(HINTS)}): "{words}"')
+        elif roll < 0.45:
+            out.append(f'"{words.capitalize()}," {rng.choice(NAMES)} {rng.choice(["said", "asked", "replied"])}.')
+        elif roll < 0.5:
+            out.append(f'"{words}!"')
+        else:
+            out.append(words.capitalize() + rng.choice(['.', '!', '?', '']))
+        if rng.random() < 0.1:
+            out.append('')
+    return '\n'.join(out)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', default='10000,100000', help='story lengths in lines (comma separated)')
+    args = parser.parse_args()
+
+    print(f"{'lines':>8} {'MB':>6} {'legacy s':>9} {'new s':>8} {'speedup':>8}")
+    for lines in (int(n) for n in args.lines.split(',')):
+        text = make_story(lines)
+        expected, legacy_time = timed(legacy_analyze, text)
+        segments, new_time = timed(analyze_story_content, text)
+        assert segments == expected, f"segments differ for {lines} lines"
+        print(f"{lines:>8} {len(text) / 1e6:>6.1f} {legacy_time:>9.3f} {new_time:>8.3f} {legacy_time / new_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
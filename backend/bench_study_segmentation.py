@@ -0,0 +1,128 @@
+"""
+Benchmark: study material segmentation on large documents
+
+Compares the single-pass segmenter in study_segmentation with the previous
+implementation (one finditer pass per heading kind, split-based topics) on
+synthetic textbooks, and checks that both produce the same chapters.
+
+    python bench_study_segmentation.py --sizes 1,10,50 --layout chapters
+"""
+
+import re
+import time
+import random
+import argparse
+
+from study_segmentation import segment
+
+LEGACY_PATTERNS = [
+    r'chapter\s+\d+[:\.]?\s*(.+?)(?=\n|$)',
+    r'unit\s+\d+[:\.]?\s*(.+?)(?=\n|$)',
+    r'lesson\s+\d+[:\.]?\s*(.+?)(?=\n|$)',
+    r'part\s+\d+[:\.]?\s*(.+?)(?=\n|$)',
+    r'\d+\.\s*(.+?)(?=\n|$)'
+]
+
+WORDS = ('energy cell membrane photosynthesis light water carbon protein enzyme '
+         'reaction molecule structure function system process theory model data').split()
+
+
+def legacy_topics(content):
+    paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
+    if len(paragraphs) <= 3:
+        return [{'name': 'Main Content', 'content': content.strip()}]
+    topics = []
+    topic_size = max(2, len(paragraphs) // 5)
+    for i in range(0, len(paragraphs), topic_size):
+        topic_paragraphs = paragraphs[i:i + topic_size]
+        first_sentence = topic_paragraphs[0].split('.')[0].strip()
+        if len(first_sentence) > 60:
+            first_sentence = first_sentence[:60] + "..."
+        topics.append({'name': f"Topic {len(topics) + 1}: {first_sentence}",
+                       'content': '\n\n'.join(topic_paragraphs)})
+    return topics
+
+
+def legacy_summary(content):
+    summary = content.strip()[:200]
+    return summary + "..." if len(content) > 200 else summary
+
+
+def legacy_segment(text, title):
+    splits = []
+    for pattern in LEGACY_PATTERNS:
+        matches = list(re.finditer(pattern, text, re.IGNORECASE | re.MULTILINE))
+        if len(matches) >= 2:
+            splits = matches
+            break
+    if not splits:
+        return [{'title': title, 'summary': legacy_summary(text), 'topics': legacy_topics(text)}]
+    chapters = []
+    for i, match in enumerate(splits):
+        end = splits[i + 1].start() if i + 1 < len(splits) else len(text)
+        content = text[match.end():end].strip()
+        if content:
+            chapters.append({'title': match.group(1).strip(), 'summary': legacy_summary(content),
+                             'topics': legacy_topics(content)})
+    return chapters
+
+
+def paragraph(rng):
+    sentences = []
+    for _ in range(rng.randint(2, 6)):
+        words = rng.choices(WORDS, k=rng.randint(6, 18))
+        sentences.append(' '.join(words).capitalize() + '.')
+    return ' '.join(sentences)
+
+
+def make_document(size_mb, layout, seed=7):
+    """Synthetic textbook of about ``size_mb`` MB
+
+    ``chapters``: "Chapter N: ..." headings; ``numbered``: only "N. ..."
+    headings (every kind before it is scanned and rejected); ``none``: no
+    headings at all (the old code's worst case: five full passes).
+    """
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts, size, chapter = [], 0, 0
+    while size < target:
+        if layout != 'none' and (chapter == 0 or rng.random() < 0.02):
+            chapter += 1
+            heading = f"Chapter {chapter}: {rng.choice(WORDS).title()}" if layout == 'chapters' \
+                else f"{chapter}. {rng.choice(WORDS).title()}"
+            parts.append(heading)
+            size += len(heading) + 2
+        block = paragraph(rng)
+        parts.append(block)
+        size += len(block) + 2
+    return '\n\n'.join(parts)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1,10,50', help='document sizes in MB (comma separated)')
+    parser.add_argument('--layout', default='all', choices=['all', 'chapters', 'numbered', 'none'])
+    args = parser.parse_args()
+
+    layouts = ['chapters', 'numbered', 'none'] if args.layout == 'all' else [args.layout]
+    print(f"{'layout':<10} {'size':>6} {'chapters':>9} {'legacy s':>9} {'new s':>8} {'speedup':>8}")
+    for layout in layouts:
+        for size_mb in (float(size) for size in args.sizes.split(',')):
+            text = make_document(size_mb, layout).strip()
+            expected, legacy_time = timed(legacy_segment, text, 'Fallback')
+            (_, nodes), segment_time = timed(segment, text, 'Fallback')
+            chapters, materialize_time = timed(lambda: [node.to_dict() for node in nodes])
+            assert chapters == expected, f"segmentation differs for {layout} {size_mb}MB"
+            new_time = segment_time + materialize_time
+            print(f"{layout:<10} {size_mb:>5g}M {len(chapters):>9} {legacy_time:>9.3f} {new_time:>8.3f} "
+                  f"{legacy_time / new_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Circuit breakers and health-scored routing for remote TTS models
+
+Every Hugging Face TTS model gets a breaker that tracks a rolling window of
+call outcomes and an EWMA of successful-call latency. A model whose error
+rate crosses the threshold (or that reports it is still loading) is skipped
+until its cooldown expires; then a single half-open probe decides whether it
+closes again or stays open for a longer cooldown. The router tries healthy
+models fastest-first.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one model"""
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 4, failure_threshold: float = 0.5,
+                 cooldown: float = 30, max_cooldown: float = 600, latency_alpha: float = 0.3,
+                 probe_timeout: float = 120, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.latency_alpha = latency_alpha
+        self.probe_timeout = probe_timeout  # a probe never reported back is given up on after this long
+        self._clock = clock
+        self._outcomes = deque(maxlen=window)  # True for success
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.latency_ewma = None
+        self._cooldown = cooldown
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return 1 - sum(self._outcomes) / len(self._outcomes)
+
+    def allow_request(self) -> bool:
+        """Whether a call may go ahead; claims the single probe slot when half-open"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self._clock() < self._open_until:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight and self._clock() - self._probe_started < self.probe_timeout:
+                return False
+            self._probe_in_flight = True
+            self._probe_started = self._clock()
+            return True
+
+    def record_success(self, latency: float):
+        with self._lock:
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += self.latency_alpha * (latency - self.latency_ewma)
+            if self.state == HALF_OPEN:
+                logger.info(f"Circuit for {self.name} closed after successful probe")
+                self._outcomes.clear()
+                self._cooldown = self.base_cooldown
+            self.state = CLOSED
+            self._probe_in_flight = False
+            self._outcomes.append(True)
+
+    def record_failure(self, retry_after: Optional[float] = None):
+        """Record a failed call; ``retry_after`` (e.g. a model's estimated load time) opens the circuit outright"""
+        with self._lock:
+            self._outcomes.append(False)
+            if retry_after is not None:
+                self._open(max(retry_after, 1.0))
+            elif self.state == HALF_OPEN:
+                self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+                self._open(self._cooldown)
+            elif len(self._outcomes) >= self.min_calls and self.error_rate >= self.failure_threshold:
+                self._open(self._cooldown)
+
+    def _open(self, duration: float):
+        """Open the circuit for ``duration`` seconds (caller holds the lock)"""
+        if self.state != OPEN:
+            logger.warning(f"Circuit for {self.name} opened for {duration:.0f}s (error rate {self.error_rate:.0%})")
+        self.state = OPEN
+        self._probe_in_flight = False
+        self._open_until = self._clock() + duration
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'error_rate': round(self.error_rate, 3),
+                'calls': len(self._outcomes),
+                'latency_ewma': round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+                'retry_in': round(max(0.0, self._open_until - self._clock()), 1) if self.state == OPEN else 0
+            }
+
+
+class ModelRouter:
+    """Orders models by health and measured latency, skipping open circuits"""
+
+    def __init__(self, models: List[str], **breaker_options):
+        self.models = list(models)
+        self.breakers = {model: CircuitBreaker(model, **breaker_options) for model in self.models}
+
+    def attempts(self) -> Iterator[Tuple[str, CircuitBreaker]]:
+        """Yield (model, breaker) for each model that may be called, fastest first
+
+        Models without a latency measurement keep their configured order after
+        the measured ones. Breakers are consulted lazily, so a half-open probe
+        slot is only claimed when the caller actually gets to that model.
+        """
+        def score(indexed):
+            index, model = indexed
+            latency = self.breakers[model].latency_ewma
+            return (latency is None, latency or 0.0, index)
+
+        for _, model in sorted(enumerate(self.models), key=score):
+            breaker = self.breakers[model]
+            if breaker.allow_request():
+                yield model, breaker
+            else:
+                logger.info(f"Skipping TTS model {model}: circuit {breaker.state}")
+
+    def stats(self) -> Dict[str, Dict]:
+        return {model: breaker.snapshot() for model, breaker in self.breakers.items()}
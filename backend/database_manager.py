@@ -1,5 +1,9 @@
 import pymysql
+from pymysql.constants import SERVER_STATUS
 import os
+import threading
+import time
+from collections import deque
 from datetime import datetime
 import logging
 from dotenv import load_dotenv
@@ -10,6 +14,197 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Tables holding stored-audio references, and the column that holds them
+AUDIO_REFERENCE_COLUMNS = {'audio_history': 'audio_file_path', 'downloads': 'file_path'}
+
+# Source table -> (metric, aggregate) pairs rolled up into metrics_hourly/metrics_totals
+METRIC_ROLLUPS = {
+    'users': (('signups', 'COUNT(*)'),),
+    'audio_history': (('audio_generated', 'COUNT(*)'),),
+    'downloads': (('downloads_created', 'COUNT(*)'), ('audio_bytes', 'COALESCE(SUM(file_size), 0)')),
+    'study_materials': (('study_materials', 'COUNT(*)'),),
+}
+
+class PoolExhaustedError(Exception):
+    """Raised when no pooled connection becomes available before the checkout timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe bounded pool of database connections
+
+    Idle connections are kept LIFO so the warmest connection is reused first.
+    On checkout a connection that has been idle longer than ``max_idle`` seconds
+    is recycled, and one idle longer than ``ping_interval`` seconds is pinged
+    before it is handed out. When all ``max_size`` connections are in use,
+    callers wait up to ``timeout`` seconds and then get ``PoolExhaustedError``.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=10.0, max_idle=300.0, ping_interval=30.0):
+        self._connect = connect
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.ping_interval = ping_interval
+        self._idle = deque()  # (connection, returned_at)
+        self._size = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._pid = os.getpid()
+        self._stats = {
+            'created': 0,
+            'reused': 0,
+            'recycled': 0,
+            'failed_health_checks': 0,
+            'discarded': 0,
+            'waits': 0,
+            'exhausted': 0
+        }
+
+    def _reset_after_fork(self):
+        """Drop connections inherited from a parent process (gunicorn --preload)"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle.clear()
+            self._size = 0
+
+    def acquire(self):
+        """Check out a healthy connection, opening a new one if the pool has room"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            with self._cond:
+                self._reset_after_fork()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['exhausted'] += 1
+                        raise PoolExhaustedError(
+                            f"No database connection available after {self.timeout}s "
+                            f"(pool size {self.max_size})"
+                        )
+                    self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                else:
+                    # Reserve a slot; the handshake happens outside the lock
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._forget()
+                    raise
+                with self._cond:
+                    self._stats['created'] += 1
+                return conn
+
+            # Health checks run outside the lock so a slow ping doesn't block other threads
+            idle_for = time.monotonic() - returned_at
+            if idle_for > self.max_idle:
+                self._close_quietly(conn)
+                self._forget('recycled')
+                continue
+            if idle_for > self.ping_interval:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception as e:
+                    logger.warning(f"Discarding unhealthy pooled connection: {e}")
+                    self._close_quietly(conn)
+                    self._forget('failed_health_checks')
+                    continue
+            with self._cond:
+                self._stats['reused'] += 1
+            return conn
+
+    def _forget(self, counter=None):
+        """Give up a slot whose connection was closed or never opened"""
+        with self._cond:
+            self._size -= 1
+            if counter:
+                self._stats[counter] += 1
+            self._cond.notify()
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, rolling back any open transaction"""
+        if not discard:
+            try:
+                if not getattr(conn, 'open', True):
+                    discard = True
+                elif getattr(conn, 'server_status', 0) & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    conn.rollback()
+            except Exception as e:
+                logger.warning(f"Discarding pooled connection after failed rollback: {e}")
+                discard = True
+
+        if discard:
+            self._close_quietly(conn)
+        with self._cond:
+            if self._pid != os.getpid():
+                # Connection belongs to the parent process; never reuse it here
+                return
+            if discard:
+                self._stats['discarded'] += 1
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def connection(self):
+        """Context manager that checks a connection out and returns it on exit"""
+        return PooledConnection(self)
+
+    def close_all(self):
+        """Close every idle connection (in-use connections are closed on release)"""
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._close_quietly(conn)
+                self._size -= 1
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['max_size'] = self.max_size
+            stats['open'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            return stats
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class PooledConnection:
+    """``with`` wrapper that yields a pooled connection instead of closing it on exit"""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+
+    def __enter__(self):
+        self._conn = self._pool.acquire()
+        return self._conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        conn, self._conn = self._conn, None
+        if exc_type is not None:
+            try:
+                conn.rollback()
+            except Exception:
+                # The connection itself is broken; don't hand it out again
+                self._pool.release(conn, discard=True)
+                return False
+        self._pool.release(conn)
+        return False
+
+
 class DatabaseManager:
     def __init__(self):
         """Initialize database manager with MySQL database"""
@@ -22,10 +217,22 @@ class DatabaseManager:
             'charset': 'utf8mb4',
             'cursorclass': pymysql.cursors.DictCursor
         }
+        # One pool per process, shared by all request threads
+        self.pool = ConnectionPool(
+            lambda: pymysql.connect(**self.db_config),
+            max_size=int(os.getenv('DB_POOL_SIZE', 10)),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            max_idle=float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+            ping_interval=float(os.getenv('DB_POOL_PING_INTERVAL', 30))
+        )
     
     def get_connection(self):
-        """Get database connection"""
-        return pymysql.connect(**self.db_config)
+        """Get a pooled database connection (use as a context manager)"""
+        return self.pool.connection()
+
+    def get_pool_stats(self):
+        """Get connection pool usage statistics"""
+        return self.pool.stats()
     
     def ensure_database_exists(self):
         """Create database and tables if they don't exist"""
@@ -206,6 +413,10 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
+                    self._ensure_metrics_tables(cursor)  # (DDL commits, so not mid-transaction)
+                    # Their audio history goes with them (ON DELETE CASCADE)
+                    self._record_deletions(cursor, 'audio_history', 'audio_deleted', 'user_id = %s', (user_id,))
+                    self._record_deletions(cursor, 'users', 'users_deleted', 'id = %s', (user_id,))
                     cursor.execute('DELETE FROM users WHERE id = %s', (user_id,))
                     conn.commit()
                     return cursor.rowcount > 0
@@ -251,9 +462,10 @@ class DatabaseManager:
                     cursor.execute(query, values)
                     conn.commit()
                     user_id = cursor.lastrowid
-                    
-                    # Return the created user (without password)
-                    return self.get_user(user_id), "User registered successfully"
+
+            # Return the created user (without password); fetched after the
+            # connection is back in the pool so we never hold two at once
+            return self.get_user(user_id), "User registered successfully"
         except Exception as e:
             logger.error(f"Error registering user: {e}")
             return None, f"Registration failed: {str(e)}"
@@ -497,6 +709,42 @@ class DatabaseManager:
             logger.error(f"Error saving audio history: {e}")
             return None
 
+    def save_audio_history_batch(self, user_id, entries, chunk_size=500):
+        """Save many audio history rows with multi-row INSERTs
+
+        ``entries`` are dicts with original_text, rewritten_text, tone, voice and
+        optionally audio_file_path. Returns the new ids in input order (or None
+        on failure). InnoDB gives the rows of one multi-row INSERT consecutive
+        ids, auto_increment_increment apart, starting at lastrowid.
+        """
+        if not entries:
+            return []
+        try:
+            ids = []
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute('SELECT @@SESSION.auto_increment_increment AS step')
+                    step = cursor.fetchone()['step']
+                    for start in range(0, len(entries), chunk_size):
+                        chunk = entries[start:start + chunk_size]
+                        placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(chunk))
+                        params = []
+                        for entry in chunk:
+                            audio_file_path = entry.get('audio_file_path')
+                            params.extend([user_id, entry['original_text'], entry['rewritten_text'],
+                                           entry['tone'], entry['voice'], audio_file_path, audio_file_path is not None])
+                        cursor.execute(f'''
+                            INSERT INTO audio_history 
+                            (user_id, original_text, rewritten_text, tone, voice, audio_file_path, audio_generated)
+                            VALUES {placeholders}
+                        ''', params)
+                        ids.extend(cursor.lastrowid + i * step for i in range(len(chunk)))
+                    conn.commit()
+            return ids
+        except Exception as e:
+            logger.error(f"Error saving audio history batch: {e}")
+            return None
+
     def get_user_audio_history(self, user_id, limit=50):
         """Get audio history for a user"""
         try:
@@ -550,20 +798,138 @@ class DatabaseManager:
             logger.error(f"Error updating audio history status: {e}")
             return False
 
+    def update_audio_history_status_batch(self, updates):
+        """Update many audio history rows in one transaction
+
+        ``updates`` are (history_id, status, audio_file_path or None) tuples.
+        """
+        if not updates:
+            return True
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    with_file = [(status, path, history_id) for history_id, status, path in updates if path]
+                    without_file = [(status, history_id) for history_id, status, path in updates if not path]
+                    if with_file:
+                        cursor.executemany('''
+                            UPDATE audio_history 
+                            SET processing_status = %s, audio_file_path = %s, audio_generated = TRUE, updated_at = CURRENT_TIMESTAMP
+                            WHERE id = %s
+                        ''', with_file)
+                    if without_file:
+                        cursor.executemany('''
+                            UPDATE audio_history 
+                            SET processing_status = %s, updated_at = CURRENT_TIMESTAMP
+                            WHERE id = %s
+                        ''', without_file)
+                    conn.commit()
+                    return True
+        except Exception as e:
+            logger.error(f"Error updating audio history batch: {e}")
+            return False
+
     def delete_audio_history(self, user_id, history_id):
-        """Delete a specific audio history entry"""
+        """Delete a specific audio history entry and its download records
+
+        Returns the audio references (storage keys or legacy paths) the rows
+        pointed at, for the caller to delete, or None if nothing was deleted.
+        """
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
+                    self._ensure_metrics_tables(cursor)
+                    self._record_deletions(cursor, 'audio_history', 'audio_deleted',
+                                           'id = %s AND user_id = %s', (history_id, user_id))
+                    cursor.execute('''
+                        SELECT audio_file_path AS ref FROM audio_history
+                        WHERE id = %s AND user_id = %s AND audio_file_path IS NOT NULL
+                        UNION
+                        SELECT file_path AS ref FROM downloads
+                        WHERE history_id = %s AND user_id = %s
+                    ''', (history_id, user_id, history_id, user_id))
+                    refs = [row['ref'] for row in cursor.fetchall()]
                     cursor.execute('''
                         DELETE FROM audio_history 
                         WHERE id = %s AND user_id = %s
                     ''', (history_id, user_id))
                     conn.commit()
-                    return cursor.rowcount > 0
+                    return refs if cursor.rowcount > 0 else None
         except Exception as e:
             logger.error(f"Error deleting audio history: {e}")
-            return False
+            return None
+
+    def get_audio_references(self, table, after_id=0, limit=1000):
+        """Up to ``limit`` stored-audio references from an AUDIO_REFERENCE_COLUMNS
+        table with id > after_id, by id: dicts with id, history_id, download_id
+        (None for a history row itself), user_id, ref and created_at
+
+        Unlike most lookups this raises on failure: the audio sweeper treats
+        anything unreferenced as garbage, so an empty result must mean empty.
+        """
+        if table == 'audio_history':
+            columns = 'id, id AS history_id, NULL AS download_id'
+        else:
+            columns = 'id, history_id, id AS download_id'
+        column = AUDIO_REFERENCE_COLUMNS[table]
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f'''
+                    SELECT {columns}, user_id, {column} AS ref, created_at FROM {table}
+                    WHERE id > %s AND {column} IS NOT NULL
+                    ORDER BY id LIMIT %s
+                ''', (after_id, limit))
+                return cursor.fetchall()
+
+    def delete_audio_history_batch(self, history_ids):
+        """Delete audio history rows (and, by cascade, their downloads); returns the number deleted"""
+        if not history_ids:
+            return 0
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                self._ensure_metrics_tables(cursor)
+                placeholders = ', '.join(['%s'] * len(history_ids))
+                self._record_deletions(cursor, 'audio_history', 'audio_deleted', f'id IN ({placeholders})', history_ids)
+                cursor.execute(f'DELETE FROM audio_history WHERE id IN ({placeholders})', list(history_ids))
+                conn.commit()
+                return cursor.rowcount
+
+    def delete_downloads_batch(self, download_ids):
+        """Delete download rows by id; returns the number deleted"""
+        if not download_ids:
+            return 0
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(download_ids))
+                cursor.execute(f'DELETE FROM downloads WHERE id IN ({placeholders})', list(download_ids))
+                conn.commit()
+                return cursor.rowcount
+
+    def get_audio_reference_page(self, table, after_id=0, limit=500):
+        """Up to ``limit`` (id, ref) dicts from an AUDIO_REFERENCE_COLUMNS table with id > after_id, by id
+
+        Raises on failure, like get_audio_references.
+        """
+        column = AUDIO_REFERENCE_COLUMNS[table]
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f'''
+                    SELECT id, {column} AS ref FROM {table}
+                    WHERE id > %s AND {column} IS NOT NULL
+                    ORDER BY id LIMIT %s
+                ''', (after_id, limit))
+                return cursor.fetchall()
+
+    def update_audio_references_batch(self, table, updates):
+        """Rewrite audio references in one transaction; ``updates`` are (id, new ref) tuples"""
+        if not updates:
+            return 0
+        column = AUDIO_REFERENCE_COLUMNS[table]
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.executemany(f'UPDATE {table} SET {column} = %s WHERE id = %s',
+                                   [(ref, row_id) for row_id, ref in updates])
+                conn.commit()
+                return len(updates)
 
     # Configuration Methods
     def get_available_tones(self):
@@ -662,6 +1028,33 @@ class DatabaseManager:
             logger.error(f"Error saving download: {e}")
             return None
 
+    def save_downloads_batch(self, user_id, downloads):
+        """Save many download records with one multi-row INSERT
+
+        ``downloads`` are dicts with the keyword arguments of save_download.
+        """
+        if not downloads:
+            return True
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(downloads))
+                    params = []
+                    for download in downloads:
+                        params.extend([user_id, download['history_id'], download['original_filename'],
+                                       download['stored_filename'], download['file_path'],
+                                       download.get('file_size'), download.get('mime_type')])
+                    cursor.execute(f'''
+                        INSERT INTO downloads 
+                        (user_id, history_id, original_filename, stored_filename, file_path, file_size, mime_type)
+                        VALUES {placeholders}
+                    ''', params)
+                    conn.commit()
+                    return True
+        except Exception as e:
+            logger.error(f"Error saving download batch: {e}")
+            return False
+
     def get_user_downloads(self, user_id, limit=50):
         """Get downloads for a user"""
         try:
@@ -722,7 +1115,7 @@ class DatabaseManager:
             return False
 
     def delete_download(self, download_id, user_id=None):
-        """Delete download record and associated file"""
+        """Delete a download record; returns the deleted row (its file is the caller's to remove) or None"""
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
@@ -734,23 +1127,16 @@ class DatabaseManager:
                     
                     download = cursor.fetchone()
                     if not download:
-                        return False
+                        return None
                     
                     # Delete from database
                     cursor.execute('DELETE FROM downloads WHERE id = %s', (download_id,))
                     conn.commit()
                     
-                    # Try to delete physical file
-                    try:
-                        if os.path.exists(download['file_path']):
-                            os.remove(download['file_path'])
-                    except Exception as e:
-                        logger.warning(f"Could not delete file {download['file_path']}: {e}")
-                    
-                    return cursor.rowcount > 0
+                    return download if cursor.rowcount > 0 else None
         except Exception as e:
             logger.error(f"Error deleting download: {e}")
-            return False
+            return None
 
     def test_connection(self):
         """Test database connection"""
@@ -834,32 +1220,29 @@ class DatabaseManager:
             raise
 
     def get_admin_metrics(self):
-        """Get admin dashboard metrics"""
+        """Get admin dashboard metrics from the metric rollups
+
+        A handful of primary-key reads, however many users and rows there are;
+        rows newer than the last roll_up_metrics pass are not counted yet.
+        """
         try:
+            totals = self.get_metric_totals(('signups', 'users_deleted', 'audio_generated', 'audio_deleted'))
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    # Get user count
-                    cursor.execute('SELECT COUNT(*) as count FROM users')
-                    users_count = cursor.fetchone()['count']
-                    
-                    # Get new signups today
+                    # Today's hourly buckets (a range on the primary key)
                     cursor.execute('''
-                        SELECT COUNT(*) as count FROM users 
-                        WHERE DATE(created_at) = CURDATE()
+                        SELECT COALESCE(SUM(value), 0) as count FROM metrics_hourly
+                        WHERE metric = 'signups' AND bucket >= CURDATE()
                     ''')
-                    new_signups_today = cursor.fetchone()['count']
-                    
-                    # Get content uploaded (audio history count)
-                    cursor.execute('SELECT COUNT(*) as count FROM audio_history')
-                    content_uploaded = cursor.fetchone()['count']
+                    new_signups_today = int(cursor.fetchone()['count'])
                     
                     # Get flagged items (for now, return 0 as we don't have flagging system)
                     flagged_items = 0
                     
                     return {
-                        'usersCount': users_count,
+                        'usersCount': totals['signups'] - totals['users_deleted'],
                         'newSignupsToday': new_signups_today,
-                        'contentUploaded': content_uploaded,
+                        'contentUploaded': totals['audio_generated'] - totals['audio_deleted'],
                         'flaggedItems': flagged_items
                     }
                     
@@ -867,6 +1250,172 @@ class DatabaseManager:
             logger.error(f"Error getting admin metrics: {e}")
             raise
 
+    # Metric Rollups
+    def _ensure_metrics_tables(self, cursor):
+        """Create the metric rollup tables (once per process)"""
+        if getattr(self, '_metrics_ready', False):
+            return
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS metrics_hourly (
+                metric VARCHAR(64) NOT NULL,
+                bucket DATETIME NOT NULL,
+                value BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (metric, bucket)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS metrics_totals (
+                metric VARCHAR(64) PRIMARY KEY,
+                value BIGINT NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS metrics_active_users (
+                day DATE NOT NULL,
+                user_id INT NOT NULL,
+                PRIMARY KEY (day, user_id)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS metrics_rollup_state (
+                source VARCHAR(64) PRIMARY KEY,
+                last_id BIGINT NOT NULL DEFAULT 0
+            )
+        """)
+        self._metrics_ready = True
+
+    def roll_up_metrics(self, batch_size=10000, settle_seconds=60):
+        """Fold rows added since the last pass into the hourly and total counters
+
+        Each source table is read past its primary-key watermark, at most
+        ``batch_size`` rows per table per call, skipping rows younger than
+        ``settle_seconds`` so inserts still in flight aren't passed over. The
+        counters and the watermark move in one transaction, and the watermark
+        row is locked, so concurrent passes from several workers never count a
+        row twice. Returns {table: rows rolled up}.
+        """
+        rolled = {}
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                self._ensure_metrics_tables(cursor)
+                self._ensure_study_materials_table(cursor)
+                conn.commit()
+                for table, metrics in METRIC_ROLLUPS.items():
+                    cursor.execute('INSERT IGNORE INTO metrics_rollup_state (source, last_id) VALUES (%s, 0)', (table,))
+                    cursor.execute('SELECT last_id FROM metrics_rollup_state WHERE source = %s FOR UPDATE', (table,))
+                    last_id = cursor.fetchone()['last_id']
+                    cursor.execute(f'''
+                        SELECT MAX(id) AS upper_id, COUNT(*) AS count FROM (
+                            SELECT id FROM {table}
+                            WHERE id > %s AND created_at < NOW() - INTERVAL %s SECOND
+                            ORDER BY id LIMIT %s
+                        ) batch
+                    ''', (last_id, settle_seconds, batch_size))
+                    batch = cursor.fetchone()
+                    if not batch['upper_id']:
+                        conn.commit()
+                        rolled[table] = 0
+                        continue
+                    rows = (last_id, batch['upper_id'])
+                    for metric, aggregate in metrics:
+                        cursor.execute(f'''
+                            INSERT INTO metrics_hourly (metric, bucket, value)
+                            SELECT * FROM (
+                                SELECT %s AS metric, DATE_FORMAT(created_at, '%%Y-%%m-%%d %%H:00:00') AS hour, {aggregate} AS amount
+                                FROM {table} WHERE id > %s AND id <= %s AND created_at IS NOT NULL
+                                GROUP BY hour
+                            ) rolled
+                            ON DUPLICATE KEY UPDATE value = metrics_hourly.value + rolled.amount
+                        ''', (metric, *rows))
+                        cursor.execute(f'''
+                            INSERT INTO metrics_totals (metric, value)
+                            SELECT * FROM (
+                                SELECT %s AS metric, {aggregate} AS amount
+                                FROM {table} WHERE id > %s AND id <= %s AND created_at IS NOT NULL
+                            ) rolled
+                            ON DUPLICATE KEY UPDATE value = metrics_totals.value + rolled.amount
+                        ''', (metric, *rows))
+                    if table == 'audio_history':
+                        cursor.execute('''
+                            INSERT IGNORE INTO metrics_active_users (day, user_id)
+                            SELECT DISTINCT DATE(created_at), user_id FROM audio_history
+                            WHERE id > %s AND id <= %s AND created_at IS NOT NULL
+                        ''', rows)
+                    cursor.execute('UPDATE metrics_rollup_state SET last_id = %s WHERE source = %s',
+                                   (batch['upper_id'], table))
+                    conn.commit()
+                    rolled[table] = batch['count']
+        return rolled
+
+    def _record_deletions(self, cursor, source, metric, where, params):
+        """Count rows of ``source`` about to be deleted under ``metric``
+
+        Call in the deleting transaction, before the DELETE. Only rows at or
+        below the rollup watermark were counted, so only those are taken back;
+        the state row stays locked until commit, so a concurrent rollup can't
+        move the watermark past rows this has just skipped.
+        """
+        cursor.execute('SELECT last_id FROM metrics_rollup_state WHERE source = %s FOR UPDATE', (source,))
+        state = cursor.fetchone()
+        if not state:
+            return  # never rolled up, so nothing to take back
+        cursor.execute(f'SELECT COUNT(*) AS count FROM {source} WHERE {where} AND id <= %s',
+                       [*params, state['last_id']])
+        count = cursor.fetchone()['count']
+        if not count:
+            return
+        cursor.execute('''
+            INSERT INTO metrics_hourly (metric, bucket, value)
+            VALUES (%s, DATE_FORMAT(NOW(), '%%Y-%%m-%%d %%H:00:00'), %s)
+            ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+        ''', (metric, count))
+        cursor.execute('''
+            INSERT INTO metrics_totals (metric, value) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+        ''', (metric, count))
+
+    def get_metric_totals(self, metrics):
+        """Running totals of the given metrics (0 for any never recorded)"""
+        totals = dict.fromkeys(metrics, 0)
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                self._ensure_metrics_tables(cursor)
+                placeholders = ', '.join(['%s'] * len(totals))
+                cursor.execute(f'SELECT metric, value FROM metrics_totals WHERE metric IN ({placeholders})', list(totals))
+                for row in cursor.fetchall():
+                    totals[row['metric']] = int(row['value'])
+        return totals
+
+    def get_metric_buckets(self, metric, start, end):
+        """Hourly (bucket, value) rows of a metric with start <= bucket < end"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                self._ensure_metrics_tables(cursor)
+                cursor.execute('''
+                    SELECT bucket, value FROM metrics_hourly
+                    WHERE metric = %s AND bucket >= %s AND bucket < %s
+                    ORDER BY bucket
+                ''', (metric, start, end))
+                return cursor.fetchall()
+
+    def count_active_users(self, day):
+        """Distinct users who generated audio on ``day`` (a date)"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                self._ensure_metrics_tables(cursor)
+                cursor.execute('SELECT COUNT(*) as count FROM metrics_active_users WHERE day = %s', (day,))
+                return cursor.fetchone()['count']
+
+    def get_database_size(self):
+        """Bytes of data and indexes in this database"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                    SELECT COALESCE(SUM(data_length + index_length), 0) as size
+                    FROM information_schema.TABLES WHERE table_schema = DATABASE()
+                ''')
+                return int(cursor.fetchone()['size'])
+
     def get_recent_users(self, limit=10):
         """Get recent users for admin dashboard"""
         try:
@@ -887,43 +1436,60 @@ class DatabaseManager:
             logger.error(f"Error getting recent users: {e}")
             raise
 
-    def get_system_health(self):
-        """Get system health metrics"""
-        try:
-            # Mock data for now - in production you'd get real metrics
-            return {
-                'storagePercent': 45,
-                'uptimeSeconds': 86400  # 1 day
-            }
-        except Exception as e:
-            logger.error(f"Error getting system health: {e}")
-            raise
+    def _ensure_study_materials_table(self, cursor):
+        """Create the study_materials table, adding the dedup columns to older tables (once per process)"""
+        if getattr(self, '_study_materials_ready', False):
+            return
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS study_materials (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                user_id INT NOT NULL,
+                title VARCHAR(255) NOT NULL,
+                content LONGTEXT NOT NULL,
+                chapters JSON NOT NULL,
+                file_type VARCHAR(100),
+                content_hash CHAR(64) NULL,
+                source_material_id INT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                INDEX idx_study_materials_content_hash (content_hash)
+            )
+        """)
+        for column, definition in (('content_hash', 'CHAR(64) NULL'), ('source_material_id', 'INT NULL')):
+            cursor.execute("""
+                SELECT COUNT(*) as count
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME = 'study_materials'
+                AND COLUMN_NAME = %s
+            """, (column,))
+            if cursor.fetchone()['count'] == 0:
+                logger.info(f"Adding study_materials.{column} column")
+                cursor.execute(f"ALTER TABLE study_materials ADD COLUMN {column} {definition}")
+                if column == 'content_hash':
+                    cursor.execute("CREATE INDEX idx_study_materials_content_hash ON study_materials (content_hash)")
+        self._study_materials_ready = True
 
-    def save_study_material(self, user_id, title, content, chapters, file_type):
-        """Save study material to database"""
+    def save_study_material(self, user_id, title, content, chapters, file_type, content_hash=None,
+                            source_material_id=None):
+        """Save study material to database
+
+        With ``source_material_id`` the text isn't stored again; the row reads
+        its content from that material (see ``get_study_material``).
+        """
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    # Create study_materials table if it doesn't exist
-                    cursor.execute("""
-                        CREATE TABLE IF NOT EXISTS study_materials (
-                            id INT AUTO_INCREMENT PRIMARY KEY,
-                            user_id INT NOT NULL,
-                            title VARCHAR(255) NOT NULL,
-                            content LONGTEXT NOT NULL,
-                            chapters JSON NOT NULL,
-                            file_type VARCHAR(100),
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                        )
-                    """)
+                    self._ensure_study_materials_table(cursor)
                     
                     # Insert study material
                     cursor.execute("""
-                        INSERT INTO study_materials (user_id, title, content, chapters, file_type)
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (user_id, title, content, chapters, file_type))
+                        INSERT INTO study_materials
+                            (user_id, title, content, chapters, file_type, content_hash, source_material_id)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """, (user_id, title, '' if source_material_id else content, chapters, file_type,
+                          content_hash, source_material_id))
                     
                     material_id = cursor.lastrowid
                     conn.commit()
@@ -935,6 +1501,33 @@ class DatabaseManager:
             logger.error(f"Error saving study material: {e}")
             raise
 
+    def find_study_material_by_hash(self, content_hash, user_id=None, include_content=False):
+        """Find a material uploaded with the same file hash
+
+        Prefers ``user_id``'s own copy, then a row that stores the text itself.
+        The row's ``content_owner_id`` is the material that holds the text.
+        """
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    self._ensure_study_materials_table(cursor)
+                    content_column = ", COALESCE(src.content, sm.content) AS content" if include_content else ""
+                    cursor.execute(f"""
+                        SELECT sm.id, sm.user_id, sm.title, sm.chapters, sm.file_type,
+                               COALESCE(sm.source_material_id, sm.id) AS content_owner_id{content_column}
+                        FROM study_materials sm
+                        LEFT JOIN study_materials src ON src.id = sm.source_material_id
+                        WHERE sm.content_hash = %s
+                        ORDER BY sm.user_id = %s DESC, sm.source_material_id IS NULL DESC, sm.id
+                        LIMIT 1
+                    """, (content_hash, user_id))
+                    
+                    return cursor.fetchone()
+                    
+        except Exception as e:
+            logger.error(f"Error finding study material by hash: {e}")
+            raise
+
     def get_user_study_materials(self, user_id):
         """Get all study materials for a user"""
         try:
@@ -958,9 +1551,16 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
+                    self._ensure_study_materials_table(cursor)
+                    # Deduplicated uploads keep their text on the source material
                     cursor.execute("""
-                        SELECT * FROM study_materials
-                        WHERE id = %s AND user_id = %s
+                        SELECT sm.id, sm.user_id, sm.title,
+                               COALESCE(src.content, sm.content) AS content,
+                               sm.chapters, sm.file_type, sm.content_hash, sm.source_material_id,
+                               sm.created_at, sm.updated_at
+                        FROM study_materials sm
+                        LEFT JOIN study_materials src ON src.id = sm.source_material_id
+                        WHERE sm.id = %s AND sm.user_id = %s
                     """, (material_id, user_id))
                     
                     return cursor.fetchone()
@@ -974,6 +1574,34 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
+                    self._ensure_study_materials_table(cursor)
+                    cursor.execute("""
+                        SELECT id, source_material_id FROM study_materials
+                        WHERE id = %s AND user_id = %s
+                    """, (material_id, user_id))
+                    material = cursor.fetchone()
+                    if not material:
+                        return False
+                    
+                    if material['source_material_id'] is None:
+                        # Other uploads may read their text from this row; hand it to the oldest one
+                        cursor.execute("""
+                            SELECT MIN(id) AS heir_id FROM study_materials
+                            WHERE source_material_id = %s
+                        """, (material_id,))
+                        heir_id = cursor.fetchone()['heir_id']
+                        if heir_id is not None:
+                            cursor.execute("""
+                                UPDATE study_materials heir
+                                JOIN study_materials src ON src.id = %s
+                                SET heir.content = src.content, heir.source_material_id = NULL
+                                WHERE heir.id = %s
+                            """, (material_id, heir_id))
+                            cursor.execute("""
+                                UPDATE study_materials SET source_material_id = %s
+                                WHERE source_material_id = %s
+                            """, (heir_id, material_id))
+                    
                     cursor.execute("""
                         DELETE FROM study_materials
                         WHERE id = %s AND user_id = %s
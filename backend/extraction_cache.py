@@ -0,0 +1,66 @@
+"""
+Extraction results cached by uploaded file hash
+
+Students upload the same textbooks over and over. Uploads are hashed while
+they arrive (see upload_spool), and the extracted text together with its
+chapter/topic structure is kept in a bounded LRU keyed by that hash, so a
+repeat upload skips extraction and chunking entirely. (The study_materials
+table carries the same hash, so the database is the second tier.)
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCache:
+    """LRU of content hash -> (extracted text, processed material), bounded by entries and text size"""
+
+    def __init__(self, max_entries: int = 256, max_chars: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._entries = OrderedDict()  # hash -> (text, material)
+        self._chars = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def get(self, content_hash: str) -> Optional[Tuple[str, Dict]]:
+        """The cached (text, material) for ``content_hash``; the material dict is a copy"""
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(content_hash)
+            self._stats['hits'] += 1
+            text, material = entry
+            return text, dict(material)
+
+    def put(self, content_hash: str, text: str, material: Dict):
+        if len(text) > self.max_chars:
+            logger.info(f"Not caching extraction of {len(text)} characters (limit {self.max_chars})")
+            return
+        material = {key: value for key, value in material.items() if key != 'material_id'}
+        with self._lock:
+            previous = self._entries.pop(content_hash, None)
+            if previous is not None:
+                self._chars -= len(previous[0])
+            self._entries[content_hash] = (text, material)
+            self._chars += len(text)
+            self._stats['stores'] += 1
+            while len(self._entries) > self.max_entries or self._chars > self.max_chars:
+                _, (evicted_text, _) = self._entries.popitem(last=False)
+                self._chars -= len(evicted_text)
+                self._stats['evictions'] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['chars'] = self._chars
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
@@ -0,0 +1,89 @@
+"""
+Shared HTTP sessions for the upstream AI APIs
+
+One requests.Session per upstream host keeps TLS connections alive between
+calls to Hugging Face, Watsonx and IBM IAM instead of handshaking on every
+request. Sessions retry 429/503 responses with exponential backoff (honoring
+Retry-After); callers that handle those statuses themselves can opt out.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 503)
+
+
+class HttpClient:
+    """Pooled, keep-alive sessions keyed by upstream host"""
+
+    def __init__(self, pool_maxsize: int = 10, retries: int = 2, backoff_factor: float = 0.5):
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _new_session(self, retry_status: bool) -> requests.Session:
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=0,  # a read timeout may mean the upstream is still working; don't resend
+            status=self.retries if retry_status else 0,
+            status_forcelist=RETRY_STATUSES if retry_status else (),
+            allowed_methods=None,  # 429/503 mean the request wasn't processed, so POST is safe to resend
+            backoff_factor=self.backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def session_for(self, url: str, retry_status: bool = True) -> requests.Session:
+        """The shared session for ``url``'s host"""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc, retry_status)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = self._new_session(retry_status)
+                logger.info(f"Opened HTTP session for {parts.scheme}://{parts.netloc}")
+            return session
+
+    def post(self, url: str, timeout, retry_status: bool = True, **kwargs) -> requests.Response:
+        """POST through the host's pooled session; ``timeout`` is required, as with every upstream call"""
+        return self.session_for(url, retry_status).post(url, timeout=timeout, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        """Number of sessions per host"""
+        with self._lock:
+            hosts = {}
+            for scheme, netloc, _ in self._sessions:
+                host = f'{scheme}://{netloc}'
+                hosts[host] = hosts.get(host, 0) + 1
+            return hosts
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
+
+
+# Shared instance, configured from the environment
+http_client = HttpClient(
+    pool_maxsize=int(os.getenv('HTTP_POOL_MAXSIZE', 10)),
+    retries=int(os.getenv('HTTP_RETRIES', 2)),
+    backoff_factor=float(os.getenv('HTTP_BACKOFF_FACTOR', 0.5))
+)
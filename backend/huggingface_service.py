@@ -6,17 +6,23 @@ Uses IBM Granite models and TTS models via Hugging Face Inference API
 import os
 import requests
 import json
+import time
 import logging
-import tempfile
-import base64
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from dotenv import load_dotenv
+from synthesis_pool import engine_limiter
+from local_tts import local_tts
+from circuit_breaker import ModelRouter
+from http_client import http_client
 
 # Reload environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Engine id reported when audio comes from the local pyttsx3 fallback
+LOCAL_TTS_ENGINE = 'local-pyttsx3'
+
 class HuggingFaceService:
     """Service for interacting with Hugging Face APIs"""
     
@@ -34,7 +40,17 @@ class HuggingFaceService:
             'facebook/mms-tts-eng',
             'suno/bark'
         ]
+        # Per-model circuit breakers so failing or cold models are skipped instead of retried on every request
+        self.tts_timeout = int(os.getenv('HF_TTS_TIMEOUT', 90))
+        self.tts_router = ModelRouter(
+            self.tts_models,
+            failure_threshold=float(os.getenv('HF_TTS_BREAKER_THRESHOLD', 0.5)),
+            cooldown=float(os.getenv('HF_TTS_BREAKER_COOLDOWN', 30)),
+            probe_timeout=2 * self.tts_timeout
+        )
         self.base_url = "https://api-inference.huggingface.co/models"
+        # Rewrite prompts sent per batched generation request
+        self.text_batch_size = max(1, int(os.getenv('HF_TEXT_BATCH_SIZE', 8)))
         
         # Debug logging
         logger.info(f"Hugging Face token loaded: {'Yes' if self.api_token and self.api_token.startswith('hf_') else 'No'}")
@@ -52,8 +68,9 @@ class HuggingFaceService:
             headers['Authorization'] = f'Bearer {self.api_token}'
         return headers
     
-    def _make_request(self, model_name: str, payload: Dict[str, Any], timeout: int = 30) -> Optional[requests.Response]:
-        """Make request to Hugging Face Inference API"""
+    def _make_request(self, model_name: str, payload: Dict[str, Any], timeout: int = 30,
+                      retry_status: bool = True) -> Optional[requests.Response]:
+        """Make request to Hugging Face Inference API over the shared keep-alive session"""
         try:
             url = f"{self.base_url}/{model_name}"
             headers = self._get_headers()
@@ -62,11 +79,12 @@ class HuggingFaceService:
             logger.debug(f"URL: {url}")
             logger.debug(f"Headers: {headers}")
             
-            response = requests.post(
+            response = http_client.post(
                 url,
                 headers=headers,
                 json=payload,
-                timeout=timeout
+                timeout=timeout,
+                retry_status=retry_status
             )
             
             logger.info(f"Hugging Face response status: {response.status_code}")
@@ -79,6 +97,35 @@ class HuggingFaceService:
             logger.error(f"Error making request to Hugging Face: {e}")
             return None
     
+    def _rewrite_prompt(self, text: str, tone: str) -> str:
+        """Build the generation prompt for rewriting text in a tone"""
+        # Tone-specific prompts for text rewriting
+        tone_prompts = {
+            'neutral': "Rewrite this text in a clear, professional tone:",
+            'suspenseful': "Rewrite this text to create suspense and drama:",
+            'inspiring': "Rewrite this text in an uplifting, motivational tone:",
+            'cheerful': "Rewrite this text in a bright, happy tone:",
+            'sad': "Rewrite this text in a soft, emotional tone:",
+            'angry': "Rewrite this text with intensity and passion:",
+            'playful': "Rewrite this text in a fun, lively tone:",
+            'calm': "Rewrite this text in a relaxed, peaceful tone:",
+            'confident': "Rewrite this text in an assured, authoritative tone:"
+        }
+        
+        prompt_template = tone_prompts.get(tone, tone_prompts['neutral'])
+        return f"{prompt_template}\n\nText: {text}\n\nRewritten:"
+    
+    def _generation_payload(self, inputs) -> Dict[str, Any]:
+        # Use text generation format for FLAN-T5
+        return {
+            "inputs": inputs,
+            "parameters": {
+                "max_new_tokens": 150,
+                "temperature": 0.7,
+                "do_sample": True
+            }
+        }
+    
     def rewrite_text(self, text: str, tone: str) -> str:
         """
         Rewrite text using Hugging Face model with specified tone
@@ -88,33 +135,8 @@ class HuggingFaceService:
             return f"[{tone.upper()} TONE] {text}"
         
         try:
-            # Tone-specific prompts for text rewriting
-            tone_prompts = {
-                'neutral': "Rewrite this text in a clear, professional tone:",
-                'suspenseful': "Rewrite this text to create suspense and drama:",
-                'inspiring': "Rewrite this text in an uplifting, motivational tone:",
-                'cheerful': "Rewrite this text in a bright, happy tone:",
-                'sad': "Rewrite this text in a soft, emotional tone:",
-                'angry': "Rewrite this text with intensity and passion:",
-                'playful': "Rewrite this text in a fun, lively tone:",
-                'calm': "Rewrite this text in a relaxed, peaceful tone:",
-                'confident': "Rewrite this text in an assured, authoritative tone:"
-            }
-            
-            prompt_template = tone_prompts.get(tone, tone_prompts['neutral'])
-            full_prompt = f"{prompt_template}\n\nText: {text}\n\nRewritten:"
-            
-            # Use text generation format for FLAN-T5
-            payload = {
-                "inputs": full_prompt,
-                "parameters": {
-                    "max_new_tokens": 150,
-                    "temperature": 0.7,
-                    "do_sample": True
-                }
-            }
-            
-            response = self._make_request(self.text_model, payload)
+            full_prompt = self._rewrite_prompt(text, tone)
+            response = self._make_request(self.text_model, self._generation_payload(full_prompt))
             
             if response and response.status_code == 200:
                 result = response.json()
@@ -140,248 +162,138 @@ class HuggingFaceService:
             logger.error(f"Error in text rewriting: {e}")
             return f"[{tone.upper()}] {text}"
     
+    def rewrite_texts(self, items: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """
+        Rewrite many (text, tone) pairs with as few generation calls as possible
+
+        Prompts are sent as batched ``inputs``, up to ``text_batch_size`` per
+        request. Returns one rewrite per item, or None where the model gave
+        nothing usable (callers fall back per item).
+        """
+        results = [None] * len(items)
+        if not self.api_token or not items:
+            return results
+        
+        prompts = [self._rewrite_prompt(text, tone) for text, tone in items]
+        for start in range(0, len(prompts), self.text_batch_size):
+            batch = prompts[start:start + self.text_batch_size]
+            try:
+                response = self._make_request(self.text_model, self._generation_payload(batch), timeout=60)
+                if not response or response.status_code != 200:
+                    continue
+                
+                generations = response.json()
+                if not isinstance(generations, list) or len(generations) != len(batch):
+                    logger.error(f"Unexpected batch response format for {len(batch)} inputs")
+                    continue
+                
+                for offset, (prompt, generation) in enumerate(zip(batch, generations)):
+                    # Batched text generation answers with one list of candidates per input
+                    if isinstance(generation, list):
+                        generation = generation[0] if generation else {}
+                    generated_text = generation.get('generated_text', '') if isinstance(generation, dict) else ''
+                    clean_text = generated_text.replace(prompt, '').strip()
+                    if clean_text:
+                        results[start + offset] = clean_text
+                        
+            except Exception as e:
+                logger.error(f"Error in batch text rewriting: {e}")
+        
+        return results
+    
     def synthesize_speech(self, text: str, voice: str = "default", tone: str = "neutral") -> Optional[bytes]:
         """
         Generate high-quality speech from text using Hugging Face TTS models with tone support
         """
+        audio_data, _ = self.synthesize_speech_with_engine(text, voice, tone)
+        return audio_data
+    
+    def candidate_tts_engines(self) -> List[str]:
+        """Engine ids that synthesize_speech may answer with, in preference order"""
+        if not self.api_token:
+            return [LOCAL_TTS_ENGINE]
+        return list(self.tts_models) + [LOCAL_TTS_ENGINE]
+    
+    def synthesize_speech_with_engine(self, text: str, voice: str = "default", tone: str = "neutral") -> Tuple[Optional[bytes], str]:
+        """
+        Like synthesize_speech, but also returns the id of the engine that produced the audio
+        """
         if not self.api_token:
             logger.info("Using high-quality local TTS (no Hugging Face token)")
-            return self._create_mock_audio(text, voice, tone)
+            return self._synthesize_locally(text, voice, tone), LOCAL_TTS_ENGINE
         
         try:
-            # Try multiple TTS models for best quality
-            for model in self.tts_models:
+            # Try healthy TTS models, fastest first; models with open circuits are skipped
+            for model, breaker in self.tts_router.attempts():
+                logger.info(f"Trying TTS model: {model}")
                 try:
-                    logger.info(f"Trying TTS model: {model}")
-                    
-                    # Enhanced payload for better quality
+                    # Don't block on cold models: a loading model answers right away with estimated_time
                     payload = {
                         "inputs": text,
                         "options": {
                             "use_cache": False,
-                            "wait_for_model": True
+                            "wait_for_model": False
                         }
                     }
-                    
-                    # Use different endpoint for TTS models
-                    response = self._make_request(model, payload, timeout=90)
-                    
-                    if response and response.status_code == 200:
-                        # Check if response is audio data
-                        content_type = response.headers.get('content-type', '')
-                        if 'audio' in content_type or len(response.content) > 1000:  # Audio files are typically large
-                            logger.info(f"High-quality TTS successful with {model}: {len(response.content)} bytes")
-                            return response.content
-                        else:
-                            # If it's JSON, the model might not be ready
-                            try:
-                                result = response.json()
-                                if 'error' in result:
-                                    logger.warning(f"TTS model {model} error: {result['error']}")
-                                elif 'estimated_time' in result:
-                                    logger.info(f"Model {model} loading, estimated time: {result['estimated_time']}s")
-                            except:
-                                pass
-                            continue
-                    else:
-                        error_msg = response.text if response else "No response"
-                        logger.warning(f"TTS model {model} failed: {error_msg}")
+                
+                    started = time.monotonic()
+                    # 503 means "still loading" here, which the circuit breaker handles, so don't retry it
+                    response = self._make_request(model, payload, timeout=self.tts_timeout, retry_status=False)
+                    latency = time.monotonic() - started
+                
+                    if response is None:
+                        breaker.record_failure()
                         continue
-                        
+                
+                    # Check if response is audio data
+                    content_type = response.headers.get('content-type', '')
+                    if response.status_code == 200 and ('audio' in content_type or len(response.content) > 1000):
+                        logger.info(f"High-quality TTS successful with {model}: {len(response.content)} bytes in {latency:.1f}s")
+                        breaker.record_success(latency)
+                        return response.content, model
+                
+                    # A JSON body may say the model is still loading (HTTP 503) or report an error
+                    try:
+                        result = response.json()
+                    except ValueError:
+                        result = {}
+                    if not isinstance(result, dict):
+                        result = {}
+                
+                    if 'estimated_time' in result:
+                        logger.info(f"Model {model} loading, estimated time: {result['estimated_time']}s")
+                        breaker.record_failure(retry_after=float(result['estimated_time']))
+                    else:
+                        logger.warning(f"TTS model {model} failed: {result.get('error') or response.text}")
+                        breaker.record_failure()
+            
                 except Exception as e:
-                    logger.warning(f"Error with TTS model {model}: {e}")
-                    continue
+                    # Whatever went wrong, the call's outcome must be recorded (it may hold the probe slot)
+                    logger.warning(f"TTS model {model} raised: {e}")
+                    breaker.record_failure()
             
             # If all Hugging Face models fail, use high-quality local TTS
             logger.info("All Hugging Face TTS models failed, using high-quality local TTS")
-            return self._create_mock_audio(text, voice, tone)
+            return self._synthesize_locally(text, voice, tone), LOCAL_TTS_ENGINE
                 
         except Exception as e:
             logger.error(f"Error in speech synthesis: {e}")
             logger.info("Using high-quality local TTS fallback")
+            return self._synthesize_locally(text, voice, tone), LOCAL_TTS_ENGINE
+    
+    def _synthesize_locally(self, text: str, voice: str, tone: str) -> bytes:
+        """Run the local TTS fallback within the local engine's concurrency limit"""
+        with engine_limiter.slot('local'):
             return self._create_mock_audio(text, voice, tone)
     
     def _create_mock_audio(self, text: str = None, voice: str = "default", tone: str = "neutral") -> bytes:
         """
-        Create high-quality speech audio using pyttsx3 with tone and voice variations
+        Create high-quality speech audio using a pooled pyttsx3 engine with tone and voice variations
         """
         try:
-            import pyttsx3
-            import tempfile
-            import os
-            
-            # Initialize the TTS engine with high-quality settings
-            engine = pyttsx3.init(driverName='sapi5')  # Use SAPI5 for Windows for better quality
-            
-            # Enhanced tone-specific speech parameters for better audio quality
-            tone_settings = {
-                'neutral': {'rate': 160, 'volume': 0.9, 'pitch': 0},
-                'cheerful': {'rate': 180, 'volume': 0.95, 'pitch': 5},
-                'confident': {'rate': 150, 'volume': 0.95, 'pitch': 0},
-                'suspenseful': {'rate': 130, 'volume': 0.8, 'pitch': -5},
-                'inspiring': {'rate': 170, 'volume': 0.95, 'pitch': 3},
-                'sad': {'rate': 120, 'volume': 0.7, 'pitch': -8},
-                'angry': {'rate': 190, 'volume': 1.0, 'pitch': 2},
-                'playful': {'rate': 185, 'volume': 0.9, 'pitch': 7},
-                'calm': {'rate': 140, 'volume': 0.8, 'pitch': -2},
-                'professional': {'rate': 155, 'volume': 0.9, 'pitch': 0},
-                'dramatic': {'rate': 135, 'volume': 0.85, 'pitch': -3}
-            }
-            
-            # Get tone settings or use neutral as default
-            settings = tone_settings.get(tone.lower(), tone_settings['neutral'])
-            
-            # Set high-quality properties based on tone
-            engine.setProperty('rate', settings['rate'])     # Optimized speech rate
-            engine.setProperty('volume', settings['volume']) # Optimized volume
-            
-            # Get available voices and try to match with voice parameter
-            voices = engine.getProperty('voices')
-            if voices:
-                voice_selected = False
-                
-                # Enhanced voice mapping for all available Windows voices
-                voice_preferences = {
-                    'david': {
-                        'keywords': ['david', 'male', 'man'],
-                        'gender': 'male',
-                        'index': 0  # David is typically at index 0
-                    },
-                    'zira': {
-                        'keywords': ['zira', 'female', 'woman'],
-                        'gender': 'female',
-                        'index': 1  # Zira is typically at index 1
-                    },
-                    'heera': {
-                        'keywords': ['heera', 'female', 'woman'],
-                        'gender': 'female',
-                        'index': 2  # Heera may be at index 2
-                    },
-                    'mark': {
-                        'keywords': ['mark', 'male', 'man'],
-                        'gender': 'male',
-                        'index': 3  # Mark may be at index 3
-                    },
-                    'ravi': {
-                        'keywords': ['ravi', 'male', 'man'],
-                        'gender': 'male',
-                        'index': 4  # Ravi may be at index 4
-                    },
-                    # Legacy mappings for backward compatibility
-                    'lisa': {
-                        'keywords': ['zira', 'female', 'woman', 'lisa'],
-                        'gender': 'female',
-                        'index': 1  # Maps to Zira
-                    },
-                    'michael': {
-                        'keywords': ['david', 'male', 'man', 'michael'],
-                        'gender': 'male',
-                        'index': 0  # Maps to David
-                    },
-                    'allison': {
-                        'keywords': ['heera', 'female', 'woman', 'allison'],
-                        'gender': 'female', 
-                        'index': 2  # Maps to Heera
-                    }
-                }
-                
-                preferred_voice = voice_preferences.get(voice.lower())
-                
-                if preferred_voice and len(voices) > preferred_voice['index']:
-                    # Use the specific index for reliable voice selection
-                    selected_voice = voices[preferred_voice['index']]
-                    engine.setProperty('voice', selected_voice.id)
-                    voice_selected = True
-                    logger.info(f"Selected voice by index {preferred_voice['index']}: {selected_voice.name} for {voice}")
-                else:
-                    # Fallback to keyword matching if index is out of range
-                    if preferred_voice:
-                        # First, try to find voices with specific keywords
-                        for voice_obj in voices:
-                            voice_name = voice_obj.name.lower()
-                            voice_id = voice_obj.id.lower()
-                            
-                            # Check if voice name/id contains any of the preferred keywords
-                            for keyword in preferred_voice['keywords']:
-                                if keyword in voice_name or keyword in voice_id:
-                                    engine.setProperty('voice', voice_obj.id)
-                                    voice_selected = True
-                                    logger.info(f"Selected voice by keyword '{keyword}': {voice_obj.name} for {voice}")
-                                    break
-                            if voice_selected:
-                                break
-                        
-                        # If no keyword match, try to match by gender
-                        if not voice_selected:
-                            target_gender = preferred_voice['gender']
-                            for voice_obj in voices:
-                                voice_name = voice_obj.name.lower()
-                                voice_id = voice_obj.id.lower()
-                                
-                                # Check for gender indicators and specific voice names
-                                if target_gender == 'female' and any(indicator in voice_name or indicator in voice_id 
-                                                                   for indicator in ['female', 'woman', 'zira', 'heera']):
-                                    engine.setProperty('voice', voice_obj.id)
-                                    voice_selected = True
-                                    logger.info(f"Selected voice by gender '{target_gender}': {voice_obj.name} for {voice}")
-                                    break
-                                elif target_gender == 'male' and any(indicator in voice_name or indicator in voice_id 
-                                                                   for indicator in ['male', 'man', 'david', 'mark', 'ravi']):
-                                    engine.setProperty('voice', voice_obj.id)
-                                    voice_selected = True
-                                    logger.info(f"Selected voice by gender '{target_gender}': {voice_obj.name} for {voice}")
-                                    break
-                
-                # If still no voice selected, cycle through available voices based on voice parameter
-                if not voice_selected and voices:
-                    # Use different voices for different selections
-                    voice_index_map = {
-                        'lisa': 0,
-                        'michael': min(1, len(voices) - 1),
-                        'allison': min(2, len(voices) - 1) if len(voices) > 2 else 0
-                    }
-                    
-                    voice_index = voice_index_map.get(voice.lower(), 0)
-                    selected_voice = voices[voice_index]
-                    engine.setProperty('voice', selected_voice.id)
-                    voice_selected = True
-                    logger.info(f"Selected voice by index {voice_index}: {selected_voice.name} for {voice}")
-                
-                # Log available voices for debugging
-                logger.info(f"Available voices on system:")
-                for i, v in enumerate(voices):
-                    logger.info(f"  {i}: {v.name} (ID: {v.id})")
-                
-                if not voice_selected:
-                    # Fallback to first available voice
-                    engine.setProperty('voice', voices[0].id)
-                    logger.info(f"Using fallback voice: {voices[0].name}")
-            
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-                temp_path = temp_file.name
-            
-            # Generate speech and save to temporary file
-            engine.save_to_file(text or "Hello, this is a test message.", temp_path)
-            engine.runAndWait()
-            
-            # Read the generated audio file
-            try:
-                with open(temp_path, 'rb') as f:
-                    audio_data = f.read()
-                
-                # Clean up temporary file
-                os.unlink(temp_path)
-                
-                logger.info(f"Generated {len(audio_data)} bytes of audio with voice: {voice}, tone: {tone}")
-                return audio_data
-                
-            except Exception as e:
-                logger.error(f"Error reading generated audio file: {e}")
-                # Clean up on error
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-                return b""  # Return empty bytes on error
+            audio_data = local_tts.synthesize(text or "Hello, this is a test message.", voice, tone)
+            logger.info(f"Generated {len(audio_data)} bytes of audio with voice: {voice}, tone: {tone}")
+            return audio_data
                 
         except ImportError:
             logger.error("pyttsx3 not available, cannot generate speech")
@@ -389,7 +301,6 @@ class HuggingFaceService:
         except Exception as e:
             logger.error(f"Error in mock TTS generation: {e}")
             return b""
-            return self._create_silence_wav()
     
     def _create_silence_wav(self) -> bytes:
         """
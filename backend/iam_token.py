@@ -0,0 +1,110 @@
+"""
+Cached IBM Cloud IAM access tokens
+
+IAM tokens are valid for about an hour, so one is fetched once and reused by
+every Watsonx call. A timer refreshes it shortly before it expires, and
+concurrent refreshes collapse into a single request to iam.cloud.ibm.com.
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Optional, Tuple
+
+from http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+IAM_TOKEN_URL = 'https://iam.cloud.ibm.com/identity/token'
+
+
+class IAMTokenManager:
+    """Hands out a cached IAM token, refreshing it ahead of expiry"""
+
+    def __init__(self, api_key: str, url: str = IAM_TOKEN_URL, refresh_margin: float = 300,
+                 retry_interval: float = 30, clock: Callable[[], float] = time.time,
+                 background: bool = True):
+        self.api_key = api_key
+        self.url = url
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+        self.background = background
+        self._clock = clock
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._lock = threading.Lock()          # guards the cached token
+        self._refresh_lock = threading.Lock()  # single-flight refresh
+        self._timer = None
+        self.fetch_count = 0
+
+    def get_token(self) -> Optional[str]:
+        """A valid access token, or None if IAM can't be reached"""
+        with self._lock:
+            if self._token and self._clock() < self._expires_at:
+                return self._token
+        return self._refresh()
+
+    def invalidate(self):
+        """Drop the cached token, e.g. after the API rejected it"""
+        with self._lock:
+            self._token = None
+            self._expires_at = self._refresh_at = 0.0
+
+    def _refresh(self, scheduled: bool = False) -> Optional[str]:
+        with self._refresh_lock:
+            # Another caller may have refreshed while we waited for the lock
+            with self._lock:
+                if not scheduled and self._token and self._clock() < self._expires_at:
+                    return self._token
+
+            fetched = self._fetch()
+            with self._lock:
+                now = self._clock()
+                if fetched:
+                    token, expires_in = fetched
+                    self._token = token
+                    self._expires_at = now + expires_in
+                    self._refresh_at = now + max(expires_in - self.refresh_margin, expires_in / 2)
+                    self._schedule(self._refresh_at - now)
+                elif self._token and now < self._expires_at:
+                    logger.warning("IAM token refresh failed, keeping the current token")
+                    self._schedule(self.retry_interval)
+                else:
+                    self._token = None
+                return self._token if self._token and now < self._expires_at else None
+
+    def _schedule(self, delay: float):
+        """Arm the background refresh (caller holds the lock)"""
+        if not self.background:
+            return
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(max(delay, 1.0), self._refresh, kwargs={'scheduled': True})
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _fetch(self) -> Optional[Tuple[str, float]]:
+        """Request a new token; returns (token, seconds until expiry)"""
+        try:
+            response = http_client.post(
+                self.url,
+                headers={'Content-Type': 'application/x-www-form-urlencoded'},
+                data={
+                    'grant_type': 'urn:ibm:params:oauth:grant-type:apikey',
+                    'apikey': self.api_key
+                },
+                timeout=10
+            )
+            self.fetch_count += 1
+
+            if response.status_code == 200:
+                body = response.json()
+                logger.info(f"Fetched IAM access token, valid for {body.get('expires_in', 3600)}s")
+                return body['access_token'], float(body.get('expires_in', 3600))
+            logger.error(f"Failed to get access token: {response.status_code}")
+            return None
+
+        except Exception as e:
+            logger.error(f"Error getting access token: {e}")
+            return None
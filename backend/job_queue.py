@@ -0,0 +1,143 @@
+"""
+Background job queue for long-running audio generation
+
+Topic audio and merged story narration can take minutes when the TTS models
+are cold, so the job endpoints hand the work to a small local worker pool and
+return immediately. Each job is keyed by its audio_history row id, and every
+state change (pending -> running -> completed/failed) is reported through a
+callback so audio_history.processing_status stays the source of truth.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already waiting for a worker"""
+
+
+class Job:
+    """State of one submitted job"""
+
+    def __init__(self, job_id: int, kind: str):
+        self.id = job_id
+        self.kind = kind
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = None
+
+    def set_progress(self, **fields):
+        """Record incremental progress (e.g. completed/total) for pollers"""
+        self.progress = dict(self.progress or {}, **fields)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'progress': self.progress,
+            'queued_seconds': round((self.started_at or time.time()) - self.created_at, 3),
+            'run_seconds': round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None
+        }
+
+
+class JobQueue:
+    """Runs jobs on a thread pool and tracks their status
+
+    Job functions return ``(payload, status_code)`` like the synchronous
+    endpoints they back; a status code of 400 or above marks the job failed.
+    Finished jobs are kept in memory (up to ``max_finished``) so their results
+    can be polled; older ones are only visible through the database.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 100, max_finished: int = 1000,
+                 on_status: Optional[Callable[[int, str], Any]] = None):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.on_status = on_status
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='audio-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: int, kind: str, func: Callable[..., Any], *args,
+               report_progress: bool = False, **kwargs) -> Job:
+        """Queue ``func(*args, **kwargs)``; raises QueueFullError when the backlog is full
+
+        With ``report_progress`` the function also receives ``progress=job.set_progress``.
+        """
+        job = Job(job_id, kind)
+        if report_progress:
+            kwargs['progress'] = job.set_progress
+        with self._lock:
+            pending = sum(1 for queued in self._jobs.values() if queued.status == PENDING)
+            if pending >= self.max_pending:
+                raise QueueFullError(f"{pending} jobs are already waiting")
+            self._jobs[job_id] = job
+            self._prune()
+        self._executor.submit(self._run, job, func, args, kwargs)
+        logger.info(f"Queued {kind} job {job_id}")
+        return job
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {PENDING: 0, RUNNING: 0, COMPLETED: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        counts['workers'] = self.max_workers
+        return counts
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished (caller holds the lock)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _set_status(self, job: Job, status: str):
+        job.status = status
+        if self.on_status:
+            try:
+                self.on_status(job.id, status)
+            except Exception as e:
+                logger.warning(f"Failed to record status '{status}' for job {job.id}: {e}")
+
+    def _run(self, job: Job, func, args, kwargs):
+        job.started_at = time.time()
+        self._set_status(job, RUNNING)
+        try:
+            payload, status_code = func(*args, **kwargs)
+            if status_code >= 400:
+                job.error = payload.get('error', f'Job failed with status {status_code}')
+            else:
+                job.result = payload
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) crashed: {e}")
+            job.error = 'Internal server error'
+        job.finished_at = time.time()
+        self._set_status(job, FAILED if job.error else COMPLETED)
+        logger.info(f"Job {job.id} ({job.kind}) {job.status} in {job.finished_at - job.started_at:.1f}s")
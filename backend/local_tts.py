@@ -0,0 +1,256 @@
+"""
+Pooled pyttsx3 engines for the local TTS fallback
+
+Starting a pyttsx3 driver and enumerating the system voices costs far more
+than synthesizing a short sentence, so engines are created once and reused.
+Each engine lives on its own worker thread (SAPI5/COM objects must stay on
+the thread that created them) and keeps a snapshot of the system voices plus
+a precomputed voice-name -> voice-id table.
+"""
+
+import os
+import sys
+import queue
+import logging
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SystemVoice = namedtuple('SystemVoice', ['index', 'id', 'name', 'languages', 'gender', 'age'])
+
+# Speech parameters per tone
+TONE_SETTINGS = {
+    'neutral': {'rate': 160, 'volume': 0.9, 'pitch': 0},
+    'cheerful': {'rate': 180, 'volume': 0.95, 'pitch': 5},
+    'confident': {'rate': 150, 'volume': 0.95, 'pitch': 0},
+    'suspenseful': {'rate': 130, 'volume': 0.8, 'pitch': -5},
+    'inspiring': {'rate': 170, 'volume': 0.95, 'pitch': 3},
+    'sad': {'rate': 120, 'volume': 0.7, 'pitch': -8},
+    'angry': {'rate': 190, 'volume': 1.0, 'pitch': 2},
+    'playful': {'rate': 185, 'volume': 0.9, 'pitch': 7},
+    'calm': {'rate': 140, 'volume': 0.8, 'pitch': -2},
+    'professional': {'rate': 155, 'volume': 0.9, 'pitch': 0},
+    'dramatic': {'rate': 135, 'volume': 0.85, 'pitch': -3}
+}
+
+# How each app voice maps onto the Windows voices
+VOICE_PREFERENCES = {
+    'david': {'keywords': ['david', 'male', 'man'], 'gender': 'male', 'index': 0},
+    'zira': {'keywords': ['zira', 'female', 'woman'], 'gender': 'female', 'index': 1},
+    'heera': {'keywords': ['heera', 'female', 'woman'], 'gender': 'female', 'index': 2},
+    'mark': {'keywords': ['mark', 'male', 'man'], 'gender': 'male', 'index': 3},
+    'ravi': {'keywords': ['ravi', 'male', 'man'], 'gender': 'male', 'index': 4},
+    # Legacy mappings for backward compatibility
+    'lisa': {'keywords': ['zira', 'female', 'woman', 'lisa'], 'gender': 'female', 'index': 1},
+    'michael': {'keywords': ['david', 'male', 'man', 'michael'], 'gender': 'male', 'index': 0},
+    'allison': {'keywords': ['heera', 'female', 'woman', 'allison'], 'gender': 'female', 'index': 2}
+}
+
+GENDER_INDICATORS = {
+    'female': ['female', 'woman', 'zira', 'heera'],
+    'male': ['male', 'man', 'david', 'mark', 'ravi']
+}
+
+
+def resolve_voice(voices: List[SystemVoice], voice: str) -> Tuple[Optional[str], str]:
+    """Pick the system voice id for an app voice name; returns (voice_id, how it was chosen)
+
+    Tries the voice's usual index, then name keywords, then gender hints, and
+    finally falls back to a fixed index per legacy name or the first voice.
+    """
+    if not voices:
+        return None, 'no system voices'
+    voice = voice.lower()
+    preferred = VOICE_PREFERENCES.get(voice)
+
+    if preferred:
+        if len(voices) > preferred['index']:
+            return voices[preferred['index']].id, f"index {preferred['index']}"
+
+        # First system voice matching any keyword wins (voice order, not keyword order)
+        for system_voice in voices:
+            name, voice_id = system_voice.name.lower(), system_voice.id.lower()
+            for keyword in preferred['keywords']:
+                if keyword in name or keyword in voice_id:
+                    return system_voice.id, f"keyword '{keyword}'"
+
+        indicators = GENDER_INDICATORS[preferred['gender']]
+        for system_voice in voices:
+            name, voice_id = system_voice.name.lower(), system_voice.id.lower()
+            if any(indicator in name or indicator in voice_id for indicator in indicators):
+                return system_voice.id, f"gender '{preferred['gender']}'"
+
+    fallback_index = {
+        'lisa': 0,
+        'michael': min(1, len(voices) - 1),
+        'allison': min(2, len(voices) - 1) if len(voices) > 2 else 0
+    }.get(voice, 0)
+    return voices[fallback_index].id, f"fallback index {fallback_index}"
+
+
+class LocalTTSEngine:
+    """One pyttsx3 engine with its cached voice list and resolution table"""
+
+    def __init__(self, driver_name: Optional[str] = None):
+        import pyttsx3.engine
+
+        # pyttsx3.init() hands out one shared engine per driver, so build ours directly
+        self._engine = pyttsx3.engine.Engine(driver_name)
+        self.voices = [
+            SystemVoice(i, v.id, v.name, getattr(v, 'languages', []),
+                        getattr(v, 'gender', 'unknown'), getattr(v, 'age', 'unknown'))
+            for i, v in enumerate(self._engine.getProperty('voices') or [])
+        ]
+        self._voice_table = {name: resolve_voice(self.voices, name)[0] for name in VOICE_PREFERENCES}
+        fd, self._output_path = tempfile.mkstemp(prefix='echoverse-tts-', suffix='.wav')
+        os.close(fd)
+
+    def voice_id(self, voice: str) -> Optional[str]:
+        voice = voice.lower()
+        if voice not in self._voice_table:
+            self._voice_table[voice] = resolve_voice(self.voices, voice)[0]
+        return self._voice_table[voice]
+
+    def set_voice(self, voice_id: str) -> str:
+        """Select a system voice by id and return the voice the engine reports back"""
+        self._engine.setProperty('voice', voice_id)
+        return self._engine.getProperty('voice')
+
+    def synthesize(self, text: str, voice: str, tone: str) -> bytes:
+        settings = TONE_SETTINGS.get(tone.lower(), TONE_SETTINGS['neutral'])
+        self._engine.setProperty('rate', settings['rate'])
+        self._engine.setProperty('volume', settings['volume'])
+        voice_id = self.voice_id(voice)
+        if voice_id:
+            self._engine.setProperty('voice', voice_id)
+
+        self._engine.save_to_file(text, self._output_path)
+        self._engine.runAndWait()
+        with open(self._output_path, 'rb') as f:
+            return f.read()
+
+    def close(self):
+        try:
+            self._engine.stop()
+        finally:
+            if os.path.exists(self._output_path):
+                os.unlink(self._output_path)
+
+
+class _EngineWorker:
+    """Owns one engine and runs every call on the engine's own thread"""
+
+    def __init__(self, driver_name: Optional[str], name: str):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        try:
+            self.engine = self._executor.submit(LocalTTSEngine, driver_name).result()
+        except BaseException:
+            self._executor.shutdown(wait=False)
+            raise
+
+    def call(self, func: Callable[[LocalTTSEngine], Any]) -> Any:
+        return self._executor.submit(func, self.engine).result()
+
+    def close(self):
+        try:
+            self.call(LocalTTSEngine.close)
+        finally:
+            self._executor.shutdown(wait=False)
+
+
+class LocalTTSPool:
+    """Lock-guarded pool of pre-initialized local TTS engines
+
+    Engines are started lazily, up to ``size``; callers wait up to ``timeout``
+    seconds for an idle one. Raises ImportError if pyttsx3 isn't installed.
+    """
+
+    def __init__(self, size: int = 1, driver_name: Optional[str] = None, timeout: float = 60):
+        self.size = max(1, size)
+        self.driver_name = driver_name
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._synthesized = 0
+
+    def _start_worker(self) -> Optional[_EngineWorker]:
+        """Start another engine if the pool isn't full yet"""
+        with self._lock:
+            if len(self._workers) >= self.size:
+                return None
+            worker = _EngineWorker(self.driver_name, f'local-tts-{len(self._workers)}')
+            self._workers.append(worker)
+        logger.info(f"Started local TTS engine {len(self._workers)}/{self.size} with {len(worker.engine.voices)} voices:")
+        for v in worker.engine.voices:
+            logger.info(f"  {v.index}: {v.name} (ID: {v.id})")
+        return worker
+
+    @contextmanager
+    def _worker(self):
+        try:
+            worker = self._idle.get_nowait()
+        except queue.Empty:
+            worker = self._start_worker()
+            if worker is None:
+                try:
+                    worker = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No local TTS engine became free within {self.timeout}s")
+        try:
+            yield worker
+        finally:
+            self._idle.put(worker)
+
+    def run(self, func: Callable[[LocalTTSEngine], Any]) -> Any:
+        """Call ``func(engine)`` on an idle engine's thread"""
+        with self._worker() as worker:
+            return worker.call(func)
+
+    def synthesize(self, text: str, voice: str, tone: str) -> bytes:
+        audio_data = self.run(lambda engine: engine.synthesize(text, voice, tone))
+        with self._lock:
+            self._synthesized += 1
+        return audio_data
+
+    def voices(self) -> List[SystemVoice]:
+        """System voices, as discovered when the first engine started"""
+        with self._lock:
+            if self._workers:
+                return list(self._workers[0].engine.voices)
+        return self.run(lambda engine: list(engine.voices))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': self.size,
+                'started': len(self._workers),
+                'idle': self._idle.qsize(),
+                'synthesized': self._synthesized
+            }
+
+    def close(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+            self._idle = queue.LifoQueue()
+        for worker in workers:
+            worker.close()
+
+
+def _default_driver() -> Optional[str]:
+    driver = os.getenv('LOCAL_TTS_DRIVER')
+    if driver:
+        return driver
+    return 'sapi5' if sys.platform == 'win32' else None  # SAPI5 gives the best quality on Windows
+
+
+# Shared pool, configured from the environment
+local_tts = LocalTTSPool(
+    size=int(os.getenv('LOCAL_TTS_POOL_SIZE', 1)),
+    driver_name=_default_driver()
+)
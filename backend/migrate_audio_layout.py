@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Move audio from the old flat audio_files/ layout into sharded keys
+
+Rows written before sharding point at files directly under audio_files/
+(by bare file name, or by absolute path on older rows). This walks
+audio_history.audio_file_path and downloads.file_path in id order, one batch
+at a time. For each batch it gives every flat file a new key (ab/cd/<hash>.ext),
+moves the file through audio storage and rewrites the batch's rows in a
+single transaction. A file referenced by several rows moves once and every
+row follows it.
+
+Old -> new keys are appended to a journal (fsynced before any file of the
+batch moves), so an interrupted run can simply be started again: moved rows
+are already sharded and are skipped, and half-moved files are finished.
+Unreferenced flat files are left for the audio sweeper. Run it with the
+sweeper paused (AUDIO_GC_INTERVAL_MINUTES=0) on the other nodes, or at
+least not mid-sweep.
+
+    python migrate_audio_layout.py --dry-run
+    python migrate_audio_layout.py --batch-size 1000
+"""
+
+import os
+import sys
+import logging
+import argparse
+from dotenv import load_dotenv
+
+from audio_storage import key_for, is_sharded_key, new_audio_key, storage_from_env
+from database_manager import DatabaseManager
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+AUDIO_DIR = os.path.join(os.path.dirname(__file__), 'audio_files')
+
+
+class AudioLayoutMigration:
+    """Moves flat audio files to sharded keys and rewrites the rows that point at them"""
+
+    def __init__(self, db, storage, journal_path, batch_size=500, dry_run=False):
+        self.db = db
+        self.storage = storage
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.moved = self._load_journal()  # old key -> new key
+        self._done = set()  # old keys moved (or found moved) in this run
+
+    def _load_journal(self):
+        moved = {}
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding='utf-8') as f:
+                for line in f:
+                    old_key, _, new_key = line.rstrip('\n').partition('\t')
+                    if old_key and new_key:
+                        moved[old_key] = new_key
+        return moved
+
+    def _journal(self, entries):
+        if self.dry_run or not entries:
+            return
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.writelines(f'{old_key}\t{new_key}\n' for old_key, new_key in entries)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _move(self, old_key, new_key):
+        """Move one stored file; False if it isn't there"""
+        path = self.storage.local_path(old_key)
+        if not path:
+            return False
+        self.storage.put_file(new_key, path)
+        self.storage.delete(old_key)  # (a no-op once put_file has moved a local file)
+        return True
+
+    def run(self, tables=('audio_history', 'downloads')):
+        """Migrate every row of ``tables``; returns counts of what was (or would be) done"""
+        report = {'rows': 0, 'rewritten': 0, 'files_moved': 0, 'already_sharded': 0, 'missing': 0, 'invalid': 0}
+        for table in tables:
+            after_id = 0
+            while True:
+                rows = self.db.get_audio_reference_page(table, after_id, self.batch_size)
+                if not rows:
+                    break
+                after_id = rows[-1]['id']
+                self._migrate_batch(table, rows, report)
+                logger.info(f"{table}: migrated through id {after_id}")
+        return report
+
+    def _migrate_batch(self, table, rows, report):
+        # Resolve the batch's keys and plan new ones for files not seen before
+        pending = []
+        planned = []
+        for row in rows:
+            report['rows'] += 1
+            try:
+                old_key = key_for(row['ref'])
+            except ValueError:
+                report['invalid'] += 1
+                continue
+            if is_sharded_key(old_key):
+                report['already_sharded'] += 1
+                continue
+            if old_key not in self.moved:
+                if not self.storage.exists(old_key):
+                    report['missing'] += 1
+                    continue
+                self.moved[old_key] = new_audio_key(os.path.splitext(old_key)[1])
+                planned.append((old_key, self.moved[old_key]))
+            pending.append((row['id'], old_key))
+
+        self._journal(planned)
+
+        # Move files (finishing moves an interrupted run journaled), then rewrite rows
+        updates = []
+        for row_id, old_key in pending:
+            new_key = self.moved[old_key]
+            if old_key not in self._done:
+                if self.dry_run:
+                    moved = self.storage.exists(old_key)
+                else:
+                    moved = self._move(old_key, new_key)
+                if moved:
+                    report['files_moved'] += 1
+                elif not self.storage.exists(new_key):
+                    report['missing'] += 1
+                    continue
+                self._done.add(old_key)
+            updates.append((row_id, new_key))
+
+        if updates and not self.dry_run:
+            self.db.update_audio_references_batch(table, updates)
+        report['rewritten'] += len(updates)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Move flat audio files into the sharded layout')
+    parser.add_argument('--batch-size', type=int, default=500, help='rows per batch (default 500)')
+    parser.add_argument('--journal', default=os.path.join(os.path.dirname(__file__), 'audio_layout_migration.journal'),
+                        help='old -> new key journal, kept for resuming')
+    parser.add_argument('--dry-run', action='store_true', help='report what would move without changing anything')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    print("🚀 EchoVerse Audio Layout Migration")
+    print("=" * 40)
+    try:
+        migration = AudioLayoutMigration(DatabaseManager(), storage_from_env(AUDIO_DIR), args.journal,
+                                         batch_size=args.batch_size, dry_run=args.dry_run)
+        report = migration.run()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return 1
+
+    for name, count in report.items():
+        print(f"  {name}: {count}")
+    print("\n✅ Dry run complete, nothing was changed." if args.dry_run else "\n🎉 Audio layout migration completed!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
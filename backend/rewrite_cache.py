@@ -0,0 +1,164 @@
+"""
+Memoized LLM rewrites keyed by (text, tone, model)
+
+Students resubmit the same paragraphs and stories repeat lines, so rewrite
+results are kept in a bounded in-process LRU and, optionally, in a
+``rewrite_cache`` table of the SQLite database that survives restarts. Both
+tiers expire entries after a configurable TTL.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from audio_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+CREATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS rewrite_cache (
+        cache_key CHAR(64) PRIMARY KEY,
+        tone VARCHAR(50) NOT NULL,
+        model VARCHAR(255) NOT NULL,
+        rewritten_text TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+'''
+
+
+class RewriteCache:
+    """Two-tier (memory LRU + optional SQLite) cache of rewrite results"""
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 7 * 24 * 3600, db_path: Optional[str] = None,
+                 db_max_entries: int = 100000, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_max_entries = db_max_entries
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (rewritten text, stored at)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'db_hits': 0, 'misses': 0, 'stores': 0, 'expired': 0}
+        self._db = None
+        self._db_writes = 0
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(CREATE_TABLE_SQL)
+            self._db.execute('CREATE INDEX IF NOT EXISTS idx_rewrite_cache_created_at ON rewrite_cache(created_at)')
+            self._db.commit()
+            logger.info(f"Rewrite cache persisted to {db_path}")
+        except sqlite3.Error as e:
+            logger.error(f"Rewrite cache database unavailable, using memory only: {e}")
+            self._db = None
+
+    @staticmethod
+    def make_key(text: str, tone: str, model: str) -> str:
+        material = '\x1f'.join([normalize_text(text), (tone or '').lower(), model])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, text: str, tone: str, model: str) -> Optional[str]:
+        key = self.make_key(text, tone, model)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[0]
+                del self._entries[key]
+                self._stats['expired'] += 1
+
+            result = self._db_get(key, now)
+            if result is not None:
+                self._remember(key, result[0], result[1])
+                self._stats['db_hits'] += 1
+                return result[0]
+            return None
+
+    def lookup(self, text: str, tone: str, models: Iterable[str]) -> Tuple[Optional[str], Optional[str]]:
+        """First cached rewrite among ``models``, in preference order; returns (text, model)"""
+        for model in models:
+            result = self.get(text, tone, model)
+            if result is not None:
+                return result, model
+        with self._lock:
+            self._stats['misses'] += 1
+        return None, None
+
+    def put(self, text: str, tone: str, model: str, rewritten_text: str):
+        key = self.make_key(text, tone, model)
+        now = self._clock()
+        with self._lock:
+            self._remember(key, rewritten_text, now)
+            self._stats['stores'] += 1
+            self._db_put(key, tone, model, rewritten_text, now)
+
+    def _remember(self, key: str, rewritten_text: str, stored_at: float):
+        """Insert into the LRU tier (caller holds the lock)"""
+        self._entries[key] = (rewritten_text, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _db_get(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                'SELECT rewritten_text, created_at FROM rewrite_cache WHERE cache_key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] >= self.ttl:
+                self._db.execute('DELETE FROM rewrite_cache WHERE cache_key = ?', (key,))
+                self._db.commit()
+                self._stats['expired'] += 1
+                return None
+            return row[0], row[1]
+        except sqlite3.Error as e:
+            logger.warning(f"Rewrite cache read failed: {e}")
+            return None
+
+    def _db_put(self, key: str, tone: str, model: str, rewritten_text: str, now: float):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                'INSERT OR REPLACE INTO rewrite_cache (cache_key, tone, model, rewritten_text, created_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, tone, model, rewritten_text, now)
+            )
+            self._db_writes += 1
+            if self._db_writes % 100 == 0:
+                self._prune_db(now)
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Rewrite cache write failed: {e}")
+
+    def _prune_db(self, now: float):
+        """Drop expired rows and the oldest rows beyond db_max_entries"""
+        self._db.execute('DELETE FROM rewrite_cache WHERE created_at < ?', (now - self.ttl,))
+        self._db.execute(
+            'DELETE FROM rewrite_cache WHERE cache_key IN '
+            '(SELECT cache_key FROM rewrite_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+            (self.db_max_entries,)
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['persistent'] = self._db is not None
+        lookups = stats['hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['db_hits']) / lookups, 3) if lookups else 0.0
+        return stats
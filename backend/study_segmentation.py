@@ -0,0 +1,227 @@
+"""
+Linear-time chapter/topic segmentation for study materials
+
+Headings (``Chapter 3``, ``Unit 2``, ``Lesson 1``, ``Part 4`` and numbered
+``1.`` lines) are located by their literal anchors with ``str.find`` over
+one lowercased copy of the text, and only those candidates are checked
+against the heading patterns, recording offsets. As before, the first kind
+in that order with at least two headings splits the text into chapters, and
+lower-priority kinds aren't searched at all once one has. Chapters and
+topics are spans over the text; their titles, summaries and contents are
+only sliced out when they are read.
+"""
+
+import re
+from collections import namedtuple
+from typing import Dict, Iterator, List, Optional, Tuple
+
+HEADING_KINDS = ('chapter', 'unit', 'lesson', 'part', 'numbered')
+
+# A kind's headings are exactly what ``finditer`` with its pattern would return
+HEADING_PATTERNS = {
+    'chapter': re.compile(r'chapter\s+\d+[:\.]?\s*(.+?)(?=\n|$)', re.IGNORECASE | re.MULTILINE),
+    'unit': re.compile(r'unit\s+\d+[:\.]?\s*(.+?)(?=\n|$)', re.IGNORECASE | re.MULTILINE),
+    'lesson': re.compile(r'lesson\s+\d+[:\.]?\s*(.+?)(?=\n|$)', re.IGNORECASE | re.MULTILINE),
+    'part': re.compile(r'part\s+\d+[:\.]?\s*(.+?)(?=\n|$)', re.IGNORECASE | re.MULTILINE),
+    'numbered': re.compile(r'\d+\.\s*(.+?)(?=\n|$)', re.IGNORECASE | re.MULTILINE),
+}
+
+# Characters IGNORECASE equates with a keyword letter that str.lower() doesn't
+# map to it (U+0130 would even lower to two characters and shift offsets)
+_CASE_FIXES = str.maketrans({'\u0130': 'I', '\u0131': 'i', '\u017f': 's'})
+
+MIN_HEADINGS = 2
+SUMMARY_CHARS = 200
+TOPIC_NAME_CHARS = 60
+
+Heading = namedtuple('Heading', ['start', 'end', 'title_start', 'title_end'])
+
+
+def strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Offsets of ``text[start:end].strip()`` without copying it"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def first_line(text: str) -> str:
+    """First line of ``text.strip()``, without splitting the whole text"""
+    start, end = strip_span(text, 0, len(text))
+    newline = text.find('\n', start, end)
+    return text[start:newline if newline != -1 else end].strip()
+
+
+def fold_case(text: str) -> str:
+    """Lowercased copy with the same offsets, where every case-insensitive keyword match is a plain substring"""
+    if any(char in text for char in '\u0130\u0131\u017f'):
+        text = text.translate(_CASE_FIXES)
+    return text.lower()
+
+
+def _keyword_candidates(folded: str, keyword: str) -> Iterator[int]:
+    pos = folded.find(keyword)
+    while pos != -1:
+        yield pos
+        pos = folded.find(keyword, pos + 1)
+
+
+def _numbered_candidates(text: str) -> Iterator[int]:
+    """Starts of digit runs directly followed by a period (where ``\\d+\\.`` can match)"""
+    pos = text.find('.')
+    while pos != -1:
+        if pos and text[pos - 1].isdecimal():  # isdecimal() is exactly \d
+            start = pos - 1
+            while start and text[start - 1].isdecimal():
+                start -= 1
+            yield start
+        pos = text.find('.', pos + 1)
+
+
+def find_headings(text: str) -> Tuple[Optional[str], List[Heading]]:
+    """The winning heading kind and its headings, or (None, []) if no kind has two"""
+    folded = None
+    for kind in HEADING_KINDS:
+        if kind == 'numbered':
+            candidates = _numbered_candidates(text)
+        else:
+            if folded is None:
+                folded = fold_case(text)
+            candidates = _keyword_candidates(folded, kind)
+
+        pattern = HEADING_PATTERNS[kind]
+        headings = []
+        next_allowed = 0
+        for start in candidates:
+            if start < next_allowed:
+                continue
+            match = pattern.match(text, start)
+            if match is not None:
+                headings.append(Heading(start, match.end(), match.start(1), match.end(1)))
+                next_allowed = match.end()
+        if len(headings) >= MIN_HEADINGS:
+            return kind, headings
+    return None, []
+
+
+def paragraph_spans(text: str, start: int, end: int) -> List[Tuple[int, int]]:
+    """Stripped, non-empty ``\\n\\n``-separated paragraphs of ``text[start:end]``"""
+    spans = []
+    while True:
+        split = text.find('\n\n', start, end)
+        stop = end if split == -1 else split
+        para_start, para_end = strip_span(text, start, stop)
+        if para_start < para_end:
+            spans.append((para_start, para_end))
+        if split == -1:
+            return spans
+        start = split + 2
+
+
+class TopicNode:
+    """A run of paragraphs; ``None`` paragraphs means the whole chapter as 'Main Content'"""
+
+    __slots__ = ('_text', 'index', 'paragraphs', '_chapter')
+
+    def __init__(self, text: str, index: int, paragraphs, chapter: Tuple[int, int]):
+        self._text = text
+        self.index = index
+        self.paragraphs = paragraphs
+        self._chapter = chapter
+
+    @property
+    def name(self) -> str:
+        if self.paragraphs is None:
+            return 'Main Content'
+        start, end = self.paragraphs[0]
+        period = self._text.find('.', start, end)
+        first_sentence = self._text[start:period if period != -1 else end].strip()
+        if len(first_sentence) > TOPIC_NAME_CHARS:
+            first_sentence = first_sentence[:TOPIC_NAME_CHARS] + "..."
+        return f"Topic {self.index + 1}: {first_sentence}"
+
+    @property
+    def content(self) -> str:
+        if self.paragraphs is None:
+            return self._text[self._chapter[0]:self._chapter[1]]
+        return '\n\n'.join(self._text[start:end] for start, end in self.paragraphs)
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'content': self.content}
+
+
+class ChapterNode:
+    """A chapter as offsets into the text; topics are split on first access"""
+
+    __slots__ = ('_text', '_title', 'title_span', 'start', 'end', '_topics')
+
+    def __init__(self, text: str, start: int, end: int, title_span: Optional[Tuple[int, int]] = None,
+                 title: Optional[str] = None):
+        self._text = text
+        self.start = start
+        self.end = end
+        self.title_span = title_span
+        self._title = title
+        self._topics = None
+
+    @property
+    def title(self) -> str:
+        if self._title is None:
+            self._title = self._text[self.title_span[0]:self.title_span[1]]
+        return self._title
+
+    @property
+    def content(self) -> str:
+        return self._text[self.start:self.end]
+
+    @property
+    def summary(self) -> str:
+        summary = self._text[self.start:min(self.end, self.start + SUMMARY_CHARS)]
+        if self.end - self.start > SUMMARY_CHARS:
+            summary += "..."
+        return summary
+
+    @property
+    def topics(self) -> List[TopicNode]:
+        if self._topics is None:
+            self._topics = self._split_topics()
+        return self._topics
+
+    def _split_topics(self) -> List[TopicNode]:
+        paragraphs = paragraph_spans(self._text, self.start, self.end)
+        if len(paragraphs) <= 3:
+            # Short content is a single topic
+            return [TopicNode(self._text, 0, None, (self.start, self.end))]
+        topic_size = max(2, len(paragraphs) // 5)  # roughly five topics
+        return [
+            TopicNode(self._text, index, paragraphs[first:first + topic_size], (self.start, self.end))
+            for index, first in enumerate(range(0, len(paragraphs), topic_size))
+        ]
+
+    def to_dict(self) -> Dict:
+        return {
+            'title': self.title,
+            'summary': self.summary,
+            'topics': [topic.to_dict() for topic in self.topics]
+        }
+
+
+def segment(text: str, fallback_title: str) -> Tuple[Optional[str], List[ChapterNode]]:
+    """Split stripped ``text`` into chapters; returns (heading kind, chapters)
+
+    Without at least two headings of one kind the whole text is one chapter
+    titled ``fallback_title``. Headings followed by no content are dropped.
+    """
+    kind, headings = find_headings(text)
+    if kind is None:
+        return None, [ChapterNode(text, 0, len(text), title=fallback_title)]
+
+    chapters = []
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start if i + 1 < len(headings) else len(text)
+        start, end = strip_span(text, heading.end, end)
+        if start < end:
+            title_span = strip_span(text, heading.title_start, heading.title_end)
+            chapters.append(ChapterNode(text, start, end, title_span=title_span))
+    return kind, chapters
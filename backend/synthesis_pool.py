@@ -0,0 +1,105 @@
+"""
+Bounded concurrent execution for speech synthesis
+
+Segments of a story are synthesized on a shared thread pool while results
+are handed back in input order. Each TTS engine family additionally has its
+own concurrency limit, so fanning a long story out can't overload a remote
+API or run the (not thread-safe) local engine twice at once.
+"""
+
+import os
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class EngineLimiter:
+    """Per-engine concurrency limits backed by semaphores"""
+
+    def __init__(self, limits: Dict[str, int], default_limit: int = 4):
+        self.default_limit = default_limit
+        self._limits = dict(limits)
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, engine: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(engine)
+            if semaphore is None:
+                limit = max(1, self._limits.get(engine, self.default_limit))
+                semaphore = self._semaphores[engine] = threading.BoundedSemaphore(limit)
+            return semaphore
+
+    @contextmanager
+    def slot(self, engine: str):
+        """Hold one of the engine's concurrency slots for the duration of the block"""
+        semaphore = self._semaphore(engine)
+        semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def limits(self) -> Dict[str, int]:
+        """Configured limit per engine"""
+        return dict(self._limits)
+
+
+class SegmentExecutor:
+    """Thread pool that maps a function over segments, preserving order"""
+
+    def __init__(self, max_workers: int = 4, thread_name_prefix: str = 'segment-tts'):
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=thread_name_prefix)
+
+    def imap_ordered(self, func: Callable[[Any], Any], items: Iterable[Any],
+                     window: Optional[int] = None) -> Iterator[Tuple[Any, Optional[BaseException]]]:
+        """Yield (result, error) per item, in input order
+
+        At most ``window`` items are in flight at once (twice the worker count by
+        default), so ``items`` may be a lazy iterator. An exception raised for one
+        item is returned as its error and never cancels the others. Closing the
+        generator early cancels the items that haven't started yet.
+        """
+        window = window or self.max_workers * 2
+        pending = deque()
+        iterator = iter(items)
+        exhausted = False
+
+        try:
+            while pending or not exhausted:
+                while not exhausted and len(pending) < window:
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.append(self._executor.submit(func, item))
+
+                if pending:
+                    future = pending.popleft()
+                    try:
+                        yield future.result(), None
+                    except Exception as e:
+                        yield None, e
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def map_ordered(self, func: Callable[[Any], Any], items: Iterable[Any]) -> List[Tuple[Any, Optional[BaseException]]]:
+        """Eager version of imap_ordered"""
+        return list(self.imap_ordered(func, items))
+
+
+# Shared instances, configured from the environment
+engine_limiter = EngineLimiter({
+    'huggingface': int(os.getenv('TTS_CONCURRENCY_HUGGINGFACE', 4)),
+    'watson': int(os.getenv('TTS_CONCURRENCY_WATSON', 4)),
+    'local': int(os.getenv('TTS_CONCURRENCY_LOCAL', 1))
+})
+segment_executor = SegmentExecutor(max_workers=int(os.getenv('SEGMENT_SYNTHESIS_WORKERS', 4)))
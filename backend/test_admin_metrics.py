@@ -0,0 +1,109 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import admin_metrics
+from admin_metrics import MetricsRollup
+
+
+class FakeDB:
+    """metrics_hourly/metrics_totals as dicts"""
+
+    def __init__(self):
+        self.hourly = {}  # (metric, bucket) -> value
+        self.totals = {}
+        self.active_users = {}
+        self.pending = {}  # table -> rows not rolled up yet
+
+    def add(self, metric, bucket, value=1):
+        self.hourly[(metric, bucket)] = self.hourly.get((metric, bucket), 0) + value
+        self.totals[metric] = self.totals.get(metric, 0) + value
+
+    def get_metric_buckets(self, metric, start, end):
+        return [{'bucket': bucket, 'value': value} for (name, bucket), value in sorted(self.hourly.items())
+                if name == metric and start <= bucket < end]
+
+    def get_metric_totals(self, metrics):
+        return {metric: self.totals.get(metric, 0) for metric in metrics}
+
+    def count_active_users(self, day):
+        return len(self.active_users.get(day, ()))
+
+    def get_database_size(self):
+        return 5 * 1024 * 1024
+
+    def roll_up_metrics(self, batch_size=10000, settle_seconds=60):
+        rolled = {}
+        for table, count in self.pending.items():
+            rolled[table] = min(count, batch_size)
+            self.pending[table] = count - rolled[table]
+        return rolled
+
+
+NOW = datetime(2026, 3, 12, 15, 30)
+
+
+class AdminMetricsTestCase(unittest.TestCase):
+    def test_timeseries_buckets_and_zero_fills(self):
+        db = FakeDB()
+        db.add('signups', datetime(2026, 3, 12, 9), 2)
+        db.add('signups', datetime(2026, 3, 12, 15), 1)
+        db.add('signups', datetime(2026, 3, 10, 23), 4)
+        db.add('signups', datetime(2026, 2, 1, 0), 50)  # outside the window
+
+        daily = admin_metrics.timeseries(db, 'signups', 'day', 3, now=NOW)
+        self.assertEqual(daily, [
+            {'bucket': '2026-03-10T00:00:00', 'value': 4},
+            {'bucket': '2026-03-11T00:00:00', 'value': 0},
+            {'bucket': '2026-03-12T00:00:00', 'value': 3},
+        ])
+        hourly = admin_metrics.timeseries(db, 'signups', 'hour', 24, now=NOW)
+        self.assertEqual(len(hourly), 24)
+        self.assertEqual(hourly[-1], {'bucket': '2026-03-12T15:00:00', 'value': 1})
+        self.assertEqual(sum(point['value'] for point in hourly), 3)
+
+        with self.assertRaises(ValueError):
+            admin_metrics.timeseries(db, 'bogus', 'day', 3)
+        with self.assertRaises(ValueError):
+            admin_metrics.timeseries(db, 'signups', 'week', 3)
+
+    def test_user_growth_walks_back_from_the_current_total(self):
+        db = FakeDB()
+        db.add('signups', datetime(2026, 1, 1), 10)
+        db.add('signups', datetime(2026, 3, 11, 8), 3)
+        db.add('signups', datetime(2026, 3, 12, 8), 2)
+        db.add('users_deleted', datetime(2026, 3, 12, 9), 1)
+
+        growth = admin_metrics.user_growth(db, days=3, now=NOW)
+        self.assertEqual([(point['date'], point['users'], point['signups']) for point in growth], [
+            ('2026-03-10', 10, 0),
+            ('2026-03-11', 13, 3),
+            ('2026-03-12', 14, 2),
+        ])
+        self.assertEqual(growth[-1]['day'], 'Thu')
+
+    def test_engagement_and_health(self):
+        db = FakeDB()
+        db.add('audio_generated', NOW - timedelta(hours=1), 4)
+        db.add('downloads_created', NOW, 2)
+        db.active_users[NOW.date()] = {1, 2}
+        self.assertEqual(admin_metrics.engagement(db, now=NOW), {'dailyActiveUsers': 2, 'contentInteractions': 6})
+
+        health = admin_metrics.system_health(db, tempfile.gettempdir(), started_at=0)
+        self.assertGreater(health['storageTotalBytes'], 0)
+        self.assertTrue(0 <= health['storagePercent'] <= 100)
+        self.assertGreater(health['uptimeSeconds'], 0)
+        self.assertEqual(health['database_size'], '5.0 MB')
+
+    def test_rollup_runs_until_caught_up(self):
+        db = FakeDB()
+        db.pending = {'users': 25, 'audio_history': 3}
+        rollup = MetricsRollup(db, batch_size=10)
+        self.assertEqual(rollup.run_once(), 28)
+        self.assertEqual(db.pending, {'users': 0, 'audio_history': 0})
+        self.assertEqual(rollup.run_once(), 0)
+        self.assertEqual(rollup.stats()['passes'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
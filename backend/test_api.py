@@ -1,6 +1,15 @@
-import unittest
+import io
+import os
 import json
+import shutil
+import tempfile
+import unittest
+import wave
+from unittest import mock
+
+import app as app_module
 from app import app
+from rewrite_cache import RewriteCache
 
 class TestEchoVerseAPI(unittest.TestCase):
     
@@ -60,5 +69,265 @@ class TestEchoVerseAPI(unittest.TestCase):
                                 content_type='application/json')
         self.assertEqual(response.status_code, 400)
 
+class TestRewriteBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.cache = RewriteCache()
+        self.hf_model = app_module.hf_service.text_model
+        patches = [
+            mock.patch.object(app_module, 'rewrite_cache', self.cache),
+            mock.patch.object(app_module.hf_service, 'rewrite_texts'),
+            mock.patch.object(app_module, 'call_watsonx_llm'),
+            mock.patch.object(app_module, 'get_or_create_user_id', return_value=1),
+            mock.patch.object(app_module.db_manager, 'save_audio_history_batch'),
+            mock.patch.object(app_module, 'TONE_PROMPTS', {'neutral': 'Neutral', 'cheerful': 'Cheerful'}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.rewrite_texts = app_module.hf_service.rewrite_texts
+        self.watson = app_module.call_watsonx_llm
+        self.save_batch = app_module.db_manager.save_audio_history_batch
+
+    def test_rewrite_many_splits_cached_and_falls_back_per_item(self):
+        self.cache.put('cached', 'neutral', self.hf_model, 'from cache')
+        self.rewrite_texts.return_value = ['hf one', None]
+        self.watson.return_value = 'watson two'
+
+        results = app_module.rewrite_many([('cached', 'neutral'), ('one', 'neutral'),
+                                           ('two', 'neutral'), ('one', 'neutral')])
+
+        self.assertEqual(results, [('from cache', True), ('hf one', False), ('watson two', False), ('hf one', False)])
+        # Only the distinct misses are generated, and only the failed one goes to Watson
+        self.rewrite_texts.assert_called_once_with([('one', 'neutral'), ('two', 'neutral')])
+        self.watson.assert_called_once_with('two', 'neutral')
+        self.assertEqual(self.cache.lookup('one', 'neutral', [self.hf_model])[0], 'hf one')
+
+    def test_mock_rewrites_are_not_cached(self):
+        self.rewrite_texts.return_value = [None]
+        self.watson.return_value = '[NEUTRAL TONE] text'
+
+        self.assertEqual(app_module.rewrite_many([('text', 'neutral')]), [('[NEUTRAL TONE] text', False)])
+        self.assertEqual(self.cache.lookup('text', 'neutral', [self.hf_model, app_module.WATSONX_MODEL_ID]),
+                         (None, None))
+
+    def test_batch_reports_invalid_items_individually(self):
+        self.rewrite_texts.side_effect = lambda items: [f'{text}!' for text, _ in items]
+        self.save_batch.return_value = [10, 11]
+
+        response = self.app.post('/rewrite/batch', json={'items': [
+            {'text': 'first'}, {'text': ''}, 'not an object', {'text': 'x', 'tone': 'bogus'},
+            {'text': 'second', 'tone': 'cheerful'}
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual((data['succeeded'], data['failed']), (2, 3))
+        self.assertEqual([r['success'] for r in data['results']], [True, False, False, False, True])
+        self.assertEqual(data['results'][4]['rewritten_text'], 'second!')
+        self.assertEqual([data['results'][0]['history_id'], data['results'][4]['history_id']], [10, 11])
+        self.save_batch.assert_called_once()
+
+    def test_batch_rejects_bad_requests(self):
+        self.assertEqual(self.app.post('/rewrite/batch', json={}).status_code, 400)
+        self.assertEqual(self.app.post('/rewrite/batch', json={'items': []}).status_code, 400)
+        self.assertEqual(self.app.post('/rewrite/batch', json={'items': 'text'}).status_code, 400)
+        too_many = [{'text': 'x'}] * (app_module.REWRITE_BATCH_MAX_ITEMS + 1)
+        self.assertEqual(self.app.post('/rewrite/batch', json={'items': too_many}).status_code, 400)
+        self.rewrite_texts.assert_not_called()
+
+class TestStoryNarrationStream(unittest.TestCase):
+
+    STORY = 'The night was quiet.\nALICE: Who is there?\nBOB: Only me.\nThe door creaked open.'
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.saved = []  # (the batch list is cleared after each save, so copy it)
+        patches = [
+            mock.patch.object(app_module.db_manager, 'save_audio_history', return_value=42),
+            mock.patch.object(app_module.db_manager, 'save_downloads_batch',
+                              side_effect=lambda user_id, downloads: self.saved.extend(downloads)),
+            mock.patch.object(app_module.db_manager, 'update_audio_history_status'),
+            mock.patch.object(app_module, 'synthesize_audio_cached', return_value=('blob.wav', 'huggingface:x', True)),
+            mock.patch.object(app_module, 'storable_blob', side_effect=lambda path: path),
+            mock.patch.object(app_module.audio_cache, 'link'),
+            mock.patch.object(app_module, 'store_audio_file', return_value=('ab/cd/key.wav', 'segment.wav', 100, 'audio/wav')),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.db = app_module.db_manager
+
+    def post(self, **kwargs):
+        return self.app.post('/story-narration/stream', json={'text': self.STORY, 'user_id': 1, 'synthesize': True},
+                             **kwargs)
+
+    def test_streams_segment_lines_then_summary(self):
+        response = self.post()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(response.headers['X-History-Id'], '42')
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        segments, summary = lines[:-1], lines[-1]
+        self.assertEqual(len(segments), 4)
+        for index, line in enumerate(segments):
+            self.assertEqual((line['type'], line['index']), ('segment', index))
+            self.assertTrue({'text', 'voice', 'tone', 'audio_url', 'file_size', 'cached'} <= set(line))
+        self.assertEqual(segments[1]['audio_url'], '/download-audio/ab/cd/key.wav')
+        self.assertEqual(summary['type'], 'summary')
+        self.assertEqual((summary['total_segments'], summary['voiced_segments'], summary['history_id']), (4, 4, 42))
+        self.assertEqual(summary['voices_used'], sorted({line['voice'] for line in segments}))
+
+        self.assertEqual([download['history_id'] for download in self.saved], [42] * 4)
+        self.db.update_audio_history_status.assert_called_once_with(42, 'completed')
+
+    def test_disconnect_finalizes_history(self):
+        response = self.post(buffered=False)
+        body = iter(response.response)
+        first = json.loads(next(body))
+        self.db.update_audio_history_status.assert_not_called()
+
+        response.close()  # the client went away
+
+        self.assertEqual(first['index'], 0)
+        self.assertGreaterEqual(len(self.saved), 1)
+        self.db.update_audio_history_status.assert_called_once_with(42, 'completed')
+
+    def test_disconnect_before_any_audio_marks_history_failed(self):
+        app_module.synthesize_audio_cached.return_value = (None, None, False)
+        response = self.post(buffered=False)
+        line = json.loads(next(iter(response.response)))
+        response.close()
+
+        self.assertIn('error', line)
+        self.db.update_audio_history_status.assert_called_once_with(42, 'failed')
+
+class TestStreamSynthesis(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        wav = io.BytesIO()
+        with wave.open(wav, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(16000)
+            wav_file.writeframes(b'\x00\x01' * 100)
+        patches = [
+            mock.patch.object(app_module, 'AUDIO_WORK_DIR', self.work_dir),
+            mock.patch.object(app_module, 'synthesize_audio_cached', return_value=('blob.wav', 'huggingface:x', True)),
+            mock.patch.object(app_module.audio_cache, 'read', return_value=wav.getvalue()),
+            mock.patch.object(app_module, 'store_audio_file', return_value=('ab/cd/key.opus', 'a.opus', 10, 'audio/ogg')),
+            mock.patch.object(app_module.db_manager, 'update_audio_history_status'),
+            mock.patch.object(app_module.db_manager, 'save_download'),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.update_status = app_module.db_manager.update_audio_history_status
+
+    def stream(self):
+        with app.test_request_context():
+            return app_module.stream_synthesis('One. Two. Three.', 'lisa', 'neutral', 1, 42)
+
+    def test_finished_stream_is_stored(self):
+        response = self.stream()
+        body = b''.join(response.response)
+        response.close()
+
+        self.assertTrue(body.startswith(b'RIFF'))
+        self.update_status.assert_called_once_with(42, 'completed', 'ab/cd/key.opus')
+
+    def test_client_gone_before_first_chunk_marks_history_failed(self):
+        response = self.stream()
+        response.close()
+
+        self.update_status.assert_called_once_with(42, 'failed')
+        self.assertEqual(os.listdir(self.work_dir), [])
+
+class TestRenderStudyMaterial(unittest.TestCase):
+
+    MATERIAL = {'id': 9, 'title': 'Biology', 'chapters': [
+        {'title': 'Cells', 'topics': [{'name': 'Membranes', 'content': 'Lipids.'}, {'name': 'Nuclei', 'content': 'DNA.'}]},
+        {'title': 'Plants', 'topics': [{'name': 'Leaves', 'content': 'Chlorophyll.'}]},
+    ]}
+
+    def setUp(self):
+        self.statuses = []
+        self.downloads = []
+        patches = [
+            mock.patch.object(app_module.db_manager, 'save_audio_history_batch', side_effect=self.insert),
+            mock.patch.object(app_module.db_manager, 'update_audio_history_status_batch',
+                              side_effect=lambda updates: self.statuses.extend(updates)),
+            mock.patch.object(app_module.db_manager, 'save_downloads_batch',
+                              side_effect=lambda user_id, downloads: self.downloads.extend(downloads)),
+            mock.patch.object(app_module, 'synthesize_audio_cached', return_value=('blob.wav', 'huggingface:x', True)),
+            mock.patch.object(app_module, 'storable_blob', side_effect=lambda path: path),
+            mock.patch.object(app_module.audio_cache, 'link'),
+            mock.patch.object(app_module, 'store_audio_file', return_value=('ab/cd/key.wav', 'topic.wav', 100, 'audio/wav')),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.next_id = 1
+
+    def insert(self, user_id, entries):
+        ids = list(range(self.next_id, self.next_id + len(entries)))
+        self.next_id += len(entries)
+        return ids
+
+    def test_rows_are_recorded_when_the_job_fails_midway(self):
+        def progress(**fields):
+            if fields.get('completed') == 1:
+                raise RuntimeError('progress store went away')
+
+        with self.assertRaises(RuntimeError):
+            app_module.render_study_material(self.MATERIAL, 1, 'lisa', 'neutral', False, progress)
+
+        self.assertEqual(self.statuses, [(1, 'completed', 'ab/cd/key.wav'), (2, 'failed', None), (3, 'failed', None)])
+        self.assertEqual([download['history_id'] for download in self.downloads], [1])
+
+    def test_a_chapter_that_fails_to_merge_is_left_out(self):
+        def link(blob_path, dest_path):
+            if dest_path.endswith('.merge'):  # (the merge reads these; the rest go to the mocked store)
+                with open(dest_path, 'wb') as f:
+                    f.write(b'audio')
+
+        app_module.audio_cache.link.side_effect = link
+        with mock.patch.object(app_module, 'WavConcatenator') as merger_class:
+            merger = merger_class.return_value
+            merger.segment_count = 1
+            merger.duration_seconds = 2.0
+            merger.write.side_effect = [OSError('disk full'), None]
+            payload, status = app_module.render_study_material(self.MATERIAL, 1, 'lisa', 'neutral', True,
+                                                               lambda **fields: None)
+
+        self.assertEqual(status, 200)
+        self.assertEqual([chapter['chapter'] for chapter in payload['chapters']], ['Plants'])
+        self.assertEqual(payload['rendered'], 3)
+        self.assertEqual([status for _, status, _ in self.statuses], ['completed'] * 4)
+
+
+class TestBackgroundTasks(unittest.TestCase):
+
+    def test_nothing_starts_on_import(self):
+        self.assertIsNone(app_module.audio_sweeper._thread)
+        self.assertIsNone(app_module.metrics_rollup._thread)
+
+    def test_entry_point_starts_the_sweeper_and_rollup(self):
+        with mock.patch.object(app_module.audio_sweeper, 'start') as start_sweeper, \
+                mock.patch.object(app_module.metrics_rollup, 'start') as start_rollup, \
+                mock.patch.object(app_module, 'AUDIO_GC_INTERVAL_MINUTES', 30), \
+                mock.patch.object(app_module, 'METRICS_ROLLUP_INTERVAL_SECONDS', 0):
+            app_module.start_background_tasks()
+            start_rollup.assert_not_called()
+
+            app_module.METRICS_ROLLUP_INTERVAL_SECONDS = 15
+            app_module.start_background_tasks()
+        start_sweeper.assert_called_with(1800)
+        start_rollup.assert_called_once_with(15)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from audio_cache import AudioCache, sniff_audio_format
+
+WAV_BYTES = b'RIFF' + b'\x00' * 60
+MP3_BYTES = b'ID3' + b'\x00' * 61
+
+
+class TestAudioCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        self.cache = AudioCache(self.cache_dir, max_bytes=1024, max_entries=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_key_normalizes_whitespace(self):
+        key_a = AudioCache.make_key('Hello   world\n', 'David', 'neutral', 'engine')
+        key_b = AudioCache.make_key(' Hello world', 'david', 'Neutral', 'engine')
+        self.assertEqual(key_a, key_b)
+        self.assertNotEqual(key_a, AudioCache.make_key('Hello world', 'david', 'sad', 'engine'))
+        self.assertNotEqual(key_a, AudioCache.make_key('Hello world', 'david', 'neutral', 'other'))
+
+    def test_lookup_hit_and_miss(self):
+        self.assertEqual(self.cache.lookup('hi', 'david', 'calm', ['a', 'b']), (None, None))
+        path = self.cache.put(AudioCache.make_key('hi', 'david', 'calm', 'b'), WAV_BYTES)
+        self.assertTrue(path.endswith('.wav'))
+        self.assertEqual(self.cache.lookup('hi', 'david', 'calm', ['a', 'b']), (path, 'b'))
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['stores']), (1, 1, 1))
+
+    def test_stale_renditions_are_passed_over(self):
+        local = self.cache.put(AudioCache.make_key('hi', 'david', 'calm', 'local'), WAV_BYTES)
+        old = os.stat(local).st_mtime - 3600
+        os.utime(local, (old, old))
+        max_age = {'local': 600}
+
+        self.assertEqual(self.cache.lookup('hi', 'david', 'calm', ['remote', 'local'], max_age=max_age), (None, None))
+        self.assertEqual(self.cache.lookup('hi', 'david', 'calm', ['remote', 'local']), (local, 'local'))
+        # A hit doesn't make the rendition any younger
+        self.assertLess(os.stat(local).st_mtime, old + 1)
+
+        fresh = self.cache.put(AudioCache.make_key('hi', 'david', 'calm', 'local'), WAV_BYTES)
+        self.assertEqual(self.cache.lookup('hi', 'david', 'calm', ['remote', 'local'], max_age=max_age),
+                         (fresh, 'local'))
+
+    def test_size_bound_evicts_least_recently_used(self):
+        keys = [AudioCache.make_key(f'text {i}', 'v', 't', 'e') for i in range(3)]
+        paths = [self.cache.put(key, WAV_BYTES * 6) for key in keys[:2]]  # 384 bytes each
+        self.cache.get(keys[0])  # keys[1] is now least recently used
+        self.cache.put(keys[2], WAV_BYTES * 6)
+        self.assertFalse(os.path.exists(paths[1]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_linked_file_survives_eviction(self):
+        key = AudioCache.make_key('keep me', 'v', 't', 'e')
+        blob = self.cache.put(key, MP3_BYTES)
+        dest = os.path.join(self.tmp_dir, 'user_file.mp3')
+        self.assertEqual(AudioCache.link(blob, dest), len(MP3_BYTES))
+        os.remove(blob)
+        with open(dest, 'rb') as f:
+            self.assertEqual(f.read(), MP3_BYTES)
+
+    def test_index_is_rebuilt_from_disk(self):
+        key = AudioCache.make_key('persisted', 'v', 't', 'e')
+        path = self.cache.put(key, WAV_BYTES)
+        reloaded = AudioCache(self.cache_dir, max_bytes=1024)
+        self.assertEqual(reloaded.get(key), path)
+
+    def test_sniff_audio_format(self):
+        self.assertEqual(sniff_audio_format(WAV_BYTES), 'wav')
+        self.assertEqual(sniff_audio_format(MP3_BYTES), 'mp3')
+        self.assertEqual(sniff_audio_format(b'OggS...'), 'ogg')
+        self.assertEqual(sniff_audio_format(b'\x00\x00\x00\x20ftypM4A '), 'm4a')
+        self.assertEqual(sniff_audio_format(b'???'), 'bin')
+
+
+if __name__ == '__main__':
+    unittest.main()
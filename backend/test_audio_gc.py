@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from audio_gc import AudioSweeper
+from audio_storage import LocalAudioStorage
+
+
+class FakeDB:
+    """audio_history/downloads references held in memory"""
+
+    def __init__(self):
+        self.rows = []
+        self.fail = False
+
+    def add(self, history_id, user_id, ref, age_days=0, download_id=None):
+        self.rows.append({'history_id': history_id, 'download_id': download_id, 'user_id': user_id,
+                          'ref': ref, 'created_at': datetime.now() - timedelta(days=age_days)})
+
+    def get_audio_references(self, table, after_id=0, limit=1000):
+        if self.fail:
+            raise RuntimeError('database unavailable')
+        id_column = 'history_id' if table == 'audio_history' else 'download_id'
+        rows = sorted(
+            (dict(row, id=row[id_column]) for row in self.rows
+             if (row['download_id'] is None) == (table == 'audio_history') and row[id_column] > after_id),
+            key=lambda row: row['id']
+        )
+        return rows[:limit]
+
+    def delete_audio_history_batch(self, history_ids):
+        self.rows = [row for row in self.rows if row['history_id'] not in history_ids]
+
+    def delete_downloads_batch(self, download_ids):
+        self.rows = [row for row in self.rows if row['download_id'] not in download_ids]
+
+
+class TestAudioSweeper(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.storage = LocalAudioStorage(os.path.join(self.tmp, 'audio'))
+        self.temp_dir = os.path.join(self.tmp, 'temp')
+        os.makedirs(self.temp_dir)
+        self.db = FakeDB()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, path, size, age_seconds=7200):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        old = time.time() - age_seconds
+        os.utime(path, (old, old))
+
+    def sweeper(self, **kwargs):
+        kwargs.setdefault('reference_page_size', 2)  # (so every test pages)
+        return AudioSweeper(self.db, self.storage, temp_dirs=[self.temp_dir], ignored_prefixes=('cache/',), **kwargs)
+
+    def test_orphans_missing_files_and_temp_files(self):
+        root = self.storage.root
+        self.write(os.path.join(root, 'kept.opus'), 100)
+        self.write(os.path.join(root, 'orphan.opus'), 40)
+        self.write(os.path.join(root, 'fresh.opus'), 30, age_seconds=60)  # not recorded yet
+        self.write(os.path.join(root, 'cache', 'blob.wav'), 500)
+        self.write(os.path.join(self.temp_dir, 'temp_segment_1.wav'), 7)
+        self.write(os.path.join(self.temp_dir, 'upload-abc.pdf'), 5, age_seconds=60)
+        self.write(os.path.join(self.temp_dir, 'notes.docx'), 3)
+        self.db.add(1, 1, '/old/server/audio_files/kept.opus')  # legacy absolute path
+        self.db.add(1, 1, 'kept.opus', download_id=10)
+        self.db.add(2, 1, 'gone.opus', download_id=11)
+        self.db.add(2, 1, 'gone.opus')
+
+        dry = self.sweeper().sweep(dry_run=True)
+        self.assertEqual((dry['reclaimed_files'], dry['reclaimed_bytes']), (2, 47))
+        self.assertTrue(os.path.exists(os.path.join(root, 'orphan.opus')))
+        self.assertEqual(len(self.db.rows), 4)
+
+        report = self.sweeper().sweep()
+        self.assertEqual(report['orphans'], {'files': 1, 'bytes': 40})
+        self.assertEqual(report['temp_files'], {'files': 1, 'bytes': 7})
+        self.assertEqual(report['missing_files'], {'downloads': 1, 'history': 1})
+        self.assertEqual(sorted(os.listdir(root)), ['cache', 'fresh.opus', 'kept.opus'])
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['notes.docx', 'upload-abc.pdf'])
+        self.assertEqual([row['download_id'] for row in self.db.rows], [None, 10, None])
+
+    def test_retention_and_quota(self):
+        root = self.storage.root
+        for name, size in (('a1', 100), ('a2', 100), ('a3', 100), ('b1', 100)):
+            self.write(os.path.join(root, f'{name}.opus'), size)
+        self.db.add(1, 1, 'a1.opus', age_days=40)
+        self.db.add(2, 1, 'a2.opus', age_days=5)
+        self.db.add(3, 1, 'a3.opus', age_days=1)
+        self.db.add(3, 1, 'a3.opus', age_days=1, download_id=30)
+        self.db.add(4, 2, 'b1.opus', age_days=2)
+
+        report = self.sweeper(retention_days=30, user_quota_bytes=150).sweep()
+        self.assertEqual(report['expired'], {'files': 1, 'bytes': 100})
+        self.assertEqual(report['over_quota'], {'files': 1, 'bytes': 100})
+        self.assertEqual(report['reclaimed_bytes'], 200)
+        self.assertEqual(sorted(os.listdir(root)), ['a3.opus', 'b1.opus'])
+        self.assertEqual(sorted({row['history_id'] for row in self.db.rows}), [3, 4])
+
+    def test_nothing_is_deleted_without_references(self):
+        self.write(os.path.join(self.storage.root, 'a.opus'), 10)
+        self.db.fail = True
+        sweeper = self.sweeper()
+        report = sweeper.sweep()
+        self.assertIn('aborted', report)
+        self.assertEqual(os.listdir(self.storage.root), ['a.opus'])
+        # An empty store with rows pointing into it looks like a missing mount
+        os.remove(os.path.join(self.storage.root, 'a.opus'))
+        self.db.fail = False
+        self.db.add(1, 1, 'a.opus', download_id=1)
+        self.assertIn('aborted', sweeper.sweep())
+        self.assertEqual(len(self.db.rows), 1)
+        self.assertEqual(sweeper.stats()['errors'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask
+
+from audio_serving import ContentETags, hash_file, is_full_transfer, send_audio_file
+
+
+class TestAudioServing(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'a.wav')
+        with open(self.path, 'wb') as f:
+            f.write(bytes(range(256)) * 4)
+        self.etags = ContentETags()
+        self.app = Flask(__name__)
+
+        @self.app.route('/file')
+        def serve():
+            return send_audio_file(self.path, 'audio/wav', etags=self.etags)
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_full_and_range_responses(self):
+        response = self.client.get('/file')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(is_full_transfer(response))
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        etag = response.headers['ETag']
+        self.assertEqual(etag, f'"{hash_file(self.path)}"')
+
+        partial = self.client.get('/file', headers={'Range': 'bytes=10-19'})
+        self.assertEqual(partial.status_code, 206)
+        self.assertFalse(is_full_transfer(partial))
+        self.assertEqual(partial.data, bytes(range(10, 20)))
+        self.assertEqual(partial.headers['Content-Range'], 'bytes 10-19/1024')
+
+        # If-Range with a stale validator gets the whole file instead
+        stale = self.client.get('/file', headers={'Range': 'bytes=10-19', 'If-Range': '"other"'})
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(len(stale.data), 1024)
+        fresh = self.client.get('/file', headers={'Range': 'bytes=10-19', 'If-Range': etag})
+        self.assertEqual(fresh.status_code, 206)
+
+        unsatisfiable = self.client.get('/file', headers={'Range': 'bytes=5000-'})
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable.headers['Content-Range'], 'bytes */1024')
+
+    def test_conditional_get(self):
+        etag = self.client.get('/file').headers['ETag']
+        response = self.client.get('/file', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(is_full_transfer(response))
+        self.assertEqual(self.etags.stats()['misses'], 1)
+
+    def test_hard_links_share_a_hash_and_changes_rehash(self):
+        linked = os.path.join(self.tmp, 'b.wav')
+        os.link(self.path, linked)
+        self.assertEqual(self.etags.etag_for(self.path), self.etags.etag_for(linked))
+        self.assertEqual(self.etags.stats(), {'hits': 1, 'misses': 1, 'entries': 1})
+        with open(self.path, 'ab') as f:
+            f.write(b'more')
+        self.assertEqual(self.etags.etag_for(linked), hash_file(linked))
+        self.assertEqual(self.etags.stats()['misses'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from datetime import datetime, timezone
+
+from audio_storage import LocalAudioStorage, S3AudioStorage, key_for, normalize_key, new_audio_key, is_sharded_key
+
+
+class NotFound(Exception):
+    response = {'Error': {'Code': '404'}}
+
+
+class FakeS3Client:
+    """In-memory stand-in for an S3-compatible store (same method signatures as boto3)"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None):
+        with open(Filename, 'rb') as f:
+            self.upload_fileobj(f, Bucket, Key, ExtraArgs)
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None):
+        self.objects[(Bucket, Key)] = (Fileobj.read(), (ExtraArgs or {}).get('ContentType'))
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise NotFound()
+        return {'ContentLength': len(self.objects[(Bucket, Key)][0])}
+
+    def get_object(self, Bucket, Key):
+        self.head_object(Bucket, Key)
+        return {'Body': io.BytesIO(self.objects[(Bucket, Key)][0])}
+
+    def download_fileobj(self, Bucket, Key, Fileobj):
+        Fileobj.write(self.get_object(Bucket, Key)['Body'].read())
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def get_paginator(self, operation):
+        client = self
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                yield {'Contents': [
+                    {'Key': key, 'Size': len(data), 'LastModified': datetime.now(timezone.utc)}
+                    for (bucket, key), (data, _) in sorted(client.objects.items())
+                    if bucket == Bucket and key.startswith(Prefix)
+                ]}
+
+        return Paginator()
+
+
+class TestAudioStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.work = os.path.join(self.tmp, 'work')
+        os.makedirs(self.work)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def produce(self, name, data=b'OggS audio'):
+        path = os.path.join(self.work, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_keys(self):
+        self.assertEqual(normalize_key('ab/cd/x.opus'), 'ab/cd/x.opus')
+        for bad in ('', '../x', 'a/../../x', '/etc/passwd', 'C:\\x.wav'):
+            with self.assertRaises(ValueError):
+                normalize_key(bad)
+        # Rows from before keys hold absolute paths into the flat audio directory
+        self.assertEqual(key_for('/srv/backend/audio_files/a.wav'), 'a.wav')
+        self.assertEqual(key_for('C:\\echoverse\\backend\\audio_files\\b.mp3'), 'b.mp3')
+        self.assertEqual(key_for('b.opus'), 'b.opus')
+        self.assertIsNone(key_for(None))
+
+    def test_new_keys_are_sharded_and_unique(self):
+        keys = {new_audio_key('.opus') for _ in range(1000)}
+        self.assertEqual(len(keys), 1000)
+        for key in keys:
+            shard, subshard, name = key.split('/')
+            self.assertEqual(name[:4], shard + subshard)
+            self.assertTrue(name.endswith('.opus'))
+            self.assertTrue(is_sharded_key(key))
+            self.assertEqual(normalize_key(key), key)
+        self.assertFalse(is_sharded_key('story_merged_3_20250901_120000.opus'))
+        self.assertFalse(is_sharded_key('cache/ab/abcdef.wav'))
+
+    def test_local_storage(self):
+        storage = LocalAudioStorage(os.path.join(self.tmp, 'audio'))
+        path = self.produce('a.opus')
+        self.assertEqual(storage.put_file('a.opus', path), 10)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(storage.local_path('a.opus'), os.path.join(storage.root, 'a.opus'))
+        storage.put_stream('ab/b.opus', io.BytesIO(b'streamed'))
+        with storage.open('ab/b.opus') as f:
+            self.assertEqual(f.read(), b'streamed')
+        self.assertEqual(sorted(key for key, _, _ in storage.iter_keys()), ['a.opus', 'ab/b.opus'])
+        self.assertTrue(storage.delete('a.opus'))
+        self.assertFalse(storage.delete('a.opus'))
+        self.assertIsNone(storage.local_path('a.opus'))
+
+    def test_s3_storage_uploads_and_caches(self):
+        client = FakeS3Client()
+        storage = S3AudioStorage('audio-bucket', os.path.join(self.tmp, 'cache'), prefix='audio', client=client)
+        storage.put_file('a.opus', self.produce('a.opus'), content_type='audio/ogg')
+        self.assertEqual(client.objects[('audio-bucket', 'audio/a.opus')], (b'OggS audio', 'audio/ogg'))
+
+        # Another node (empty cache) fetches the object on first read
+        other = S3AudioStorage('audio-bucket', os.path.join(self.tmp, 'other'), prefix='audio', client=client)
+        path = other.local_path('a.opus')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'OggS audio')
+        other.local_path('a.opus')
+        self.assertEqual((other.stats()['cache_misses'], other.stats()['cache_hits']), (1, 1))
+        self.assertIsNone(other.local_path('missing.opus'))
+
+        storage.put_stream('ab/b.opus', io.BytesIO(b'streamed'))
+        self.assertEqual(storage.open('ab/b.opus').read(), b'streamed')
+        self.assertEqual([(key, size) for key, size, _ in storage.iter_keys()], [('a.opus', 10), ('ab/b.opus', 8)])
+        storage.delete('a.opus')
+        self.assertFalse(storage.exists('a.opus'))
+
+    def test_s3_cache_evicts_least_recently_used(self):
+        client = FakeS3Client()
+        storage = S3AudioStorage('b', os.path.join(self.tmp, 'cache'), client=client, cache_max_bytes=25)
+        for name in ('a', 'b', 'c'):
+            path = self.produce(name, b'x' * 10)
+            os.utime(path, (ord(name), ord(name)))
+            storage.put_file(name, path)
+        self.assertFalse(os.path.exists(storage.cache_path('a')))
+        self.assertTrue(os.path.exists(storage.cache_path('c')))
+        self.assertEqual(storage.stats()['cache_evictions'], 1)
+        # Evicted files are fetched again from the bucket
+        self.assertIsNotNone(storage.local_path('a'))
+
+    def test_s3_cache_index_is_built_once_and_tracks_use(self):
+        client = FakeS3Client()
+        cache_dir = os.path.join(self.tmp, 'cache')
+        first = S3AudioStorage('b', cache_dir, client=client, cache_max_bytes=25)
+        for name in ('a', 'b'):
+            first.put_file(name, self.produce(name, b'x' * 10))
+            os.utime(first.cache_path(name), (ord(name), ord(name)))
+
+        # A restart picks up the cached files; later puts don't rescan the directory
+        storage = S3AudioStorage('b', cache_dir, client=client, cache_max_bytes=25)
+        self.assertEqual((storage.stats()['cache_files'], storage.stats()['cache_bytes']), (2, 20))
+        with mock.patch('audio_storage.os.walk', side_effect=AssertionError('cache rescanned')):
+            storage.local_path('a')  # now more recently used than b
+            storage.put_file('c', self.produce('c', b'x' * 10))
+        self.assertTrue(os.path.exists(storage.cache_path('a')))
+        self.assertFalse(os.path.exists(storage.cache_path('b')))
+        self.assertEqual(storage.stats()['cache_bytes'], 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
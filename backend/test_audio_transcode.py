@@ -0,0 +1,86 @@
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+
+from werkzeug.datastructures import MIMEAccept
+
+from audio_transcode import Transcoder, extension_for, sniff_mime_type
+
+# Stands in for ffmpeg: writes the container's magic bytes followed by the input
+FAKE_FFMPEG = f'''#!{sys.executable}
+import sys
+args = sys.argv[1:]
+source, container, dest = args[args.index('-i') + 1], args[args.index('-f') + 1], args[-1]
+magic = {{'ogg': b'OggS', 'mp3': b'ID3', 'ipod': b'\\0\\0\\0\\x18ftyp'}}[container]
+with open(source, 'rb') as f:
+    data = f.read()
+with open(dest, 'wb') as f:
+    f.write(magic + data[:len(data) // 10])
+'''
+
+
+class TestAudioTranscode(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.ffmpeg = os.path.join(self.tmp, 'ffmpeg')
+        with open(self.ffmpeg, 'w') as f:
+            f.write(FAKE_FFMPEG)
+        os.chmod(self.ffmpeg, os.stat(self.ffmpeg).st_mode | stat.S_IEXEC)
+        self.wav = os.path.join(self.tmp, 'topic.mp3')  # WAV bytes under the wrong name
+        with open(self.wav, 'wb') as f:
+            f.write(b'RIFF' + bytes(1000))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_mime_type_comes_from_the_bytes(self):
+        self.assertEqual(sniff_mime_type(self.wav), 'audio/wav')
+        self.assertEqual(extension_for('audio/wav'), '.wav')
+        self.assertEqual(extension_for('audio/mp4'), '.m4a')
+        self.assertEqual(extension_for('audio/ogg'), '.opus')
+
+    def test_store_replaces_wav_with_compressed_rendition(self):
+        transcoder = Transcoder(ffmpeg_path=self.ffmpeg, store_format='opus')
+        self.assertTrue(transcoder.compresses(self.wav))
+        path, mime_type, size = transcoder.store(self.wav)
+        self.assertFalse(transcoder.compresses(path))
+        self.assertEqual((os.path.basename(path), mime_type, size), ('topic.opus', 'audio/ogg', 104))
+        self.assertFalse(os.path.exists(self.wav))
+        self.assertEqual(transcoder.stats()['compression_ratio'], 9.65)
+        # Already compressed files are kept as they are
+        self.assertEqual(transcoder.store(path), (path, 'audio/ogg', 104))
+
+    def test_store_keeps_wav_without_ffmpeg_or_on_failure(self):
+        transcoder = Transcoder(store_format='mp3')
+        transcoder.ffmpeg_path = None  # as on a host without ffmpeg
+        self.assertEqual(transcoder.store(self.wav), (self.wav, 'audio/wav', 1004))
+        broken = Transcoder(ffmpeg_path='/bin/false', store_format='aac')
+        self.assertEqual(broken.store(self.wav), (self.wav, 'audio/wav', 1004))
+        self.assertEqual(broken.stats()['failures'], 1)
+        self.assertEqual(sorted(os.listdir(self.tmp)), ['ffmpeg', 'topic.mp3'])
+
+    def test_rendition_follows_accept_header(self):
+        transcoder = Transcoder(ffmpeg_path=self.ffmpeg, store_format='opus')
+        path, _, _ = transcoder.store(self.wav)
+        self.assertEqual(transcoder.rendition(path, MIMEAccept([('*/*', 1)])), (path, 'audio/ogg'))
+        self.assertEqual(transcoder.rendition(path, MIMEAccept()), (path, 'audio/ogg'))
+        mp3_path, mime_type = transcoder.rendition(path, MIMEAccept([('audio/mpeg', 1), ('audio/ogg', 0.5)]))
+        self.assertEqual((os.path.basename(mp3_path), mime_type), ('topic.mp3', 'audio/mpeg'))
+        # Encoded once, then reused
+        transcoder.rendition(path, MIMEAccept([('audio/mpeg', 1)]))
+        self.assertEqual(transcoder.stats()['renditions'], 1)
+        # Nothing acceptable: the stored file
+        self.assertEqual(transcoder.rendition(path, MIMEAccept([('audio/wav', 1)])), (path, 'audio/ogg'))
+
+    def test_unknown_store_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            Transcoder(store_format='wma')
+        self.assertIsNone(Transcoder(store_format='wav').store_format)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from unittest import mock
+
+from circuit_breaker import CircuitBreaker, ModelRouter
+from huggingface_service import HuggingFaceService, LOCAL_TTS_ENGINE
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker('model', window=10, min_calls=4, failure_threshold=0.5,
+                                      cooldown=30, clock=self.clock)
+
+    def test_opens_when_error_rate_crosses_threshold(self):
+        for _ in range(2):
+            self.breaker.record_success(1.0)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_half_open_allows_a_single_probe(self):
+        self.breaker.record_failure(retry_after=20)
+        self.clock.now = 21
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record_success(0.5)
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_probe_backs_off(self):
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.clock.now = 31
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.clock.now = 61
+        self.assertFalse(self.breaker.allow_request())  # cooldown doubled to 60s
+        self.clock.now = 92
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_unreported_probe_can_be_reclaimed_after_timeout(self):
+        self.breaker.probe_timeout = 60
+        self.breaker.record_failure(retry_after=20)
+        self.clock.now = 21
+        self.assertTrue(self.breaker.allow_request())
+        self.clock.now = 80
+        self.assertFalse(self.breaker.allow_request())
+        self.clock.now = 82
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_latency_ewma(self):
+        self.breaker.record_success(1.0)
+        self.breaker.record_success(2.0)
+        self.assertAlmostEqual(self.breaker.latency_ewma, 1.3)
+
+
+class TestModelRouter(unittest.TestCase):
+
+    def test_prefers_fastest_healthy_model(self):
+        router = ModelRouter(['a', 'b', 'c'])
+        router.breakers['a'].record_success(5.0)
+        router.breakers['b'].record_success(1.0)
+        router.breakers['c'].record_failure(retry_after=60)
+        self.assertEqual([model for model, _ in router.attempts()], ['b', 'a'])
+
+    def test_unmeasured_models_keep_configured_order(self):
+        router = ModelRouter(['a', 'b', 'c'])
+        router.breakers['c'].record_success(2.0)
+        self.assertEqual([model for model, _ in router.attempts()], ['c', 'a', 'b'])
+
+
+class TestSpeechRouting(unittest.TestCase):
+
+    def test_probe_that_raises_is_recorded_as_a_failure(self):
+        clock = FakeClock()
+        service = HuggingFaceService()
+        service.api_token = 'hf_test'
+        service.tts_router = ModelRouter(['a'], cooldown=30, clock=clock)
+        breaker = service.tts_router.breakers['a']
+        breaker.record_failure(retry_after=20)
+        clock.now = 21
+
+        with mock.patch.object(service, '_make_request', side_effect=RuntimeError('boom')), \
+                mock.patch.object(service, '_synthesize_locally', return_value=b'local'):
+            self.assertEqual(service.synthesize_speech_with_engine('hello'), (b'local', LOCAL_TTS_ENGINE))
+
+        self.assertEqual(breaker.state, 'open')
+        clock.now = 52  # the failed probe doubled the cooldown instead of leaving the slot taken
+        self.assertFalse(breaker.allow_request())
+        clock.now = 82
+        self.assertTrue(breaker.allow_request())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+from database_manager import DatabaseManager
+
+
+class FakeCursor:
+    """Records statements and hands out auto-increment ids like InnoDB"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.lastrowid = None
+        self._row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        self.connection.statements.append((' '.join(sql.split()), list(params)))
+        if '@@SESSION.auto_increment_increment' in sql:
+            self._row = {'step': self.connection.step}
+        elif sql.lstrip().startswith('SELECT'):
+            self._row = next((row for match, row in self.connection.rows.items() if match in sql), None)
+        elif sql.lstrip().startswith('INSERT'):
+            if self.connection.fail_inserts:
+                raise RuntimeError('insert failed')
+            rows = len(params) // 7
+            self.lastrowid = self.connection.next_id
+            self.connection.next_id += rows * self.connection.step
+
+    def fetchone(self):
+        return self._row
+
+
+class FakeConnection:
+    def __init__(self, next_id=1, step=1):
+        self.next_id = next_id
+        self.step = step
+        self.fail_inserts = False
+        self.rows = {}  # SQL fragment -> row fetchone returns
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+class TestSaveAudioHistoryBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DatabaseManager()
+        self.connection = FakeConnection(next_id=100)
+
+        @contextmanager
+        def connection():
+            yield self.connection
+
+        patcher = mock.patch.object(self.db, 'get_connection', connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def entries(self, count):
+        return [{'original_text': f'text {i}', 'rewritten_text': f'rewrite {i}', 'tone': 'neutral', 'voice': 'lisa'}
+                for i in range(count)]
+
+    def inserts(self):
+        return [params for sql, params in self.connection.statements if sql.startswith('INSERT')]
+
+    def test_ids_follow_input_order_across_chunks(self):
+        ids = self.db.save_audio_history_batch(7, self.entries(5), chunk_size=2)
+
+        self.assertEqual(ids, [100, 101, 102, 103, 104])
+        self.assertEqual([len(params) // 7 for params in self.inserts()], [2, 2, 1])
+        self.assertEqual(self.connection.commits, 1)
+
+    def test_ids_respect_auto_increment_increment(self):
+        self.connection.step = 2
+
+        self.assertEqual(self.db.save_audio_history_batch(7, self.entries(3), chunk_size=2), [100, 102, 104])
+
+    def test_audio_file_path_marks_audio_generated(self):
+        entries = self.entries(2)
+        entries[1]['audio_file_path'] = 'ab/cd/file.wav'
+
+        self.db.save_audio_history_batch(7, entries)
+
+        params = self.inserts()[0]
+        self.assertEqual(params[:7], [7, 'text 0', 'rewrite 0', 'neutral', 'lisa', None, False])
+        self.assertEqual(params[7:], [7, 'text 1', 'rewrite 1', 'neutral', 'lisa', 'ab/cd/file.wav', True])
+
+    def test_empty_and_failed_batches(self):
+        self.assertEqual(self.db.save_audio_history_batch(7, []), [])
+        self.assertEqual(self.connection.statements, [])
+
+        self.connection.fail_inserts = True
+        self.assertIsNone(self.db.save_audio_history_batch(7, self.entries(2)))
+        self.assertEqual(self.connection.commits, 0)
+
+
+class TestRecordDeletions(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DatabaseManager()
+        self.connection = FakeConnection()
+        self.cursor = self.connection.cursor()
+
+    def test_rolled_up_rows_are_counted_under_the_lock(self):
+        self.connection.rows = {'metrics_rollup_state': {'last_id': 40}, 'COUNT(*)': {'count': 3}}
+
+        self.db._record_deletions(self.cursor, 'audio_history', 'audio_deleted', 'user_id = %s', (7,))
+
+        statements = self.connection.statements
+        self.assertIn('FOR UPDATE', statements[0][0])
+        self.assertEqual(statements[1][1], [7, 40])
+        self.assertEqual([params for _, params in statements[2:]], [['audio_deleted', 3], ['audio_deleted', 3]])
+
+    def test_rows_never_rolled_up_are_skipped(self):
+        self.connection.rows = {'metrics_rollup_state': {'last_id': 40}, 'COUNT(*)': {'count': 0}}
+        self.db._record_deletions(self.cursor, 'users', 'users_deleted', 'id = %s', (41,))
+        self.assertEqual(len(self.connection.statements), 2)
+
+        self.connection.rows = {}
+        self.connection.statements.clear()
+        self.db._record_deletions(self.cursor, 'users', 'users_deleted', 'id = %s', (41,))
+        self.assertEqual(len(self.connection.statements), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import threading
+import time
+import unittest
+
+from database_manager import ConnectionPool, PoolExhaustedError
+
+
+class FakeConnection:
+    """Minimal stand-in for a pymysql connection"""
+
+    def __init__(self, healthy=True):
+        self.open = True
+        self.healthy = healthy
+        self.server_status = 0
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if not self.healthy:
+            raise ConnectionError("server has gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.server_status = 0
+
+    def close(self):
+        self.open = False
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.created = []
+
+        def connect():
+            conn = FakeConnection()
+            self.created.append(conn)
+            return conn
+
+        self.pool = ConnectionPool(connect, max_size=2, timeout=0.2, max_idle=60, ping_interval=0)
+
+    def test_connection_is_reused(self):
+        with self.pool.connection() as first:
+            pass
+        with self.pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(len(self.created), 1)
+        self.assertTrue(first.open)
+        self.assertEqual(self.pool.stats()['reused'], 1)
+
+    def test_open_transaction_is_rolled_back_on_release(self):
+        with self.pool.connection() as conn:
+            conn.server_status = 1  # SERVER_STATUS_IN_TRANS
+        self.assertEqual(conn.rollbacks, 1)
+
+    def test_unhealthy_connection_is_replaced(self):
+        with self.pool.connection() as conn:
+            conn.healthy = False
+        with self.pool.connection() as replacement:
+            pass
+        self.assertIsNot(conn, replacement)
+        self.assertFalse(conn.open)
+        self.assertEqual(self.pool.stats()['failed_health_checks'], 1)
+
+    def test_idle_connection_is_recycled(self):
+        self.pool.max_idle = 0.01
+        with self.pool.connection() as conn:
+            pass
+        time.sleep(0.02)
+        with self.pool.connection() as replacement:
+            pass
+        self.assertIsNot(conn, replacement)
+        self.assertEqual(self.pool.stats()['recycled'], 1)
+
+    def test_exhaustion_raises_after_timeout(self):
+        held = [self.pool.acquire(), self.pool.acquire()]
+        with self.assertRaises(PoolExhaustedError):
+            self.pool.acquire()
+        stats = self.pool.stats()
+        self.assertEqual(stats['exhausted'], 1)
+        self.assertEqual(stats['in_use'], 2)
+        for conn in held:
+            self.pool.release(conn)
+
+    def test_waiting_thread_gets_released_connection(self):
+        self.pool.timeout = 2
+        held = [self.pool.acquire(), self.pool.acquire()]
+        result = {}
+
+        def worker():
+            result['conn'] = self.pool.acquire()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        time.sleep(0.05)
+        self.pool.release(held[0])
+        thread.join(1)
+        self.assertIs(result.get('conn'), held[0])
+        self.assertEqual(len(self.created), 2)
+
+    def test_exception_in_block_discards_broken_connection(self):
+        with self.assertRaises(RuntimeError):
+            with self.pool.connection() as conn:
+                conn.rollback = lambda: (_ for _ in ()).throw(ConnectionError("lost"))
+                raise RuntimeError("query failed")
+        self.assertFalse(conn.open)
+        self.assertEqual(self.pool.stats()['open'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from extraction_cache import ExtractionCache
+
+
+class TestExtractionCache(unittest.TestCase):
+
+    def test_hit_returns_copy_without_material_id(self):
+        cache = ExtractionCache()
+        self.assertIsNone(cache.get('abc'))
+        cache.put('abc', 'text', {'title': 'Biology', 'chapters': [], 'material_id': 7})
+        text, material = cache.get('abc')
+        self.assertEqual((text, material), ('text', {'title': 'Biology', 'chapters': []}))
+        material['material_id'] = 8
+        self.assertNotIn('material_id', cache.get('abc')[1])
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (2, 1, 0.667))
+
+    def test_evicts_least_recently_used_by_entries_and_size(self):
+        cache = ExtractionCache(max_entries=2, max_chars=10)
+        cache.put('a', 'aaaa', {})
+        cache.put('b', 'bbbb', {})
+        cache.get('a')
+        cache.put('c', 'cc', {})
+        self.assertIsNone(cache.get('b'))
+        cache.put('d', 'dddddd', {})
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['chars'], 8)
+
+    def test_oversized_text_is_not_cached(self):
+        cache = ExtractionCache(max_chars=3)
+        cache.put('a', 'abcd', {})
+        self.assertIsNone(cache.get('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from http_client import HttpClient
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 until `failures` runs out, then 200; records client ports"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        server.ports.add(self.client_address[1])
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        status = 503 if server.failures > 0 else 200
+        server.failures -= 1
+        body = b'busy' if status == 503 else b'ok'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+        self.server.failures = 0
+        self.server.ports = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/generate'
+        self.client = HttpClient(retries=2, backoff_factor=0)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_is_kept_alive(self):
+        for _ in range(3):
+            self.assertEqual(self.client.post(self.url, timeout=5, json={}).status_code, 200)
+        self.assertEqual(len(self.server.ports), 1)
+
+    def test_retries_503(self):
+        self.server.failures = 2
+        response = self.client.post(self.url, timeout=5, json={})
+        self.assertEqual(response.status_code, 200)
+
+    def test_retry_can_be_disabled(self):
+        self.server.failures = 1
+        response = self.client.post(self.url, timeout=5, json={}, retry_status=False)
+        self.assertEqual(response.status_code, 503)
+
+    def test_sessions_are_shared_per_host(self):
+        self.assertIs(self.client.session_for(self.url), self.client.session_for(self.url + '?x=1'))
+        self.assertIsNot(self.client.session_for(self.url), self.client.session_for('https://example.com/'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import threading
+import time
+import unittest
+
+from iam_token import IAMTokenManager
+
+
+class CountingTokenManager(IAMTokenManager):
+    """Token manager whose IAM round trip is simulated"""
+
+    def __init__(self, **kwargs):
+        super().__init__('api-key', **kwargs)
+        self.responses = []
+        self.delay = 0
+
+    def _fetch(self):
+        time.sleep(self.delay)
+        self.fetch_count += 1
+        return self.responses.pop(0) if self.responses else (f'token-{self.fetch_count}', 3600)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestIAMTokenManager(unittest.TestCase):
+
+    def test_token_is_reused_until_expiry(self):
+        clock = FakeClock()
+        manager = CountingTokenManager(clock=clock, background=False)
+        self.assertEqual(manager.get_token(), 'token-1')
+        clock.now += 3000
+        self.assertEqual(manager.get_token(), 'token-1')
+        clock.now += 601
+        self.assertEqual(manager.get_token(), 'token-2')
+        self.assertEqual(manager.fetch_count, 2)
+
+    def test_concurrent_refreshes_collapse(self):
+        manager = CountingTokenManager(background=False)
+        manager.delay = 0.05
+        tokens = []
+        threads = [threading.Thread(target=lambda: tokens.append(manager.get_token())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(manager.fetch_count, 1)
+        self.assertEqual(set(tokens), {'token-1'})
+
+    def test_failed_refresh_keeps_valid_token(self):
+        clock = FakeClock()
+        manager = CountingTokenManager(clock=clock, background=False)
+        manager.get_token()
+        manager.responses = [None]
+        clock.now += 3400  # inside the refresh margin
+        self.assertEqual(manager._refresh(scheduled=True), 'token-1')
+
+    def test_background_refresh_before_expiry(self):
+        manager = CountingTokenManager()
+        manager.responses = [('short-lived', 2)]
+        self.assertEqual(manager.get_token(), 'short-lived')
+        time.sleep(1.3)  # refresh is armed for half the lifetime, at least 1s
+        self.assertEqual(manager.fetch_count, 2)
+        self.assertEqual(manager.get_token(), 'token-2')
+
+    def test_invalidate_forces_new_token(self):
+        manager = CountingTokenManager(background=False)
+        manager.get_token()
+        manager.invalidate()
+        self.assertEqual(manager.get_token(), 'token-2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import threading
+import time
+import unittest
+
+from job_queue import JobQueue, QueueFullError
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.statuses = []
+        self.queue = JobQueue(max_workers=2, on_status=lambda job_id, status: self.statuses.append((job_id, status)))
+
+    def wait(self, job, timeout=2):
+        deadline = time.monotonic() + timeout
+        while not job.finished and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return job
+
+    def test_successful_job_reports_every_transition(self):
+        job = self.wait(self.queue.submit(1, 'test', lambda x: ({'value': x}, 200), 42))
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.result, {'value': 42})
+        self.assertEqual(self.statuses, [(1, 'running'), (1, 'completed')])
+
+    def test_error_status_code_fails_job(self):
+        job = self.wait(self.queue.submit(2, 'test', lambda: ({'error': 'TTS service not available'}, 503)))
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'TTS service not available')
+        self.assertEqual(self.statuses[-1], (2, 'failed'))
+
+    def test_exception_fails_job(self):
+        def crash():
+            raise RuntimeError('boom')
+
+        job = self.wait(self.queue.submit(3, 'test', crash))
+        self.assertEqual(job.status, 'failed')
+        self.assertIs(self.queue.get(3), job)
+
+    def test_progress_is_reported(self):
+        def work(progress):
+            progress(completed=1, total=2)
+            progress(completed=2)
+            return {}, 200
+
+        job = self.wait(self.queue.submit(4, 'test', work, report_progress=True))
+        self.assertEqual(job.to_dict()['progress'], {'completed': 2, 'total': 2})
+
+    def test_backlog_is_bounded(self):
+        queue = JobQueue(max_workers=1, max_pending=1)
+        release = threading.Event()
+        queue.submit(1, 'test', lambda: (release.wait(), ({}, 200))[1])
+        while queue.get(1).status != 'running':
+            time.sleep(0.01)
+        queue.submit(2, 'test', lambda: ({}, 200))
+        with self.assertRaises(QueueFullError):
+            queue.submit(3, 'test', lambda: ({}, 200))
+        release.set()
+
+
+if __name__ == '__main__':
+    unittest.main()
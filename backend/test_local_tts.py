@@ -0,0 +1,99 @@
+import sys
+import threading
+import types
+import unittest
+from unittest import mock
+
+from local_tts import LocalTTSPool, SystemVoice, resolve_voice
+
+
+def system_voices(*names):
+    return [SystemVoice(i, f'id-{name.split()[-1].lower()}', name, [], None, None) for i, name in enumerate(names)]
+
+
+class FakeEngine:
+    """Stands in for pyttsx3.engine.Engine"""
+    instances = []
+
+    def __init__(self, driver_name=None):
+        self.thread = threading.get_ident()
+        self.properties = {'voices': [types.SimpleNamespace(id='id-david', name='Microsoft David'),
+                                      types.SimpleNamespace(id='id-zira', name='Microsoft Zira')]}
+        self.pending = None
+        FakeEngine.instances.append(self)
+
+    def getProperty(self, name):
+        return self.properties.get(name)
+
+    def setProperty(self, name, value):
+        assert threading.get_ident() == self.thread, "engine used off its own thread"
+        self.properties[name] = value
+
+    def save_to_file(self, text, path):
+        self.pending = (text, path)
+
+    def runAndWait(self):
+        text, path = self.pending
+        with open(path, 'wb') as f:
+            f.write(f"{self.properties['voice']}:{text}".encode())
+
+    def stop(self):
+        pass
+
+
+class TestResolveVoice(unittest.TestCase):
+
+    def test_prefers_usual_index(self):
+        voices = system_voices('Microsoft David', 'Microsoft Zira')
+        self.assertEqual(resolve_voice(voices, 'zira')[0], 'id-zira')
+
+    def test_falls_back_to_keyword_then_gender(self):
+        voices = system_voices('Microsoft Zira', 'Microsoft Ravi')
+        self.assertEqual(resolve_voice(voices, 'ravi')[0], 'id-ravi')  # index 4 is out of range
+        self.assertEqual(resolve_voice(voices, 'heera')[0], 'id-zira')
+
+    def test_keyword_match_takes_the_first_matching_voice(self):
+        voices = system_voices('Generic Female', 'Microsoft Heera')
+        self.assertEqual(resolve_voice(voices, 'heera'), ('id-female', "keyword 'female'"))
+
+    def test_unknown_voice_uses_first(self):
+        self.assertEqual(resolve_voice(system_voices('Alex', 'Samantha'), 'nobody')[0], 'id-alex')
+        self.assertEqual(resolve_voice([], 'david')[0], None)
+
+
+class TestLocalTTSPool(unittest.TestCase):
+
+    def setUp(self):
+        FakeEngine.instances = []
+        fake_module = types.ModuleType('pyttsx3.engine')
+        fake_module.Engine = FakeEngine
+        fake_package = types.ModuleType('pyttsx3')
+        fake_package.engine = fake_module
+        patcher = mock.patch.dict(sys.modules, {'pyttsx3': fake_package, 'pyttsx3.engine': fake_module})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = LocalTTSPool(size=2)
+        self.addCleanup(self.pool.close)
+
+    def test_engines_are_reused(self):
+        for _ in range(5):
+            self.assertEqual(self.pool.synthesize('hi', 'zira', 'calm'), b'id-zira:hi')
+        self.assertEqual(len(FakeEngine.instances), 1)
+        self.assertEqual(self.pool.stats()['synthesized'], 5)
+
+    def test_voice_list_is_cached(self):
+        self.assertEqual([v.name for v in self.pool.voices()], ['Microsoft David', 'Microsoft Zira'])
+        self.pool.voices()
+        self.assertEqual(len(FakeEngine.instances), 1)
+
+    def test_concurrent_callers_share_bounded_engines(self):
+        threads = [threading.Thread(target=self.pool.synthesize, args=('hello', 'david', 'neutral')) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(len(FakeEngine.instances), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
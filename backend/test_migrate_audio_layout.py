@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from audio_storage import LocalAudioStorage, is_sharded_key
+from migrate_audio_layout import AudioLayoutMigration
+
+
+class FakeDB:
+    """audio_history/downloads reference columns, keyed by table then id"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.update_batches = 0
+
+    def get_audio_reference_page(self, table, after_id=0, limit=500):
+        rows = sorted((row_id, ref) for row_id, ref in self.tables[table].items() if row_id > after_id and ref)
+        return [{'id': row_id, 'ref': ref} for row_id, ref in rows[:limit]]
+
+    def update_audio_references_batch(self, table, updates):
+        self.update_batches += 1
+        for row_id, ref in updates:
+            self.tables[table][row_id] = ref
+        return len(updates)
+
+
+class AudioLayoutMigrationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.storage = LocalAudioStorage(os.path.join(self.tmp, 'audio'))
+        self.journal = os.path.join(self.tmp, 'migration.journal')
+        for name in ('a.opus', 'b.wav', 'unreferenced.opus'):
+            with open(os.path.join(self.storage.root, name), 'wb') as f:
+                f.write(name.encode())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def make_db(self):
+        return FakeDB({
+            'audio_history': {1: 'a.opus', 2: os.path.join(self.storage.root, 'b.wav'), 3: 'gone.opus', 4: '../x'},
+            'downloads': {10: 'a.opus', 11: 'b.wav'},
+        })
+
+    def test_dry_run_changes_nothing(self):
+        db = self.make_db()
+        report = AudioLayoutMigration(db, self.storage, self.journal, batch_size=2, dry_run=True).run()
+        self.assertEqual(report['files_moved'], 2)
+        self.assertEqual(report['rewritten'], 4)
+        self.assertEqual(db.tables, self.make_db().tables)
+        self.assertFalse(os.path.exists(self.journal))
+        self.assertTrue(self.storage.exists('a.opus'))
+
+    def test_moves_files_and_rewrites_rows_in_batches(self):
+        db = self.make_db()
+        report = AudioLayoutMigration(db, self.storage, self.journal, batch_size=2).run()
+        self.assertEqual((report['files_moved'], report['rewritten'], report['missing'], report['invalid']), (2, 4, 1, 1))
+        self.assertEqual(db.update_batches, 2)  # one per batch that had something to rewrite
+
+        history, downloads = db.tables['audio_history'], db.tables['downloads']
+        # A file referenced from both tables moved once and both rows follow it
+        self.assertEqual(history[1], downloads[10])
+        self.assertEqual(history[2], downloads[11])
+        for key in (history[1], history[2]):
+            self.assertTrue(is_sharded_key(key))
+        self.assertTrue(history[2].endswith('.wav'))
+        with self.storage.open(history[1]) as f:
+            self.assertEqual(f.read(), b'a.opus')
+        self.assertFalse(self.storage.exists('a.opus'))
+        self.assertEqual(history[3], 'gone.opus')
+        self.assertTrue(self.storage.exists('unreferenced.opus'))  # left for the sweeper
+
+        # Running again finds nothing left to do
+        report = AudioLayoutMigration(db, self.storage, self.journal, batch_size=2).run()
+        self.assertEqual((report['files_moved'], report['rewritten'], report['already_sharded']), (0, 0, 4))
+
+    def test_resumes_from_the_journal(self):
+        # An earlier run journaled a.opus's new key and moved it, then died before the rows were rewritten
+        new_key = 'ab/cd/abcd0000000000000000000000000001.opus'
+        with open(self.journal, 'w') as f:
+            f.write(f'a.opus\t{new_key}\n')
+        self.storage.put_file(new_key, self.storage.path_for('a.opus'))
+
+        db = self.make_db()
+        report = AudioLayoutMigration(db, self.storage, self.journal).run()
+        self.assertEqual(db.tables['audio_history'][1], new_key)
+        self.assertEqual(db.tables['downloads'][10], new_key)
+        self.assertEqual(report['files_moved'], 1)  # only b.wav
+        self.assertTrue(self.storage.exists(new_key))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from rewrite_cache import RewriteCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRewriteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'echoverse.db')
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_lookup_prefers_first_model_and_counts_hits(self):
+        cache = RewriteCache(max_entries=10, ttl=60, clock=self.clock)
+        self.assertEqual(cache.lookup('Hello  world', 'calm', ['hf', 'watson']), (None, None))
+        cache.put('Hello world', 'calm', 'watson', 'Gently, hello world.')
+        self.assertEqual(cache.lookup(' Hello world ', 'Calm', ['hf', 'watson']), ('Gently, hello world.', 'watson'))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+    def test_entries_expire(self):
+        cache = RewriteCache(ttl=60, clock=self.clock)
+        cache.put('text', 'sad', 'hf', 'rewritten')
+        self.clock.now += 61
+        self.assertIsNone(cache.get('text', 'sad', 'hf'))
+
+    def test_lru_is_bounded(self):
+        cache = RewriteCache(max_entries=2, clock=self.clock)
+        for i in range(3):
+            cache.put(f'text {i}', 'neutral', 'hf', f'rewrite {i}')
+        self.assertIsNone(cache.get('text 0', 'neutral', 'hf'))
+        self.assertEqual(cache.get('text 2', 'neutral', 'hf'), 'rewrite 2')
+
+    def test_persistent_tier_survives_restart(self):
+        cache = RewriteCache(ttl=60, db_path=self.db_path, clock=self.clock)
+        cache.put('text', 'cheerful', 'hf', 'Happy text!')
+        reopened = RewriteCache(ttl=60, db_path=self.db_path, clock=self.clock)
+        self.assertEqual(reopened.get('text', 'cheerful', 'hf'), 'Happy text!')
+        self.assertEqual(reopened.stats()['db_hits'], 1)
+        self.clock.now += 61
+        self.assertIsNone(RewriteCache(ttl=60, db_path=self.db_path, clock=self.clock).get('text', 'cheerful', 'hf'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from story_analysis import analyze_story_content, detect_tone, find_speaker, iter_lines, iter_story_segments
+
+
+class TestStoryAnalysis(unittest.TestCase):
+
+    def test_character_lines_and_quoted_dialogue(self):
+        segments = analyze_story_content(
+            'Once upon a time, all was quiet.\n\n'
+            'alice (Happy): "Good morning"\n'
+            '"Where are we?" Bob asked.\n'
+            '"Hello?"\n'
+            '"Anyone?"\n'
+            'Alice (bored): fine'
+        )
+        self.assertEqual([(s['character'], s['voice'], s['tone']) for s in segments], [
+            ('Narrator', 'david', 'calm'),
+            ('Alice', 'zira', 'cheerful'),
+            ('Bob', 'heera', 'neutral'),
+            ('Character 1', 'mark', 'neutral'),
+            ('Character 2', 'ravi', 'neutral'),
+            ('Alice', 'zira', 'neutral'),
+        ])
+        self.assertEqual(segments[1]['text'], 'Good morning.')
+        self.assertEqual([s['is_dialogue'] for s in segments], [False, True, True, True, True, True])
+        self.assertIsNone(segments[2]['emotion'])
+
+    def test_tone_keywords_take_priority_over_indicators(self):
+        self.assertEqual(detect_tone('she smiled, then shouted!'), 'cheerful')
+        self.assertEqual(detect_tone('a mysterious whisper'), 'calm')
+        self.assertEqual(detect_tone('he murmured'), 'calm')
+        self.assertEqual(detect_tone('plain words'), 'neutral')
+
+    def test_find_speaker(self):
+        self.assertEqual(find_speaker('"come here," said tom quickly'), 'Tom')
+        self.assertEqual(find_speaker('mary replied and john said'), 'Mary')
+        self.assertIsNone(find_speaker('"no verbs here"'))
+
+    def test_iter_lines_matches_split(self):
+        for text in ('', 'one', 'a\nb', 'a\n\nb\n', '\n'):
+            self.assertEqual(list(iter_lines(text)), text.split('\n'))
+
+    def test_segments_are_generated_lazily(self):
+        consumed = []
+
+        def lines():
+            for line in ('The wind was calm.', '"Run!" Ann said.', 'The end'):
+                consumed.append(line)
+                yield line
+
+        segments = iter_story_segments(lines())
+        first = next(segments)
+        self.assertEqual(first['character'], 'Narrator')
+        self.assertEqual(consumed, ['The wind was calm.'])
+        self.assertEqual([s['character'] for s in segments], ['Ann', 'Narrator'])
+        text = 'The wind was calm.\n"Run!" Ann said.\nThe end'
+        self.assertEqual(analyze_story_content(text), list(iter_story_segments(text.split('\n'))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from study_segmentation import find_headings, first_line, paragraph_spans, segment
+
+
+class TestFindHeadings(unittest.TestCase):
+
+    def test_first_kind_with_two_headings_wins(self):
+        text = "Unit 1: Cells\nChapter 1: Intro\nbody\nUnit 2: Energy\n1. one\n2. two\n"
+        kind, headings = find_headings(text)
+        self.assertEqual(kind, 'unit')
+        self.assertEqual([text[h.title_start:h.title_end] for h in headings], ['Cells', 'Energy'])
+
+    def test_numbered_headings_and_no_headings(self):
+        kind, headings = find_headings("Intro\n12. Twelve\nbody\n3.5 ratio\n")
+        self.assertEqual(kind, 'numbered')
+        self.assertEqual([h.start for h in headings], [6, 22])
+        self.assertEqual(find_headings("Chapter 1: only one\nplain text"), (None, []))
+
+    def test_case_insensitive_keywords_keep_offsets(self):
+        text = "İ PART 1: Alpha\nx\nleſſon 3\npart 2: Beta\ny"
+        kind, headings = find_headings(text)
+        self.assertEqual(kind, 'part')
+        self.assertEqual([text[h.title_start:h.title_end] for h in headings], ['Alpha', 'Beta'])
+
+
+class TestSegment(unittest.TestCase):
+
+    def test_chapters_are_spans_with_lazy_topics(self):
+        text = "Chapter 1: Start\n\nFirst. More.\n\nChapter 2: Empty\nChapter 3: End\n\n" + \
+               "\n\n".join(f"Para {i}. Words here." for i in range(6))
+        kind, chapters = segment(text, 'Fallback')
+        self.assertEqual(kind, 'chapter')
+        self.assertEqual([c.title for c in chapters], ['Start', 'End'])
+        self.assertEqual(chapters[0].to_dict(), {
+            'title': 'Start', 'summary': 'First. More.', 'topics': [{'name': 'Main Content', 'content': 'First. More.'}]
+        })
+        topics = chapters[1].topics
+        self.assertEqual([t.name for t in topics], ['Topic 1: Para 0', 'Topic 2: Para 2', 'Topic 3: Para 4'])
+        self.assertEqual(topics[0].content, 'Para 0. Words here.\n\nPara 1. Words here.')
+
+    def test_fallback_single_chapter(self):
+        text = 'x' * 250
+        kind, chapters = segment(text, 'Notes')
+        self.assertIsNone(kind)
+        self.assertEqual(chapters[0].title, 'Notes')
+        self.assertEqual(chapters[0].summary, 'x' * 200 + '...')
+
+    def test_helpers(self):
+        self.assertEqual(first_line('\n  Chapter 1: A  \nrest'), 'Chapter 1: A')
+        text = ' a \n\n\n\n b\n\nc '
+        self.assertEqual([text[s:e] for s, e in paragraph_spans(text, 0, len(text))], ['a', 'b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+
+from synthesis_pool import EngineLimiter, SegmentExecutor
+
+
+class TestSegmentExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = SegmentExecutor(max_workers=4)
+
+    def test_results_preserve_input_order(self):
+        def slow_echo(i):
+            time.sleep(0.01 * (5 - i))  # earlier items finish last
+            return i
+
+        results = self.executor.map_ordered(slow_echo, range(5))
+        self.assertEqual([result for result, _ in results], [0, 1, 2, 3, 4])
+
+    def test_failure_does_not_cancel_other_segments(self):
+        def flaky(i):
+            if i == 2:
+                raise ValueError("segment 2 failed")
+            return i * 10
+
+        results = self.executor.map_ordered(flaky, range(4))
+        self.assertEqual([result for result, _ in results], [0, 10, None, 30])
+        self.assertIsInstance(results[2][1], ValueError)
+        self.assertIsNone(results[3][1])
+
+    def test_runs_concurrently(self):
+        start = time.monotonic()
+        self.executor.map_ordered(lambda i: time.sleep(0.1), range(4))
+        self.assertLess(time.monotonic() - start, 0.3)
+
+    def test_lazy_input_is_consumed_within_window(self):
+        consumed = []
+
+        def source():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        results = self.executor.imap_ordered(lambda i: i, source(), window=3)
+        self.assertEqual(next(results), (0, None))
+        self.assertLessEqual(len(consumed), 4)
+
+    def test_closing_early_cancels_queued_items(self):
+        executor = SegmentExecutor(max_workers=1)
+        started = []
+
+        def work(i):
+            started.append(i)
+            time.sleep(0.05)
+            return i
+
+        results = executor.imap_ordered(work, range(10), window=5)
+        self.assertEqual(next(results), (0, None))
+        results.close()
+        time.sleep(0.2)
+        self.assertLessEqual(len(started), 2)
+
+
+class TestEngineLimiter(unittest.TestCase):
+
+    def test_limit_caps_concurrency(self):
+        limiter = EngineLimiter({'watson': 2})
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def work(_):
+            with limiter.slot('watson'):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.02)
+                with lock:
+                    active.pop()
+
+        SegmentExecutor(max_workers=6).map_ordered(work, range(6))
+        self.assertEqual(max(peak), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
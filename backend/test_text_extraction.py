@@ -0,0 +1,96 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from text_extraction import PdfExtractionError, PdfExtractor
+
+
+def stuck_page_range(file_path, start, stop):
+    """Stands in for a page that never finishes extracting"""
+    time.sleep(60)
+
+
+def make_pdf(path, page_texts):
+    """Write a minimal PDF with one line of Helvetica text per page"""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None, '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for text in page_texts:
+        stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>')
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    for offset in offsets:
+        out += f'{offset:010d} 00000 n \n'.encode()
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+class TestPdfExtractor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'book.pdf')
+        make_pdf(self.path, [f'Page number {i}' for i in range(1, 21)])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_parallel_extraction_keeps_page_order(self):
+        extractor = PdfExtractor(max_workers=2, pages_per_task=3)
+        progress = []
+        result = extractor.extract(self.path, progress=lambda done, total: progress.append((done, total)))
+        lines = result.text.splitlines()
+        self.assertEqual(lines[0], 'Page number 1')
+        self.assertEqual(lines[-1], 'Page number 20')
+        self.assertEqual((result.page_count, result.pages_extracted, result.pages_failed), (20, 20, 0))
+        self.assertEqual(progress[-1], (20, 20))
+        self.assertEqual(len(progress), 20)
+
+    def test_page_budget_truncates(self):
+        result = PdfExtractor(max_workers=0, max_pages=5).extract(self.path)
+        self.assertTrue(result.truncated)
+        self.assertEqual(result.text.splitlines()[-1], 'Page number 5')
+
+    def test_time_budget_stops_extraction(self):
+        result = PdfExtractor(max_workers=0, time_budget=0).extract(self.path)
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.text, '')
+
+    def test_timed_out_workers_are_recycled(self):
+        extractor = PdfExtractor(max_workers=1, time_budget=0.5)
+        started = time.monotonic()
+        with mock.patch('text_extraction._extract_page_range', stuck_page_range):
+            result = extractor.extract(self.path)
+            pool = extractor._executor
+        self.assertTrue(result.timed_out)
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertIsNone(pool)
+        self.assertEqual(extractor.stats()['pools_recycled'], 1)
+
+        # The next extraction gets a fresh pool rather than queueing behind the stuck page
+        result = extractor.extract(self.path)
+        self.assertEqual(result.pages_extracted, 20)
+        self.assertEqual(extractor.stats()['pools_retiring'], 0)
+
+    def test_unreadable_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a pdf')
+        with self.assertRaises(PdfExtractionError):
+            PdfExtractor(max_workers=0).extract(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import io
+import os
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+from flask import Flask, jsonify, request
+
+from upload_spool import SpoolingRequest, UploadSpool
+from study_segmentation import segment as segment_study_text
+
+
+class TestUploadSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_hashes_and_rolls_over_to_a_unique_file(self):
+        data = os.urandom(5000)
+        spools = [UploadSpool(self.tmp_dir, max_memory=1024, suffix='.pdf') for _ in range(2)]
+        for spool in spools:
+            for start in range(0, len(data), 1000):
+                spool.write(data[start:start + 1000])
+            spool.seek(0)
+            self.assertEqual(spool.read(), data)
+            self.assertEqual((spool.hexdigest, spool.size), (hashlib.sha256(data).hexdigest(), len(data)))
+        self.assertNotEqual(spools[0].path, spools[1].path)
+        self.assertTrue(spools[0].path.endswith('.pdf'))
+        for spool in spools:
+            path = spool.path
+            spool.close()
+            self.assertFalse(os.path.exists(path))
+
+    def test_small_upload_stays_in_memory_until_a_path_is_needed(self):
+        with UploadSpool(self.tmp_dir, max_memory=1024) as spool:
+            spool.write(b'%PDF-1.4')
+            self.assertIsNone(spool.path)
+            with open(spool.disk_path(), 'rb') as f:
+                self.assertEqual(f.read(), b'%PDF-1.4')
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_text_is_decoded_across_chunk_boundaries(self):
+        data = 'Café résumé ✓ '.encode('utf-8') * 100
+        spool = UploadSpool(max_memory=len(data), decode_text=True)
+        for start in range(0, len(data), 7):
+            spool.write(data[start:start + 7])
+        self.assertEqual(spool.text(), data.decode('utf-8'))
+
+    def test_crlf_text_reads_like_lf(self):
+        lf = '\n\n'.join(f'Paragraph {word} of the notes, long enough to read aloud.'
+                           for word in ('one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight')) + '\n'
+        data = lf.replace('\n', '\r\n').encode('utf-8')
+        # Decoded as it arrives, with CRLFs split across chunks
+        spool = UploadSpool(decode_text=True)
+        for start in range(0, len(data), 3):
+            spool.write(data[start:start + 3])
+        self.assertEqual(spool.text(), lf)
+        topic_counts = [len(chapter.topics) for chapter in segment_study_text(spool.text(), 'notes')[1]]
+        self.assertEqual(topic_counts, [len(chapter.topics) for chapter in segment_study_text(lf, 'notes')[1]])
+        self.assertGreater(sum(topic_counts), 1)
+        # And decoded in one go
+        spool = UploadSpool()
+        spool.write(data)
+        self.assertEqual(spool.text(), lf)
+
+    def test_invalid_text_raises_when_read(self):
+        spool = UploadSpool(decode_text=True)
+        spool.write(b'ok \xff\xfe')
+        with self.assertRaises(UnicodeDecodeError):
+            spool.text()
+
+
+class TestSpoolingRequest(unittest.TestCase):
+
+    def test_uploads_arrive_in_spools_removed_after_the_request(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        app = Flask(__name__)
+        app.request_class = SpoolingRequest
+        app.config['UPLOAD_SPOOL_DIR'] = tmp_dir
+        app.config['UPLOAD_SPOOL_MAX_MEMORY'] = 16
+
+        @app.route('/upload', methods=['POST'])
+        def upload():
+            spool = request.files['file'].stream
+            return jsonify({'hash': spool.hexdigest, 'text': spool.text(), 'on_disk': os.path.exists(spool.path)})
+
+        body = 'chapter one\n' * 10
+        response = app.test_client().post('/upload', data={'file': (io.BytesIO(body.encode()), 'notes.txt')},
+                                          content_type='multipart/form-data')
+        self.assertEqual(response.get_json(), {
+            'hash': hashlib.sha256(body.encode()).hexdigest(), 'text': body, 'on_disk': True
+        })
+        self.assertEqual(os.listdir(tmp_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import io
+import os
+import struct
+import tempfile
+import unittest
+import wave
+from unittest import mock
+
+import wav_concat
+from wav_concat import WavConcatenator, WavFileWriter, WavFormat, decode_audio, parse_wav, wav_header
+
+
+def make_wav(frames, frame_rate=22050, channels=1, sample_width=2, value=1000):
+    """Build a WAV file of constant-valued samples"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(frame_rate)
+        sample = struct.pack('<h', value) if sample_width == 2 else bytes([value & 0xFF])
+        wav_file.writeframes(sample * channels * frames)
+    return buffer.getvalue()
+
+
+def read_wav(data):
+    with wave.open(io.BytesIO(bytes(data)), 'rb') as wav_file:
+        return wav_file.getparams(), wav_file.readframes(wav_file.getnframes())
+
+
+class TestParseWav(unittest.TestCase):
+
+    def test_parses_format_and_data(self):
+        fmt, pcm = parse_wav(make_wav(100))
+        self.assertEqual(fmt, WavFormat(1, 2, 22050))
+        self.assertEqual(len(pcm), 200)
+
+    def test_streaming_header_reads_to_end(self):
+        pcm = b'\x01\x00' * 50
+        data = wav_header(WavFormat(1, 2, 16000), None) + pcm
+        fmt, parsed = parse_wav(data)
+        self.assertEqual(bytes(parsed), pcm)
+
+    def test_rejects_non_wav(self):
+        with self.assertRaises(ValueError):
+            parse_wav(b'ID3' + b'\x00' * 40)
+
+    def test_decode_audio_falls_back_to_pydub_for_compressed_audio(self):
+        decoded = (WavFormat(1, 2, 16000), b'\x00\x00')
+        with mock.patch.object(wav_concat, '_decode_with_pydub', return_value=decoded) as pydub:
+            self.assertEqual(decode_audio(b'fLaC' + b'\x00' * 40), decoded)
+            self.assertEqual(decode_audio(make_wav(10))[0], WavFormat(1, 2, 22050))
+            with self.assertRaises(ValueError):
+                decode_audio(b'RIFF' + b'\x00' * 40)
+        pydub.assert_called_once()
+
+    def test_undecodable_audio_raises_value_error(self):
+        # Whatever pydub/ffmpeg make of it (or if ffprobe is missing), callers only see ValueError
+        with self.assertRaises(ValueError):
+            decode_audio(b'ID3garbage' * 50)
+        with self.assertRaises(ValueError):
+            WavConcatenator().add(b'fLaC' + b'\x00' * 100)
+
+
+class TestWavConcatenator(unittest.TestCase):
+
+    def test_merges_with_pauses(self):
+        merger = WavConcatenator(pause_ms=100)
+        for frames in (1000, 2000, 500):
+            merger.add(make_wav(frames))
+        params, frames = read_wav(merger.to_bytes())
+        pause_frames = 22050 // 10
+        self.assertEqual(params.nframes, 3500 + 2 * pause_frames)
+        # Silence sits right after the first segment
+        self.assertEqual(frames[2000:2000 + pause_frames * 2], b'\x00' * pause_frames * 2)
+        self.assertAlmostEqual(merger.duration_seconds, params.nframes / 22050, places=3)
+
+    def test_write_matches_to_bytes(self):
+        merger = WavConcatenator(pause_ms=50)
+        merger.add(make_wav(300))
+        merger.add(make_wav(300))
+        expected = bytes(merger.to_bytes())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'merged.wav')
+            self.assertEqual(merger.write(path), len(expected))
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), expected)
+
+    def test_mismatched_formats_are_converted(self):
+        merger = WavConcatenator(pause_ms=0)
+        merger.add(make_wav(11025, frame_rate=11025))
+        merger.add(make_wav(22050, frame_rate=22050, channels=2))
+        params, _ = read_wav(merger.to_bytes())
+        self.assertEqual((params.nchannels, params.sampwidth, params.framerate), (2, 2, 22050))
+        self.assertAlmostEqual(params.nframes, 44100, delta=4)
+
+
+class TestWavFileWriter(unittest.TestCase):
+
+    def test_header_is_fixed_up_on_close(self):
+        fmt = WavFormat(1, 2, 22050)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'streamed.wav')
+            writer = WavFileWriter(path, fmt)
+            writer.write(b'\x01\x00' * 100)
+            writer.write(b'\x02\x00' * 50)
+            self.assertEqual(writer.close(), 44 + 300)
+            with open(path, 'rb') as f:
+                params, frames = read_wav(f.read())
+        self.assertEqual(params.nframes, 150)
+        self.assertEqual(frames[-2:], b'\x02\x00')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+"""
+Page-parallel PDF text extraction
+
+Large textbooks used to be extracted page by page on the request thread. Here
+page ranges are fanned out to a process pool (text extraction is CPU bound,
+so threads wouldn't help under the GIL), pages are yielded back in order as
+soon as they're ready, and the text is joined once at the end. Page and time
+budgets stop a single huge upload from pinning a worker: when the time budget
+runs out with pages still being extracted, the pool is retired and its worker
+processes are terminated once no other extraction is using them.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+ExtractionResult = namedtuple('ExtractionResult', [
+    'text', 'page_count', 'pages_extracted', 'pages_failed', 'truncated', 'timed_out'
+])
+
+
+class PdfExtractionError(Exception):
+    """Raised when a PDF can't be opened at all"""
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[Tuple[int, Optional[str], Optional[str]]]:
+    """Extract pages [start, stop); runs in a pool process. Returns (index, text, error) per page"""
+    pages = []
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        for index in range(start, stop):
+            try:
+                pages.append((index, reader.pages[index].extract_text() or '', None))
+            except Exception as e:
+                pages.append((index, None, str(e)))
+    return pages
+
+
+class PdfExtractor:
+    """Extracts PDF text across a process pool within page and time budgets"""
+
+    def __init__(self, max_workers: int = 2, max_pages: int = 1000, time_budget: float = 120,
+                 pages_per_task: int = 8):
+        self.max_workers = max_workers
+        self.max_pages = max_pages
+        self.time_budget = time_budget
+        self.pages_per_task = max(1, pages_per_task)
+        self._executor = None
+        self._users = {}  # pool -> extractions using it
+        self._lock = threading.Lock()
+        self._stats = {'extractions': 0, 'timeouts': 0, 'pools_recycled': 0}
+
+    def _acquire_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Shared process pool, started on first use (None when workers are disabled)"""
+        if self.max_workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._users[self._executor] = self._users.get(self._executor, 0) + 1
+            return self._executor
+
+    def _release_pool(self, pool: ProcessPoolExecutor, busy: bool):
+        """Stop using ``pool``; ``busy`` means work of ours is still running in it
+
+        A busy pool is retired (later extractions start a fresh one) and its
+        processes are killed once its last user lets go, since a running page
+        can't be cancelled any other way.
+        """
+        with self._lock:
+            if busy and self._executor is pool:
+                self._executor = None
+                self._stats['pools_recycled'] += 1
+            self._users[pool] -= 1
+            if self._users[pool] or self._executor is pool:
+                return
+            del self._users[pool]
+        logger.warning("Terminating PDF extraction workers left running past the time budget")
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def page_count(file_path: str) -> int:
+        try:
+            with open(file_path, 'rb') as file:
+                return len(PyPDF2.PdfReader(file).pages)
+        except Exception as e:
+            raise PdfExtractionError(f"Cannot read PDF: {e}")
+
+    def iter_pages(self, file_path: str, page_count: int,
+                   deadline: float) -> Iterator[Tuple[int, Optional[str], Optional[str]]]:
+        """Yield (index, text, error) for each page in order, as soon as it's ready
+
+        Stops early once ``deadline`` passes; queued ranges are cancelled and
+        ranges already running are stopped by recycling the pool.
+        """
+        ranges = [(start, min(start + self.pages_per_task, page_count))
+                  for start in range(0, page_count, self.pages_per_task)]
+        pool = self._acquire_pool()
+
+        if pool is None:
+            for start, stop in ranges:
+                if time.monotonic() >= deadline:
+                    return
+                yield from _extract_page_range(file_path, start, stop)
+            return
+
+        futures = []
+        try:
+            futures = [pool.submit(_extract_page_range, file_path, start, stop) for start, stop in ranges]
+            for future in futures:
+                remaining = deadline - time.monotonic()
+                try:
+                    pages = future.result(timeout=max(remaining, 0))
+                except FutureTimeoutError:
+                    return
+                except Exception as e:
+                    # The worker itself failed (e.g. it died); mark the whole range as failed
+                    start, stop = ranges[futures.index(future)]
+                    pages = [(index, None, str(e)) for index in range(start, stop)]
+                yield from pages
+        finally:
+            busy = [future for future in futures if not future.cancel() and not future.done()]
+            self._release_pool(pool, bool(busy))
+
+    def extract(self, file_path: str,
+                progress: Optional[Callable[[int, int], None]] = None) -> ExtractionResult:
+        """Extract the text of a PDF; ``progress(pages_done, pages_total)`` is called per page"""
+        page_count = self.page_count(file_path)
+        budget_pages = min(page_count, self.max_pages)
+        deadline = time.monotonic() + self.time_budget
+        with self._lock:
+            self._stats['extractions'] += 1
+
+        texts = []
+        done = failed = 0
+        for index, page_text, error in self.iter_pages(file_path, budget_pages, deadline):
+            done += 1
+            if error:
+                failed += 1
+                logger.warning(f"Error extracting text from page {index + 1}: {error}")
+            elif page_text:
+                texts.append(page_text)
+            if progress:
+                progress(done, budget_pages)
+
+        timed_out = done < budget_pages
+        if page_count > budget_pages:
+            logger.warning(f"PDF has {page_count} pages, extracted only the first {budget_pages}")
+        if timed_out:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            logger.warning(f"PDF extraction stopped after {self.time_budget}s at page {done} of {budget_pages}")
+
+        return ExtractionResult(
+            text='\n'.join(texts) + '\n' if texts else '',
+            page_count=page_count,
+            pages_extracted=done - failed,
+            pages_failed=failed,
+            truncated=page_count > budget_pages,
+            timed_out=timed_out
+        )
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pools_retiring'] = sum(1 for pool in self._users if pool is not self._executor)
+        return stats
+
+
+# Shared instance, configured from the environment
+pdf_extractor = PdfExtractor(
+    max_workers=int(os.getenv('PDF_EXTRACT_WORKERS', 2)),
+    max_pages=int(os.getenv('PDF_MAX_PAGES', 1000)),
+    time_budget=float(os.getenv('PDF_EXTRACT_TIME_BUDGET', 120))
+)
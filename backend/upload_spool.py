@@ -0,0 +1,164 @@
+"""
+Streaming spool for file uploads
+
+Werkzeug writes each uploaded file into whatever stream the request hands it
+while the multipart body is still arriving. Here that stream hashes the
+bytes (and incrementally decodes .txt uploads) as they are written, keeps
+small uploads in memory and rolls larger ones over to a uniquely named file,
+so concurrent uploads of ``notes.pdf`` never share a path and no second pass
+over the file is needed before work can start.
+"""
+
+import io
+import os
+import re
+import codecs
+import hashlib
+import logging
+import tempfile
+from typing import Optional
+
+from flask import Request, current_app
+
+logger = logging.getLogger(__name__)
+
+TEXT_EXTENSIONS = ('.txt',)
+
+
+class UploadSpool:
+    """Writable/readable upload buffer that hashes everything written to it"""
+
+    def __init__(self, directory: Optional[str] = None, max_memory: int = 4 * 1024 * 1024,
+                 suffix: str = '', decode_text: bool = False):
+        self.directory = directory
+        self.max_memory = max_memory
+        self.suffix = suffix
+        self.path = None
+        self.size = 0
+        self._file = io.BytesIO()
+        self._digest = hashlib.sha256()
+        # Newlines are translated as open(path, 'r') would, so CRLF files split like LF ones
+        self._decoder = (io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+                         if decode_text else None)
+        self._text_parts = []
+        self._text = None
+        self._text_error = None
+
+    @property
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def write(self, data: bytes) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        if self._decoder is not None:
+            try:
+                self._text_parts.append(self._decoder.decode(data))
+            except UnicodeDecodeError as e:
+                # Reported by text(); the upload itself is still accepted
+                self._decoder, self._text_parts, self._text_error = None, [], e
+        if self.path is None and self.size > self.max_memory:
+            self._rollover()
+        return self._file.write(data)
+
+    def _rollover(self):
+        """Move the buffered bytes to a uniquely named file"""
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix='upload-', suffix=self.suffix, dir=self.directory)
+        disk_file = os.fdopen(fd, 'w+b')
+        position = self._file.tell()
+        disk_file.write(self._file.getbuffer())
+        disk_file.seek(position)
+        self._file.close()
+        self._file, self.path = disk_file, path
+
+    def disk_path(self) -> str:
+        """Path of the spooled bytes, writing an in-memory upload to disk first"""
+        if self.path is None:
+            self._rollover()
+        self._file.flush()
+        return self.path
+
+    def text(self) -> str:
+        """The upload decoded as UTF-8 with universal newlines (raises UnicodeDecodeError if it isn't)"""
+        if self._text is None:
+            if self._text_error is not None:
+                raise self._text_error
+            if self._decoder is not None:
+                self._text_parts.append(self._decoder.decode(b'', final=True))
+                self._text, self._text_parts, self._decoder = ''.join(self._text_parts), [], None
+            else:
+                position = self._file.tell()
+                self._file.seek(0)
+                decoder = io.IncrementalNewlineDecoder(None, translate=True)
+                self._text = decoder.decode(self._file.read().decode('utf-8'), final=True)
+                self._file.seek(position)
+        return self._text
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self._file.readline(size)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def close(self):
+        """Close the buffer and remove its spool file, if any"""
+        self._file.close()
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove upload spool {self.path}: {e}")
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class SpoolingRequest(Request):
+    """Request whose file uploads go into an ``UploadSpool``
+
+    Configured by ``UPLOAD_SPOOL_DIR`` and ``UPLOAD_SPOOL_MAX_MEMORY`` (bytes).
+    Spools are closed, and their files removed, when the request ends.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        suffix = os.path.splitext(filename or '')[1].lower()
+        if not re.fullmatch(r'\.[a-z0-9]{1,10}', suffix):
+            suffix = ''
+        return UploadSpool(
+            directory=config.get('UPLOAD_SPOOL_DIR'),
+            max_memory=config.get('UPLOAD_SPOOL_MAX_MEMORY', 4 * 1024 * 1024),
+            suffix=suffix,
+            decode_text=suffix in TEXT_EXTENSIONS
+        )
@@ -0,0 +1,251 @@
+"""
+In-memory WAV concatenation for merged story narration
+
+Segments are parsed straight from the bytes the TTS engines return (no temp
+files), converted to a common PCM format when they differ, and written out
+once with precomputed silence between them. The merge is linear in the total
+audio size: every segment's samples are copied exactly once into the output.
+"""
+
+import io
+import struct
+import logging
+import warnings
+from collections import namedtuple
+from typing import List, Optional, Tuple
+
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore', DeprecationWarning)
+    try:
+        import audioop  # Removed from the stdlib in 3.13; `pip install audioop-lts` restores it
+    except ImportError:
+        audioop = None
+
+logger = logging.getLogger(__name__)
+
+WavFormat = namedtuple('WavFormat', ['channels', 'sample_width', 'frame_rate'])
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# Data size written by streaming encoders (and us) when the length isn't known up front
+UNKNOWN_DATA_SIZE = 0xFFFFFFFF
+
+
+def parse_wav(data: bytes) -> Tuple[WavFormat, memoryview]:
+    """Return the PCM format and a zero-copy view of the sample data of a WAV file
+
+    Tolerates the streaming headers some TTS engines emit, where the RIFF/data
+    sizes are 0 or 0xFFFFFFFF, by reading the data chunk to the end of the buffer.
+    """
+    view = memoryview(data)
+    if len(view) < 12 or bytes(view[0:4]) != b'RIFF' or bytes(view[8:12]) != b'WAVE':
+        raise ValueError("Not a RIFF/WAVE file")
+
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(view):
+        chunk_id = bytes(view[offset:offset + 4])
+        chunk_size = struct.unpack_from('<I', view, offset + 4)[0]
+        body = offset + 8
+
+        if chunk_id == b'fmt ':
+            audio_format, channels, frame_rate, _, _, bits = struct.unpack_from('<HHIIHH', view, body)
+            if audio_format not in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE):
+                raise ValueError(f"Unsupported WAV encoding {audio_format:#06x} (only PCM is supported)")
+            fmt = WavFormat(channels, (bits + 7) // 8, frame_rate)
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("WAV data chunk appears before fmt chunk")
+            end = len(view) if chunk_size in (0, UNKNOWN_DATA_SIZE) else min(body + chunk_size, len(view))
+            frame_size = fmt.channels * fmt.sample_width
+            end -= (end - body) % frame_size  # drop any trailing partial frame
+            return fmt, view[body:end]
+
+        offset = body + chunk_size + (chunk_size & 1)  # chunks are word aligned
+
+    raise ValueError("WAV file has no data chunk")
+
+
+def wav_header(fmt: WavFormat, data_size: Optional[int]) -> bytes:
+    """Build a canonical 44-byte PCM WAV header
+
+    Pass data_size=None for a streaming header whose length is not yet known.
+    """
+    if data_size is None:
+        riff_size = data_size = UNKNOWN_DATA_SIZE
+    else:
+        riff_size = 36 + data_size
+    block_align = fmt.channels * fmt.sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', riff_size, b'WAVE',
+        b'fmt ', 16, WAVE_FORMAT_PCM, fmt.channels, fmt.frame_rate,
+        fmt.frame_rate * block_align, block_align, fmt.sample_width * 8,
+        b'data', data_size
+    )
+
+
+def silence(fmt: WavFormat, duration_ms: int) -> bytes:
+    """PCM silence of the given duration (8-bit WAV is unsigned, so its zero is 0x80)"""
+    frames = fmt.frame_rate * duration_ms // 1000
+    sample = b'\x80' if fmt.sample_width == 1 else b'\x00' * fmt.sample_width
+    return sample * (frames * fmt.channels)
+
+
+def convert_pcm(pcm, src: WavFormat, dst: WavFormat) -> bytes:
+    """Convert PCM samples between sample widths, channel counts and rates"""
+    if src == dst:
+        return pcm
+    if audioop is None:
+        raise ValueError(f"Cannot convert {src} to {dst}: audioop is not available")
+
+    pcm = bytes(pcm)
+    width = src.sample_width
+    if width == 1:
+        pcm = audioop.bias(pcm, 1, -128)  # unsigned -> signed
+    if width != dst.sample_width:
+        pcm = audioop.lin2lin(pcm, width, dst.sample_width)
+        width = dst.sample_width
+
+    channels = src.channels
+    if channels != dst.channels:
+        if channels == 2 and dst.channels == 1:
+            pcm = audioop.tomono(pcm, width, 0.5, 0.5)
+        elif channels == 1 and dst.channels == 2:
+            pcm = audioop.tostereo(pcm, width, 1, 1)
+        else:
+            raise ValueError(f"Cannot convert {channels} channels to {dst.channels}")
+        channels = dst.channels
+
+    if src.frame_rate != dst.frame_rate:
+        pcm, _ = audioop.ratecv(pcm, width, channels, src.frame_rate, dst.frame_rate, None)
+
+    if width == 1:
+        pcm = audioop.bias(pcm, 1, 128)  # signed -> unsigned
+    return pcm
+
+
+def _decode_with_pydub(data: bytes) -> Tuple[WavFormat, bytes]:
+    """Decode compressed audio (MP3, FLAC, ...) to PCM via pydub/ffmpeg, if installed
+
+    Raises ValueError when the bytes can't be decoded, including when ffmpeg
+    or ffprobe is missing.
+    """
+    try:
+        from pydub import AudioSegment
+        from pydub.exceptions import CouldntDecodeError
+    except ImportError:
+        raise ValueError("Segment is not WAV and pydub is not installed to decode it")
+    try:
+        segment = AudioSegment.from_file(io.BytesIO(data))
+    except (CouldntDecodeError, OSError) as e:
+        raise ValueError(f"Cannot decode segment: {e}") from e
+    return WavFormat(segment.channels, segment.sample_width, segment.frame_rate), segment.raw_data
+
+
+def decode_audio(data: bytes) -> Tuple[WavFormat, bytes]:
+    """(format, PCM) of a WAV segment, or of compressed audio via pydub; raises ValueError"""
+    try:
+        return parse_wav(data)
+    except ValueError:
+        if data.startswith(b'RIFF'):
+            raise
+        return _decode_with_pydub(data)
+
+
+class WavFileWriter:
+    """Appends PCM to a WAV file as it arrives and fixes up the header sizes on close"""
+
+    def __init__(self, path: str, fmt: WavFormat):
+        self.fmt = fmt
+        self.data_size = 0
+        self._file = open(path, 'wb')
+        self._file.write(wav_header(fmt, 0))
+
+    def write(self, pcm):
+        self._file.write(pcm)
+        self.data_size += len(pcm)
+
+    def close(self) -> int:
+        """Finalize the header and return the file size"""
+        self._file.seek(4)
+        self._file.write(struct.pack('<I', 36 + self.data_size))
+        self._file.seek(40)
+        self._file.write(struct.pack('<I', self.data_size))
+        self._file.close()
+        return 44 + self.data_size
+
+    @property
+    def duration_seconds(self) -> float:
+        return round(self.data_size / (self.fmt.frame_rate * self.fmt.channels * self.fmt.sample_width), 3)
+
+
+class WavConcatenator:
+    """Accumulates WAV segments in memory and writes them out as one file"""
+
+    def __init__(self, pause_ms: int = 500):
+        self.pause_ms = pause_ms
+        self._segments = []  # (WavFormat, PCM buffer)
+        self._duration = 0.0
+
+    def add(self, data: bytes):
+        """Queue a segment; raises ValueError if the audio can't be decoded"""
+        self._segments.append(decode_audio(data))
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._segments)
+
+    def output_format(self) -> WavFormat:
+        """Common format for the merge: the highest channel count, width and rate seen"""
+        if not self._segments:
+            raise ValueError("No segments to merge")
+        formats = [fmt for fmt, _ in self._segments]
+        return WavFormat(
+            max(f.channels for f in formats),
+            max(f.sample_width for f in formats),
+            max(f.frame_rate for f in formats)
+        )
+
+    def _parts(self) -> Tuple[WavFormat, List, bytes]:
+        fmt = self.output_format()
+        parts = [convert_pcm(pcm, seg_fmt, fmt) for seg_fmt, pcm in self._segments]
+        return fmt, parts, silence(fmt, self.pause_ms)
+
+    def _iter_chunks(self, parts, pause):
+        for i, part in enumerate(parts):
+            if i:
+                yield pause
+            yield part
+
+    def to_bytes(self) -> bytearray:
+        """Render the merged WAV into a single preallocated buffer"""
+        fmt, parts, pause = self._parts()
+        data_size = sum(len(p) for p in parts) + len(pause) * (len(parts) - 1)
+        header = wav_header(fmt, data_size)
+
+        buffer = bytearray(len(header) + data_size)
+        buffer[:len(header)] = header
+        offset = len(header)
+        for chunk in self._iter_chunks(parts, pause):
+            buffer[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+        self._duration = data_size / (fmt.frame_rate * fmt.channels * fmt.sample_width)
+        return buffer
+
+    def write(self, path: str) -> int:
+        """Stream the merged WAV straight to ``path`` and return the file size"""
+        fmt, parts, pause = self._parts()
+        data_size = sum(len(p) for p in parts) + len(pause) * (len(parts) - 1)
+
+        with open(path, 'wb') as f:
+            f.write(wav_header(fmt, data_size))
+            for chunk in self._iter_chunks(parts, pause):
+                f.write(chunk)
+        self._duration = data_size / (fmt.frame_rate * fmt.channels * fmt.sample_width)
+        return 44 + data_size
+
+    @property
+    def duration_seconds(self) -> float:
+        """Length of the last rendered merge, in seconds"""
+        return round(self._duration, 3)
@@ -2,7 +2,9 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app import app
+from app import app, start_background_tasks
+
+start_background_tasks()
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5000)